@@ -1,89 +1,663 @@
-from django.contrib import admin
+import codecs
+import uuid
+from collections import Counter
+from datetime import timedelta
+from decimal import Decimal
+from django import forms
+from django.contrib import admin, messages
+from django.contrib.admin.utils import unquote
+from django.core.exceptions import PermissionDenied
+from django.http import FileResponse, Http404, HttpResponseRedirect
+from django.template.response import TemplateResponse
+from django.urls import path, reverse
+from django.utils import timezone
+from django.utils.html import format_html
+from . import auditoria, busqueda, catalogos, disponibilidad, documentacion, inventario, precios, rendimiento, trabajos
 from .models import (
     Cliente, MateriaPrima, ProductoTerminado, Proveedor,
     CompraMateriaPrima, InventarioMateriaPrima, InventarioProductoFinal,
     OperacionProcesamiento, CostoMaquila,
     OrdenVenta, ItemOrdenVenta,
     ProveedorServicio, Embarque, ServicioLogistico,
-    DocumentacionExportacion, Cotizacion
+    DocumentacionExportacion, Cotizacion, MovimientoInventario,
+    TipoCambio, Trabajo, RegistroAuditoria, CierrePeriodo, CuboMensual
 )
 
-admin.site.site_header = "ERP Sociedad Comercial Los Avellanos Spa"
-admin.site.site_title = "ERP Avellanos"
-admin.site.index_title = "Panel de Administración"
+# Sitio del admin del ERP (erp_app.sitio_admin.ErpAdminSite), que es el admin.site del proyecto
+custom_admin_site = admin.site
+
+def informar_abastecimiento(modeladmin, request, resultados):
+    conteo = Counter(resultados.values())
+    modeladmin.message_user(
+        request,
+        f"{conteo['abastecida']} abastecidas, {conteo['regularizada']} regularizadas, "
+        f"{conteo['sin_cambios']} sin cambios."
+    )
+
+class OpcionesCompartidasMixin:
+    """
+    Evalúa una sola vez por formulario o formset las opciones de cada FK; sin
+    esto cada fila de un inline vuelve a consultar el catálogo completo al
+    renderizarse. Las FK a catálogos toman las opciones de ``erp_app.catalogos``
+    sin consultar la base.
+    """
+    def formfield_for_foreignkey(self, db_field, request, **kwargs):
+        field = super().formfield_for_foreignkey(db_field, request, **kwargs)
+        modelo = db_field.remote_field.model
+        # La FK hacia el objeto padre se reemplaza por un campo oculto; no se listan sus opciones
+        if field is None or modelo is getattr(self, 'parent_model', None):
+            return field
+        if db_field.name in self.raw_id_fields or db_field.name in self.get_autocomplete_fields(request):
+            return field
+        if catalogos.es_catalogo(modelo) and not field.queryset.query.where:
+            vacia = [('', field.empty_label)] if field.empty_label is not None else []
+            field.choices = vacia + catalogos.opciones(modelo)
+        else:
+            field.choices = list(field.choices)
+        return field
+
+class BusquedaIndexadaMixin:
+    """
+    Resuelve la búsqueda del listado y del autocompletado con el índice FTS5
+    de ``erp_app.busqueda``. ``busqueda_relacion`` = (modelo indexado, campo
+    con el pk de este modelo) busca en los registros de otro modelo. Sin FTS5
+    (p. ej. en PostgreSQL, con índices de trigramas) se usa ``search_fields``.
+    """
+    busqueda_relacion = None
+
+    def get_search_results(self, request, queryset, search_term):
+        modelo, campo = self.busqueda_relacion or (self.model, 'pk')
+        filtro = busqueda.filtro(modelo, search_term) if search_term.strip() else None
+        if filtro is None:
+            return super().get_search_results(request, queryset, search_term)
+        if modelo is self.model:
+            return queryset.filter(filtro), False
+        return queryset.filter(pk__in=modelo.objects.filter(filtro).values(campo)), False
+
+class HistorialAuditoriaMixin:
+    """Agrega al historial del objeto los cambios por campo de ``erp_app.auditoria``."""
+    historial_visible = 200
+
+    def history_view(self, request, object_id, extra_context=None):
+        obj = self.get_object(request, unquote(object_id))
+        if obj is not None:
+            extra_context = {
+                'registros_auditoria': auditoria.historial(obj, self.historial_visible),
+                **(extra_context or {}),
+            }
+        return super().history_view(request, object_id, extra_context)
+
+class ExportarMixin:
+    """
+    Agrega ``exportar/<formato>/`` a la lista de cambios. Exporta en streaming
+    las filas que coinciden con los filtros y la búsqueda activos, con las
+    columnas de ``campos_exportacion`` (por defecto, todos los campos).
+    """
+    campos_exportacion = None
+    change_list_template = 'admin/erp_app/change_list_exportar.html'
+
+    def get_urls(self):
+        info = self.opts.app_label, self.opts.model_name
+        return [
+            path('exportar/<str:formato>/', self.admin_site.admin_view(self.exportar_view), name='%s_%s_exportar' % info),
+        ] + super().get_urls()
+
+    def changelist_view(self, request, extra_context=None):
+        # exportacion, importacion y cierre se cargan al primer uso y no en el arranque de cada worker
+        from . import exportacion
+
+        extra_context = {'formatos_exportacion': exportacion.formatos(), **(extra_context or {})}
+        return super().changelist_view(request, extra_context)
+
+    def exportar_view(self, request, formato):
+        from . import exportacion
+
+        if not self.has_view_or_change_permission(request):
+            raise PermissionDenied
+        if formato not in exportacion.formatos():
+            raise Http404(f"Formato no disponible: {formato}")
+        queryset = self.get_changelist_instance(request).get_queryset(request)
+        campos = exportacion.columnas(self.model, self.campos_exportacion)
+        return exportacion.respuesta(
+            self.opts.model_name, formato, campos, exportacion.filas_queryset(queryset, campos)
+        )
+
+class ImportarForm(forms.Form):
+    archivo = forms.FileField(label="Archivo CSV")
+    delimitador = forms.CharField(max_length=1, initial=',')
+    crear_catalogos = forms.BooleanField(
+        required=False, label="Crear proveedores, materias primas y clientes que no existan",
+    )
+    segundo_plano = forms.BooleanField(
+        required=False, label="Importar en segundo plano (requiere manage.py trabajador)",
+    )
+
+class ImportarMixin:
+    """Agrega ``importar/`` a la lista de cambios con el importador CSV indicado en ``importador``."""
+    importador = None
+    errores_visibles = 200
+
+    def get_urls(self):
+        info = self.opts.app_label, self.opts.model_name
+        return [
+            path('importar/', self.admin_site.admin_view(self.importar_view), name='%s_%s_importar' % info),
+        ] + super().get_urls()
+
+    def changelist_view(self, request, extra_context=None):
+        extra_context = {'importacion_disponible': self.has_add_permission(request), **(extra_context or {})}
+        return super().changelist_view(request, extra_context)
+
+    def importar_view(self, request):
+        from . import importacion
+
+        if not self.has_add_permission(request):
+            raise PermissionDenied
+        clase = importacion.IMPORTADORES[self.importador]
+        form = ImportarForm(request.POST or None, request.FILES or None)
+        resultado = None
+        if form.is_valid() and form.cleaned_data['segundo_plano']:
+            return self.encolar_importacion(request, form.cleaned_data)
+        if form.is_valid():
+            importador = clase(crear_catalogos=form.cleaned_data['crear_catalogos'])
+            # Los bytes inválidos se reemplazan y sus filas se informan como errores
+            lineas = codecs.iterdecode(form.cleaned_data['archivo'], 'utf-8-sig', errors='replace')
+            resultado = importador.importar(importacion.leer_csv(lineas, form.cleaned_data['delimitador']))
+            creados = ', '.join(f"{n} {modelo}" for modelo, n in resultado.creados.items()) or 'nada'
+            self.message_user(request, f"Importación terminada: creados {creados}.")
+        context = {
+            **self.admin_site.each_context(request),
+            'opts': self.opts,
+            'title': f"Importar {self.opts.verbose_name_plural}",
+            'form': form,
+            'columnas': ' '.join(clase.__doc__.split()).removeprefix('Columnas: '),
+            'resultado': resultado,
+            'errores': resultado.errores[:self.errores_visibles] if resultado else [],
+        }
+        return TemplateResponse(request, 'admin/erp_app/importar.html', context)
+
+    def encolar_importacion(self, request, datos):
+        archivo = f'importacion-{self.importador}-{uuid.uuid4().hex}.csv'
+        with open(trabajos.directorio() / archivo, 'wb') as destino:
+            for bloque in datos['archivo'].chunks():
+                destino.write(bloque)
+        trabajo = trabajos.encolar('importar', {
+            'tipo': self.importador, 'archivo': archivo,
+            'delimitador': datos['delimitador'], 'crear_catalogos': datos['crear_catalogos'],
+        })
+        self.message_user(request, f"Importación encolada como trabajo #{trabajo.pk}.")
+        return HttpResponseRedirect(reverse('admin:erp_app_trabajo_change', args=[trabajo.pk]))
 
 class CostoMaquilaInline(admin.TabularInline):
     model = CostoMaquila
     extra = 1
 
-class ItemOrdenVentaInline(admin.TabularInline):
+class ItemOrdenVentaInline(OpcionesCompartidasMixin, admin.TabularInline):
     model = ItemOrdenVenta
     extra = 1
     readonly_fields = ('cantidad_lb', 'subtotal_usd')
 
-class ServicioLogisticoInline(admin.TabularInline):
+    def get_queryset(self, request):
+        return super().get_queryset(request).select_related('producto')
+
+class ServicioLogisticoInline(OpcionesCompartidasMixin, admin.TabularInline):
     model = ServicioLogistico
     extra = 1
 
+    def get_queryset(self, request):
+        return super().get_queryset(request).select_related('proveedor')
+
 @admin.register(Cliente)
-class ClienteAdmin(admin.ModelAdmin):
+class ClienteAdmin(HistorialAuditoriaMixin, BusquedaIndexadaMixin, ExportarMixin, admin.ModelAdmin):
     list_display = ('nombre', 'pais', 'email', 'telefono')
+    search_fields = ('nombre', 'pais', 'email')
 
 @admin.register(Proveedor)
-class ProveedorAdmin(admin.ModelAdmin):
+class ProveedorAdmin(HistorialAuditoriaMixin, BusquedaIndexadaMixin, ExportarMixin, admin.ModelAdmin):
     list_display = ('nombre', 'region', 'contacto')
+    search_fields = ('nombre', 'region', 'contacto', 'email')
 
 @admin.register(MateriaPrima)
-class MateriaPrimaAdmin(admin.ModelAdmin):
+class MateriaPrimaAdmin(HistorialAuditoriaMixin, ExportarMixin, admin.ModelAdmin):
     list_display = ('nombre',)
 
 @admin.register(ProductoTerminado)
-class ProductoTerminadoAdmin(admin.ModelAdmin):
+class ProductoTerminadoAdmin(HistorialAuditoriaMixin, ExportarMixin, admin.ModelAdmin):
     list_display = ('nombre', 'tipo', 'presentacion', 'precio_kg_usd')
     list_filter = ('tipo',)
 
 @admin.register(CompraMateriaPrima)
-class CompraMateriaPrimaAdmin(admin.ModelAdmin):
+class CompraMateriaPrimaAdmin(HistorialAuditoriaMixin, OpcionesCompartidasMixin, ImportarMixin, ExportarMixin, admin.ModelAdmin):
+    importador = 'compras'
     list_display = ('proveedor', 'materia_prima', 'cantidad_kg', 'precio_por_kg', 'abastecida')
     list_filter = ('abastecida', 'proveedor')
+    list_select_related = ('proveedor', 'materia_prima')
+    campos_exportacion = (
+        'id', 'fecha', 'proveedor__nombre', 'materia_prima__nombre', 'cantidad_kg', 'precio_por_kg', 'moneda', 'abastecida',
+    )
+    autocomplete_fields = ('proveedor',)
+    actions = ['abastecer_inventario']
+
+    @admin.action(description="Abastecer inventario con las compras seleccionadas")
+    def abastecer_inventario(self, request, queryset):
+        informar_abastecimiento(self, request, inventario.abastecer_compras(queryset))
 
 @admin.register(InventarioMateriaPrima)
-class InventarioMateriaPrimaAdmin(admin.ModelAdmin):
+class InventarioMateriaPrimaAdmin(HistorialAuditoriaMixin, OpcionesCompartidasMixin, ExportarMixin, admin.ModelAdmin):
     list_display = ('materia_prima', 'stock_kg')
+    list_select_related = ('materia_prima',)
     readonly_fields = ('stock_kg',)
 
 @admin.register(InventarioProductoFinal)
-class InventarioProductoFinalAdmin(admin.ModelAdmin):
-    list_display = ('producto', 'stock_kg')
-    readonly_fields = ('stock_kg',)
+class InventarioProductoFinalAdmin(HistorialAuditoriaMixin, OpcionesCompartidasMixin, ExportarMixin, admin.ModelAdmin):
+    list_display = ('producto', 'stock_kg', 'reservado_kg', 'disponible_kg')
+    list_select_related = ('producto',)
+    readonly_fields = ('stock_kg', 'reservado_kg', 'disponible_kg')
+
+    @admin.display(description='Disponible kg')
+    def disponible_kg(self, obj):
+        return obj.disponible_kg
+
+    def save_model(self, request, obj, form, change):
+        # Stock y reservas se actualizan con F(): guardar la fila completa pisaría cambios concurrentes
+        obj.save(update_fields=form.changed_data if change else None)
+
+class RendimientoForm(forms.Form):
+    materia_prima = forms.ModelChoiceField(MateriaPrima.objects.all())
+    producto = forms.ModelChoiceField(ProductoTerminado.objects.all())
+    desde = forms.DateField(required=False)
+    hasta = forms.DateField(required=False)
+    periodo = forms.ChoiceField(
+        choices=[('dia', 'Día'), ('semana', 'Semana'), ('mes', 'Mes')], initial='semana', required=False,
+    )
 
 @admin.register(OperacionProcesamiento)
-class OperacionProcesamientoAdmin(admin.ModelAdmin):
+class OperacionProcesamientoAdmin(HistorialAuditoriaMixin, OpcionesCompartidasMixin, ImportarMixin, ExportarMixin, admin.ModelAdmin):
+    importador = 'operaciones'
     list_display = ('id', 'materia_prima', 'kg_entrada', 'producto_terminado', 'kg_salida_real', 'abastecido_a_inventario')
+    list_select_related = ('materia_prima', 'producto_terminado')
     inlines = [CostoMaquilaInline]
+    actions = ['abastecer_inventario']
+
+    @admin.action(description="Abastecer inventario con las operaciones seleccionadas")
+    def abastecer_inventario(self, request, queryset):
+        informar_abastecimiento(self, request, inventario.abastecer_operaciones(queryset))
+
+    def get_urls(self):
+        return [
+            path('rendimiento/', self.admin_site.admin_view(self.rendimiento_view), name='erp_app_operacionprocesamiento_rendimiento'),
+        ] + super().get_urls()
+
+    def changelist_view(self, request, extra_context=None):
+        extra_context = {'url_rendimiento': reverse('admin:erp_app_operacionprocesamiento_rendimiento'), **(extra_context or {})}
+        return super().changelist_view(request, extra_context)
+
+    def rendimiento_view(self, request):
+        if not self.has_view_permission(request):
+            raise PermissionDenied
+        form = RendimientoForm(request.GET or None)
+        hoy = timezone.localdate()
+        serie = grafico = None
+        if form.is_valid():
+            datos = form.cleaned_data
+            serie = rendimiento.serie(
+                datos['materia_prima'], datos['producto'],
+                datos['desde'] or hoy - timedelta(days=365), datos['hasta'] or hoy, datos['periodo'] or 'semana',
+            )
+            grafico = rendimiento.grafico(serie)
+        context = {
+            **self.admin_site.each_context(request),
+            'opts': self.opts,
+            'title': "Rendimiento de procesamiento",
+            'form': form,
+            'serie': serie,
+            'grafico': grafico,
+            'alertas': rendimiento.alertas(hoy),
+        }
+        return TemplateResponse(request, 'admin/erp_app/rendimiento.html', context)
+
+class TotalUSDFilter(admin.SimpleListFilter):
+    title = 'total USD'
+    parameter_name = 'total_usd'
+    RANGOS = {
+        'lt1k': (None, 1_000),
+        '1k-10k': (1_000, 10_000),
+        '10k-50k': (10_000, 50_000),
+        'gte50k': (50_000, None),
+    }
+
+    def lookups(self, request, model_admin):
+        return [
+            ('lt1k', 'Menos de 1.000'),
+            ('1k-10k', '1.000 a 10.000'),
+            ('10k-50k', '10.000 a 50.000'),
+            ('gte50k', '50.000 o más'),
+        ]
+
+    def queryset(self, request, queryset):
+        if self.value() not in self.RANGOS:
+            return queryset
+        desde, hasta = self.RANGOS[self.value()]
+        if desde is not None:
+            queryset = queryset.filter(total_usd__gte=desde)
+        if hasta is not None:
+            queryset = queryset.filter(total_usd__lt=hasta)
+        return queryset
 
 @admin.register(OrdenVenta)
-class OrdenVentaAdmin(admin.ModelAdmin):
-    list_display = ('id', 'cliente', 'estado', 'porcentaje_adelanto')
-    list_filter = ('estado',)
+class OrdenVentaAdmin(HistorialAuditoriaMixin, ImportarMixin, ExportarMixin, admin.ModelAdmin):
+    importador = 'ordenes'
+    list_display = ('id', 'cliente', 'estado', 'porcentaje_adelanto', 'total_kg', 'total_lb', 'total_usd')
+    list_filter = ('estado', TotalUSDFilter)
+    list_select_related = ('cliente',)
+    campos_exportacion = (
+        'id', 'fecha', 'cliente__nombre', 'estado', 'porcentaje_adelanto', 'condicion_saldo',
+        'fecha_estimada_pago_saldo', 'total_kg', 'total_usd',
+    )
+    autocomplete_fields = ('cliente',)
     inlines = [ItemOrdenVentaInline]
+    actions = ['confirmar']
+
+    def get_queryset(self, request):
+        return super().get_queryset(request).with_totals()
+
+    def save_model(self, request, obj, form, change):
+        # Se confirma en save_related, cuando los ítems ya están guardados y se pueden validar
+        if 'estado' in form.changed_data and obj.estado == 'confirmada':
+            obj.estado = 'pendiente'
+        super().save_model(request, obj, form, change)
+
+    def save_related(self, request, form, formsets, change):
+        super().save_related(request, form, formsets, change)
+        obj = form.instance
+        if form.cleaned_data.get('estado') != 'confirmada':
+            return
+        if 'estado' not in form.changed_data and not any(formset.has_changed() for formset in formsets):
+            return
+        try:
+            disponibilidad.confirmar(obj)
+        except disponibilidad.StockInsuficiente as exc:
+            if obj.estado == 'confirmada':
+                # Se editaron los ítems de una orden confirmada y ya no alcanza el stock
+                obj.estado = 'pendiente'
+                obj.save(update_fields=['estado'])
+            self.message_user(request, f"{exc.message} La orden quedó pendiente.", messages.WARNING)
+
+    @admin.action(description="Confirmar las órdenes seleccionadas si hay stock disponible")
+    def confirmar(self, request, queryset):
+        resultados = disponibilidad.confirmar_ordenes(queryset.filter(estado='pendiente').order_by('pk'))
+        errores = [exc for exc in resultados.values() if exc is not None]
+        self.message_user(request, f"{len(resultados) - len(errores)} órdenes confirmadas.")
+        for exc in errores:
+            self.message_user(request, exc.message, messages.WARNING)
+
+    @admin.display(description='Total kg', ordering='total_kg')
+    def total_kg(self, obj):
+        return obj.total_kg.quantize(Decimal('0.001'))
+
+    @admin.display(description='Total lb', ordering='total_lb')
+    def total_lb(self, obj):
+        return obj.total_lb.quantize(Decimal('0.001'))
+
+    @admin.display(description='Total USD', ordering='total_usd')
+    def total_usd(self, obj):
+        return obj.total_usd.quantize(Decimal('0.01'))
 
 @admin.register(ProveedorServicio)
-class ProveedorServicioAdmin(admin.ModelAdmin):
+class ProveedorServicioAdmin(HistorialAuditoriaMixin, BusquedaIndexadaMixin, ExportarMixin, admin.ModelAdmin):
     list_display = ('nombre', 'tipo', 'contacto')
     list_filter = ('tipo',)
+    search_fields = ('nombre', 'contacto')
 
 @admin.register(Embarque)
-class EmbarqueAdmin(admin.ModelAdmin):
+class EmbarqueAdmin(HistorialAuditoriaMixin, BusquedaIndexadaMixin, ExportarMixin, admin.ModelAdmin):
     list_display = ('orden_venta', 'fecha_embarque')
+    list_select_related = ('orden_venta__cliente',)
+    # Busca por el documento de referencia de sus servicios logísticos
+    search_fields = ('servicios__documento_referencia',)
+    busqueda_relacion = (ServicioLogistico, 'embarque_id')
+    raw_id_fields = ('orden_venta',)
     inlines = [ServicioLogisticoInline]
 
+class RiesgoDocumentacionFilter(admin.SimpleListFilter):
+    """Envíos pendientes incompletos por tramo de plazo, sobre el índice parcial de riesgo."""
+    title = "riesgo de plazo"
+    parameter_name = 'riesgo'
+
+    def lookups(self, request, model_admin):
+        return [(tramo, etiqueta) for tramo, etiqueta, *_ in documentacion.TRAMOS if tramo in documentacion.TRAMOS_RIESGO]
+
+    def queryset(self, request, queryset):
+        if self.value() in documentacion.TRAMOS_RIESGO:
+            return queryset.filter(documentacion.INCOMPLETOS, documentacion.filtro_tramo(self.value()))
+        return queryset
+
 @admin.register(DocumentacionExportacion)
-class DocumentacionExportacionAdmin(admin.ModelAdmin):
-    list_display = ('embarque', 'dus', 'guia_despacho', 'packing_list', 'certificado_origen', 'estado_envio')
-    list_filter = ('estado_envio',)
+class DocumentacionExportacionAdmin(HistorialAuditoriaMixin, ExportarMixin, admin.ModelAdmin):
+    list_display = (
+        'embarque', 'dus', 'guia_despacho', 'packing_list', 'certificado_origen', 'completitud',
+        'plazo_envio_courier', 'estado_envio',
+    )
+    list_filter = (RiesgoDocumentacionFilter, 'estado_envio', 'completitud')
+    list_select_related = ('embarque',)
+    raw_id_fields = ('embarque',)
+
+class CotizacionForm(forms.ModelForm):
+    class Meta:
+        model = Cotizacion
+        fields = '__all__'
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        if 'margen_pct' in self.fields:
+            self.fields['margen_pct'].required = False
+            self.fields['margen_pct'].help_text = f"Vacío: {precios.margen_por_defecto()}%."
+
+    def clean_margen_pct(self):
+        margen = self.cleaned_data['margen_pct']
+        if margen is not None and not 0 <= margen < 100:
+            raise forms.ValidationError("El margen debe estar entre 0% y menos de 100%.")
+        return margen
+
+    def clean_producto(self):
+        producto = self.cleaned_data['producto']
+        if producto is not None and precios.modelos_costo({producto.pk})[producto.pk].sin_costo:
+            raise forms.ValidationError(
+                "El producto no tiene costo conocido: faltan operaciones de procesamiento o compras de su materia prima."
+            )
+        return producto
 
 @admin.register(Cotizacion)
-class CotizacionAdmin(admin.ModelAdmin):
+class CotizacionAdmin(HistorialAuditoriaMixin, OpcionesCompartidasMixin, ExportarMixin, admin.ModelAdmin):
+    form = CotizacionForm
     list_display = ('cliente', 'producto', 'cantidad_kg', 'precio_sugerido_kg', 'convertida_a_orden')
-    list_filter = ('convertida_a_orden',)
\ No newline at end of file
+    list_filter = ('convertida_a_orden',)
+    list_select_related = ('cliente', 'producto')
+    autocomplete_fields = ('cliente',)
+    readonly_fields = ('costo_estimado_total', 'precio_sugerido_kg')
+    actions = ['recalcular_precios']
+
+    def save_model(self, request, obj, form, change):
+        precios.cotizar(obj)
+        super().save_model(request, obj, form, change)
+
+    @admin.action(description="Recalcular costo y precio sugerido")
+    def recalcular_precios(self, request, queryset):
+        seleccionadas = list(queryset)
+        cotizaciones = precios.cotizar_lote(seleccionadas)
+        self.message_user(request, f"{len(cotizaciones)} cotizaciones recalculadas.")
+        if len(cotizaciones) < len(seleccionadas):
+            self.message_user(
+                request, f"{len(seleccionadas) - len(cotizaciones)} cotizaciones sin cambios: su producto no tiene costo conocido.",
+                messages.WARNING,
+            )
+
+@admin.register(TipoCambio)
+class TipoCambioAdmin(HistorialAuditoriaMixin, ExportarMixin, admin.ModelAdmin):
+    list_display = ('fecha', 'clp_por_usd')
+    date_hierarchy = 'fecha'
+
+@admin.register(MovimientoInventario)
+class MovimientoInventarioAdmin(ExportarMixin, admin.ModelAdmin):
+    list_display = ('creado', 'tipo', 'materia_prima', 'producto', 'cantidad_kg')
+    list_filter = ('tipo',)
+    list_select_related = ('materia_prima', 'producto')
+    def has_add_permission(self, request):
+        return False
+    def has_change_permission(self, request, obj=None):
+        return False
+    def has_delete_permission(self, request, obj=None):
+        return False
+
+@admin.register(RegistroAuditoria)
+class RegistroAuditoriaAdmin(ExportarMixin, admin.ModelAdmin):
+    list_display = ('fecha', 'accion', 'tipo', 'objeto_id', 'resumen', 'usuario')
+    list_filter = ('accion', 'tipo')
+    list_select_related = ('tipo', 'usuario')
+    # El pk crece con la fecha y no exige ordenar la tabla completa
+    ordering = ('-pk',)
+    show_full_result_count = False
+    def has_add_permission(self, request):
+        return False
+    def has_change_permission(self, request, obj=None):
+        return False
+    def has_delete_permission(self, request, obj=None):
+        return False
+
+    @admin.display(description="Cambios")
+    def resumen(self, obj):
+        return obj.objeto_repr or ', '.join(obj.cambios)
+
+@admin.register(CierrePeriodo)
+class CierrePeriodoAdmin(admin.ModelAdmin):
+    list_display = ('periodo', 'cerrado', 'filas', 'totales')
+    actions = ['rehacer', 'reabrir']
+    def has_add_permission(self, request):
+        return False
+    def has_change_permission(self, request, obj=None):
+        return False
+    def has_delete_permission(self, request, obj=None):
+        return False
+
+    @admin.display(description="Totales USD")
+    def totales(self, obj):
+        return ', '.join(f"{hecho}: {total}" for hecho, total in obj.total_usd.items())
+
+    @admin.action(description="Volver a congelar con los documentos actuales")
+    def rehacer(self, request, queryset):
+        from . import cierre
+
+        for periodo in queryset.values_list('periodo', flat=True):
+            cierre.cerrar(periodo, rehacer=True)
+        self.message_user(request, f"{len(queryset)} meses cerrados nuevamente.")
+
+    @admin.action(description="Reabrir (los reportes vuelven a calcularlos en vivo)")
+    def reabrir(self, request, queryset):
+        from . import cierre
+
+        periodos = list(queryset.values_list('periodo', flat=True))
+        for periodo in periodos:
+            cierre.reabrir(periodo)
+        self.message_user(request, f"{len(periodos)} meses reabiertos.")
+
+@admin.register(CuboMensual)
+class CuboMensualAdmin(ExportarMixin, admin.ModelAdmin):
+    list_display = ('periodo', 'hecho', 'producto', 'materia_prima', 'cliente', 'proveedor', 'proveedor_servicio', 'moneda', 'kg', 'monto', 'monto_usd')
+    list_filter = ('hecho', 'moneda', 'periodo')
+    list_select_related = ('producto', 'materia_prima', 'cliente', 'proveedor', 'proveedor_servicio')
+    def has_add_permission(self, request):
+        return False
+    def has_change_permission(self, request, obj=None):
+        return False
+    def has_delete_permission(self, request, obj=None):
+        return False
+
+class TrabajoForm(forms.ModelForm):
+    tarea = forms.ChoiceField(choices=[])
+
+    class Meta:
+        model = Trabajo
+        fields = ('tarea', 'parametros', 'max_intentos')
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        if 'tarea' in self.fields:
+            self.fields['tarea'].choices = [(nombre, nombre) for nombre in sorted(trabajos.TAREAS)]
+
+    def clean(self):
+        datos = super().clean()
+        if 'tarea' in datos:
+            self.instance.clave = trabajos.clave(datos['tarea'], datos.get('parametros') or {})
+            activo = Trabajo.objects.filter(clave=self.instance.clave, estado__in=trabajos.ACTIVOS).first()
+            if activo:
+                raise forms.ValidationError(f"Ya hay un trabajo igual pendiente o en ejecución: #{activo.pk}.")
+        return datos
+
+@admin.register(Trabajo)
+class TrabajoAdmin(ExportarMixin, admin.ModelAdmin):
+    form = TrabajoForm
+    list_display = ('id', 'tarea', 'estado', 'avance', 'intentos', 'creado', 'iniciado', 'terminado')
+    list_filter = ('estado', 'tarea')
+    readonly_fields = (
+        'estado', 'avance', 'intentos', 'ejecutar_desde', 'trabajador', 'creado', 'iniciado', 'latido', 'terminado',
+        'descarga', 'resultado', 'error',
+    )
+    actions = ['reintentar', 'cancelar']
+
+    def get_readonly_fields(self, request, obj=None):
+        if obj is None:
+            return ()
+        return ('tarea', 'parametros', 'max_intentos') + self.readonly_fields
+
+    def get_fields(self, request, obj=None):
+        return self.get_readonly_fields(request, obj) if obj else ('tarea', 'parametros', 'max_intentos')
+
+    def has_change_permission(self, request, obj=None):
+        # Solo lectura una vez creado; las transiciones se hacen con las acciones
+        return obj is None and super().has_change_permission(request, obj)
+
+    @admin.display(description="Progreso")
+    def avance(self, obj):
+        if obj.estado == 'ejecutando' and not obj.progreso:
+            # La tarea no informa un total: barra indeterminada con su mensaje
+            return format_html('<progress max="100"></progress> {}', obj.mensaje)
+        return format_html(
+            '<progress value="{}" max="100"></progress> {}% {}', obj.progreso, obj.progreso, obj.mensaje,
+        )
+
+    @admin.display(description="Archivo")
+    def descarga(self, obj):
+        if not (obj.resultado or {}).get('archivo') or obj.tarea != 'exportar':
+            return '-'
+        url = reverse('admin:erp_app_trabajo_descargar', args=[obj.pk])
+        return format_html('<a href="{}">{}</a>', url, obj.resultado['archivo'])
+
+    def get_urls(self):
+        return [
+            path('<int:pk>/descargar/', self.admin_site.admin_view(self.descargar_view), name='erp_app_trabajo_descargar'),
+        ] + super().get_urls()
+
+    def descargar_view(self, request, pk):
+        trabajo = self.get_object(request, pk)
+        if trabajo is None or not self.has_view_permission(request, trabajo):
+            raise PermissionDenied
+        nombre = (trabajo.resultado or {}).get('archivo')
+        try:
+            ruta = trabajos.ruta_archivo(nombre)
+        except ValueError:
+            ruta = None
+        if trabajo.tarea != 'exportar' or ruta is None or not ruta.is_file():
+            raise Http404("El trabajo no tiene un archivo disponible.")
+        return FileResponse(open(ruta, 'rb'), as_attachment=True, filename=nombre)
+
+    @admin.action(description="Reintentar trabajos fallidos o cancelados")
+    def reintentar(self, request, queryset):
+        encolados = 0
+        for trabajo in queryset.filter(estado__in=('fallido', 'cancelado')):
+            nuevo = trabajos.encolar(trabajo.tarea, trabajo.parametros, trabajo.clave, trabajo.max_intentos)
+            encolados += nuevo.pk != trabajo.pk
+        self.message_user(request, f"{encolados} trabajos encolados nuevamente.")
+
+    @admin.action(description="Cancelar trabajos pendientes")
+    def cancelar(self, request, queryset):
+        cancelados = queryset.filter(estado='pendiente').update(estado='cancelado')
+        self.message_user(request, f"{cancelados} trabajos cancelados.")
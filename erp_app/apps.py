@@ -4,3 +4,6 @@ from django.apps import AppConfig
 class ErpAppConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'erp_app'
+
+    def ready(self):
+        from . import arranque, signals  # noqa: F401
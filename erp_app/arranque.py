@@ -0,0 +1,108 @@
+"""
+Arranque en frío y memoria residente de un worker, para ``manage.py perfil_arranque`` y
+``manage.py check --deploy``.
+"""
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+from django.conf import settings
+from django.core import checks
+
+# Lo que hace un worker antes de su primera petición; imprime segundos y KB residentes
+CARGA = """
+import json, os, sys, time
+inicio = time.perf_counter()
+from erp_avellanos.wsgi import application
+from django.urls import get_resolver
+get_resolver().url_patterns
+segundos = time.perf_counter() - inicio
+try:
+    with open('/proc/self/status') as f:
+        rss_kb = next(int(linea.split()[1]) for linea in f if linea.startswith('VmRSS:'))
+except OSError:
+    import resource
+    rss_kb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    rss_kb //= 1024 if sys.platform == 'darwin' else 1
+print(json.dumps({'segundos': segundos, 'rss_kb': rss_kb, 'modulos': len(sys.modules)}))
+"""
+
+
+def _ejecutar(*opciones):
+    entorno = {**os.environ, 'DJANGO_SETTINGS_MODULE': os.environ.get('DJANGO_SETTINGS_MODULE', 'erp_avellanos.settings')}
+    resultado = subprocess.run(
+        [sys.executable, *opciones, '-c', CARGA],
+        cwd=settings.BASE_DIR, env=entorno, capture_output=True, text=True, timeout=120,
+    )
+    if resultado.returncode:
+        raise RuntimeError(resultado.stderr.strip().splitlines()[-1] if resultado.stderr.strip() else 'sin salida')
+    return resultado
+
+
+def medir(repeticiones=3):
+    """Mediana de ``repeticiones`` arranques: {'segundos', 'rss_mb', 'modulos'}."""
+    muestras = [json.loads(_ejecutar().stdout) for _ in range(repeticiones)]
+    return {
+        'segundos': round(statistics.median(m['segundos'] for m in muestras), 3),
+        'rss_mb': round(statistics.median(m['rss_kb'] for m in muestras) / 1024, 1),
+        'modulos': muestras[-1]['modulos'],
+    }
+
+
+def importaciones():
+    """[(módulo, ms propios, ms acumulados)] de un arranque, del más al menos costoso en total."""
+    modulos = []
+    for linea in _ejecutar('-X', 'importtime').stderr.splitlines():
+        if not linea.startswith('import time:') or 'cumulative' in linea:
+            continue
+        propio, acumulado, nombre = linea.removeprefix('import time:').split('|')
+        modulos.append((nombre.strip(), int(propio) / 1000, int(acumulado) / 1000))
+    return sorted(modulos, key=lambda modulo: -modulo[2])
+
+
+def cargador_en_cache():
+    """True si el motor de plantillas de Django reutiliza las plantillas compiladas."""
+    from django.template import engines
+    from django.template.loaders.cached import Loader
+
+    return all(
+        any(isinstance(loader, Loader) for loader in motor.engine.template_loaders)
+        for motor in engines.all() if hasattr(motor, 'engine')
+    )
+
+
+@checks.register('arranque', deploy=True)
+def revisar_arranque(app_configs=None, **kwargs):
+    mensajes = []
+    if not cargador_en_cache():
+        mensajes.append(checks.Warning(
+            "Las plantillas se vuelven a leer y compilar en cada petición.",
+            hint="No definas OPTIONS['loaders'] en TEMPLATES o envuélvelos en django.template.loaders.cached.Loader.",
+            id='erp_app.W003',
+        ))
+    try:
+        perfil = medir()
+    except (OSError, RuntimeError, subprocess.SubprocessError) as exc:
+        return mensajes + [checks.Warning(f"No se pudo medir el arranque: {exc}", id='erp_app.W004')]
+    mensajes.append(checks.Info(
+        f"Arranque en frío de un worker: {perfil['segundos']} s, {perfil['rss_mb']} MB residentes, "
+        f"{perfil['modulos']} módulos.",
+        id='erp_app.I001',
+    ))
+    maximo = getattr(settings, 'ARRANQUE_MAX_SEGUNDOS', None)
+    if maximo and perfil['segundos'] > maximo:
+        mensajes.append(checks.Warning(
+            f"El arranque en frío ({perfil['segundos']} s) supera ARRANQUE_MAX_SEGUNDOS ({maximo} s).",
+            hint="Revise los módulos más lentos con manage.py perfil_arranque.",
+            id='erp_app.W001',
+        ))
+    maximo = getattr(settings, 'ARRANQUE_MAX_RSS_MB', None)
+    if maximo and perfil['rss_mb'] > maximo:
+        mensajes.append(checks.Warning(
+            f"La memoria residente por worker ({perfil['rss_mb']} MB) supera ARRANQUE_MAX_RSS_MB ({maximo} MB).",
+            hint="Revise los módulos más pesados con manage.py perfil_arranque.",
+            id='erp_app.W002',
+        ))
+    return mensajes
@@ -0,0 +1,227 @@
+"""
+Historial de cambios por campo de los modelos de ``AUDITADOS``, escrito en bloque al confirmar
+cada transacción. ``update()`` y ``bulk_create`` no se auditan.
+"""
+import weakref
+from contextvars import ContextVar
+from datetime import date
+
+from django.contrib.contenttypes.models import ContentType
+from django.core.exceptions import ObjectDoesNotExist
+from django.db import DEFAULT_DB_ALIAS, connections, transaction
+from django.utils import timezone
+
+from .models import (
+    Cliente, MateriaPrima, ProductoTerminado, Proveedor,
+    CompraMateriaPrima, InventarioMateriaPrima, InventarioProductoFinal,
+    OperacionProcesamiento, CostoMaquila, OrdenVenta, ItemOrdenVenta,
+    ProveedorServicio, Embarque, ServicioLogistico,
+    DocumentacionExportacion, Cotizacion, TipoCambio, RegistroAuditoria
+)
+
+AUDITADOS = (
+    Cliente, MateriaPrima, ProductoTerminado, Proveedor,
+    CompraMateriaPrima, InventarioMateriaPrima, InventarioProductoFinal,
+    OperacionProcesamiento, CostoMaquila, OrdenVenta, ItemOrdenVenta,
+    ProveedorServicio, Embarque, ServicioLogistico,
+    DocumentacionExportacion, Cotizacion, TipoCambio,
+)
+# Modelo editado en línea -> (modelo padre, campo con su pk)
+RAICES = {
+    ItemOrdenVenta: (OrdenVenta, 'orden_id'),
+    CostoMaquila: (OperacionProcesamiento, 'operacion_id'),
+    ServicioLogistico: (Embarque, 'embarque_id'),
+}
+# Filas por INSERT al volcar un lote
+LOTE = 500
+
+ATRIBUTO = '_auditoria'
+# Atributo de la conexión con el lote de su transacción en curso
+LOTE_CONEXION = 'lote_auditoria'
+# Petición en curso, fijada por erp_app.middleware.AuditoriaMiddleware
+peticion_actual = ContextVar('auditoria_peticion', default=None)
+
+
+def campos(modelo):
+    """{attname: campo} de los campos auditados: los editables, sin la clave primaria."""
+    return {
+        field.attname: field for field in modelo._meta.concrete_fields
+        if field.editable and not field.primary_key
+    }
+
+
+CAMPOS = {modelo: campos(modelo) for modelo in AUDITADOS}
+
+
+class Anotacion:
+    """Callback ``on_commit`` de un registro; Django lo descarta si se deshace su punto de guardado."""
+
+    def __init__(self, lote, registro):
+        self.lote = lote
+        self.registro = registro
+
+    def __call__(self):
+        self.lote.volcar()
+
+
+class Lote:
+    """
+    Registros pendientes de una transacción. Guarda solo referencias débiles a
+    sus ``Anotacion``: las que Django descarta al deshacer un punto de guardado
+    dejan de existir (CPython las libera de inmediato) y sus registros salen
+    del lote sin leer el estado interno de la conexión. La primera anotación
+    que corre al confirmar vuelca todas las que quedan.
+    """
+
+    def __init__(self, using):
+        self.using = using
+        self.anotaciones = []
+        self.volcado = False
+
+    def agregar(self, registro):
+        anotacion = Anotacion(self, registro)
+        self.anotaciones.append(weakref.ref(anotacion))
+        transaction.on_commit(anotacion, using=self.using, robust=True)
+
+    def volcar(self):
+        if self.volcado:
+            return
+        self.volcado = True
+        registros = [anotacion.registro for ref in self.anotaciones if (anotacion := ref()) is not None]
+        self.anotaciones = []
+        RegistroAuditoria.objects.using(self.using).bulk_create(registros, batch_size=LOTE)
+
+
+def _lote(using):
+    """El lote de la transacción en curso, o ``None`` en modo autocommit."""
+    conexion = connections[using]
+    if not conexion.in_atomic_block:
+        return None
+    lote = getattr(conexion, LOTE_CONEXION, None)
+    # Tras una transacción deshecha el lote sigue abierto y se reutiliza: sus anotaciones ya no existen
+    if lote is None or lote.volcado:
+        lote = Lote(using)
+        setattr(conexion, LOTE_CONEXION, lote)
+    return lote
+
+
+def usuario_id():
+    request = peticion_actual.get()
+    usuario = getattr(request, 'user', None)
+    return usuario.pk if usuario is not None and usuario.is_authenticated else None
+
+
+def _guardados(instance, update_fields):
+    """[(attname, campo)] auditados que escribe el guardado; los diferidos no se escriben."""
+    valores = instance.__dict__
+    return [
+        (attname, field) for attname, field in CAMPOS[type(instance)].items()
+        if attname in valores and (update_fields is None or field.name in update_fields or attname in update_fields)
+    ]
+
+
+def leer_anteriores(instance, using, update_fields=None):
+    """Lee de la base los valores que va a reemplazar el guardado de un registro existente."""
+    if instance._state.adding or instance.pk is None:
+        return
+    attnames = [attname for attname, _ in _guardados(instance, update_fields)]
+    if attnames:
+        anteriores = type(instance)._base_manager.using(using).filter(pk=instance.pk).values(*attnames).first()
+        instance.__dict__[ATRIBUTO] = anteriores or {}
+
+
+def _representar(instance):
+    try:
+        return str(instance)[:200]
+    except ObjectDoesNotExist:
+        # P. ej. un relacionado ya borrado en la misma cascada
+        return ''
+
+
+def _anotar(instance, accion, cambios, using, objeto_repr=''):
+    modelo = type(instance)
+    padre, campo = RAICES.get(modelo, (modelo, 'pk'))
+    ahora = timezone.now()
+    registro = RegistroAuditoria(
+        fecha=ahora,
+        periodo=timezone.localdate(ahora).replace(day=1),
+        tipo=ContentType.objects.get_for_model(modelo),
+        objeto_id=instance.pk,
+        tipo_raiz=ContentType.objects.get_for_model(padre),
+        raiz_id=getattr(instance, campo),
+        accion=accion,
+        objeto_repr=objeto_repr,
+        cambios=cambios,
+        usuario_id=usuario_id(),
+    )
+    lote = _lote(using)
+    if lote is None:
+        registro.save(using=using)
+    else:
+        lote.agregar(registro)
+
+
+def _valor(field, valor):
+    # Normaliza lo asignado a mano (p. ej. un int en un DecimalField) al tipo del campo
+    return None if valor is None else field.to_python(valor)
+
+
+def registrar_guardado(instance, created, using, update_fields=None):
+    antes = instance.__dict__.pop(ATRIBUTO, {})
+    valores = instance.__dict__
+    guardados = _guardados(instance, update_fields)
+    if created:
+        cambios = {
+            field.name: [None, _valor(field, valores[attname])] for attname, field in guardados
+            if valores[attname] not in (None, '')
+        }
+    else:
+        cambios = {
+            field.name: [_valor(field, antes[attname]), _valor(field, valores[attname])]
+            for attname, field in guardados
+            if attname in antes and _valor(field, antes[attname]) != _valor(field, valores[attname])
+        }
+    if cambios:
+        _anotar(instance, 'alta' if created else 'cambio', cambios, using)
+
+
+def registrar_borrado(instance, using):
+    valores = instance.__dict__
+    cambios = {
+        field.name: [_valor(field, valores[attname]), None] for attname, field in CAMPOS[type(instance)].items()
+        if valores.get(attname) not in (None, '')
+    }
+    _anotar(instance, 'baja', cambios, using, _representar(instance))
+
+
+def historial(obj, limite=None):
+    """Registros del objeto y de los que se editan en línea en él, del más reciente al más antiguo."""
+    registros = RegistroAuditoria.objects.filter(
+        tipo_raiz=ContentType.objects.get_for_model(type(obj)), raiz_id=obj.pk,
+    ).select_related('tipo', 'usuario').order_by('-fecha', '-pk')
+    return registros[:limite] if limite else registros
+
+
+def inicio_retencion(meses, hoy=None):
+    """Primer día del mes más antiguo que se conserva con ``meses`` de retención (el actual cuenta)."""
+    hoy = hoy or timezone.localdate()
+    indice = hoy.year * 12 + hoy.month - 1 - (meses - 1)
+    return date(indice // 12, indice % 12 + 1, 1)
+
+
+def purgar(meses, lote=5000, using=DEFAULT_DB_ALIAS):
+    """Borra los meses anteriores a la retención en lotes de ``lote`` filas; devuelve {periodo: filas}."""
+    corte = inicio_retencion(meses)
+    anteriores = RegistroAuditoria.objects.using(using).filter(periodo__lt=corte)
+    borrados = {}
+    for periodo in anteriores.order_by('periodo').values_list('periodo', flat=True).distinct():
+        total = 0
+        while True:
+            ids = list(anteriores.filter(periodo=periodo).values_list('pk', flat=True)[:lote])
+            if not ids:
+                break
+            # Sin señales ni dependientes, delete() es un único DELETE sin cargar las filas
+            total += RegistroAuditoria.objects.using(using).filter(pk__in=ids).delete()[0]
+        borrados[periodo.isoformat()] = total
+    return borrados
+
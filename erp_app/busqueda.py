@@ -0,0 +1,182 @@
+"""
+Búsqueda indexada de clientes, proveedores y documentos: FTS5 en SQLite, trigramas en
+PostgreSQL e ``icontains`` sin índice en otros motores.
+"""
+import re
+from dataclasses import dataclass
+
+from django.db import DEFAULT_DB_ALIAS, connections
+from django.db.models import F, FloatField, Func, Q, Value
+from django.db.models.expressions import RawSQL
+from django.db.models.functions import Greatest
+from django.urls import reverse
+
+from .models import Cliente, Proveedor, ProveedorServicio, ServicioLogistico
+
+# Resultados por modelo en la búsqueda global
+RESULTADOS_POR_MODELO = 10
+# Palabras de la consulta que se consideran
+MAX_PALABRAS = 8
+
+
+@dataclass(frozen=True)
+class Indice:
+    modelo: type
+    campos: tuple
+    # (nombre de la vista de cambio del admin, campo con el pk) si el registro se edita en otro modelo
+    enlace: tuple = None
+
+    @property
+    def tabla(self):
+        return f'{self.modelo._meta.db_table}_busqueda'
+
+
+INDICES = {
+    indice.modelo: indice for indice in (
+        Indice(Cliente, ('nombre', 'pais', 'email')),
+        Indice(Proveedor, ('nombre', 'region', 'contacto', 'email')),
+        Indice(ProveedorServicio, ('nombre', 'contacto')),
+        Indice(ServicioLogistico, ('documento_referencia',), enlace=('admin:erp_app_embarque_change', 'embarque_id')),
+    )
+}
+
+
+class SimilitudPalabras(Func):
+    """``word_similarity`` de pg_trgm, sin depender de ``django.contrib.postgres``."""
+    function = 'WORD_SIMILARITY'
+    output_field = FloatField()
+
+
+@dataclass
+class Resultado:
+    objeto: object
+    puntaje: float
+
+    @property
+    def tipo(self):
+        return self.objeto._meta.verbose_name
+
+    @property
+    def url(self):
+        indice = INDICES[type(self.objeto)]
+        if indice.enlace:
+            vista, campo = indice.enlace
+            return reverse(vista, args=[getattr(self.objeto, campo)])
+        opts = self.objeto._meta
+        return reverse(f'admin:{opts.app_label}_{opts.model_name}_change', args=[self.objeto.pk])
+
+
+def motor(using=DEFAULT_DB_ALIAS):
+    return {'sqlite': 'fts5', 'postgresql': 'trigramas'}.get(connections[using].vendor, 'icontains')
+
+
+def palabras(texto):
+    return re.findall(r'\w+', texto.casefold())[:MAX_PALABRAS]
+
+
+def consulta_fts(texto):
+    """``'viña del'`` -> ``'"viña"* "del"*'``: todas las palabras, como prefijo."""
+    return ' '.join(f'"{palabra}"*' for palabra in palabras(texto))
+
+
+def _texto(valor):
+    return '' if valor is None else str(valor)
+
+
+def indexar(objetos):
+    """Agrega o reemplaza en el índice FTS5 los registros, que deben ser de un mismo modelo."""
+    objetos = [obj for obj in objetos if obj.pk is not None]
+    if not objetos or motor() != 'fts5':
+        return
+    indice = INDICES[type(objetos[0])]
+    columnas = ', '.join(indice.campos)
+    marcas = ', '.join(['%s'] * (len(indice.campos) + 1))
+    with connections[DEFAULT_DB_ALIAS].cursor() as cursor:
+        cursor.executemany(f'DELETE FROM {indice.tabla} WHERE rowid = %s', [(obj.pk,) for obj in objetos])
+        cursor.executemany(
+            f'INSERT INTO {indice.tabla} (rowid, {columnas}) VALUES ({marcas})',
+            [(obj.pk, *(_texto(getattr(obj, campo)) for campo in indice.campos)) for obj in objetos],
+        )
+
+
+def retirar(modelo, pks):
+    if motor() != 'fts5':
+        return
+    with connections[DEFAULT_DB_ALIAS].cursor() as cursor:
+        cursor.executemany(f'DELETE FROM {INDICES[modelo].tabla} WHERE rowid = %s', [(pk,) for pk in pks])
+
+
+def reconstruir(modelos=None):
+    """Vuelve a llenar los índices FTS5 desde las tablas; devuelve las filas indexadas por modelo."""
+    conteo = {}
+    if motor() != 'fts5':
+        return conteo
+    with connections[DEFAULT_DB_ALIAS].cursor() as cursor:
+        for modelo in modelos or INDICES:
+            indice = INDICES[modelo]
+            columnas = ', '.join(indice.campos)
+            cursor.execute(f'DELETE FROM {indice.tabla}')
+            cursor.execute(
+                f'INSERT INTO {indice.tabla} (rowid, {columnas}) '
+                f'SELECT {modelo._meta.pk.column}, {columnas} FROM {modelo._meta.db_table}'
+            )
+            conteo[modelo.__name__] = cursor.rowcount
+            # Une los segmentos del índice para que las consultas recorran un solo árbol
+            cursor.execute(f"INSERT INTO {indice.tabla} ({indice.tabla}) VALUES ('optimize')")
+    return conteo
+
+
+def filtro(modelo, texto):
+    """``Q`` con los registros de ``modelo`` que coinciden en el índice FTS5, o ``None`` sin FTS5."""
+    if motor() != 'fts5' or modelo not in INDICES:
+        return None
+    consulta = consulta_fts(texto)
+    if not consulta:
+        return Q(pk__in=[])
+    tabla = INDICES[modelo].tabla
+    return Q(pk__in=RawSQL(f'SELECT rowid FROM {tabla} WHERE {tabla} MATCH %s', [consulta]))
+
+
+def _buscar_fts(indice, texto, limite):
+    consulta = consulta_fts(texto)
+    if not consulta:
+        return []
+    with connections[DEFAULT_DB_ALIAS].cursor() as cursor:
+        cursor.execute(
+            f'SELECT rowid, bm25({indice.tabla}) FROM {indice.tabla} WHERE {indice.tabla} MATCH %s '
+            f'ORDER BY rank LIMIT %s',
+            [consulta, limite],
+        )
+        filas = cursor.fetchall()
+    objetos = indice.modelo.objects.in_bulk([pk for pk, _ in filas])
+    # bm25 es menor cuanto más relevante
+    return [Resultado(objetos[pk], -rango) for pk, rango in filas if pk in objetos]
+
+
+def _buscar_campos(indice, texto, limite, trigramas):
+    condicion = Q()
+    for palabra in palabras(texto):
+        condicion &= Q(*(Q(**{f'{campo}__icontains': palabra}) for campo in indice.campos), _connector=Q.OR)
+    if not condicion:
+        return []
+    queryset = indice.modelo.objects.filter(condicion)
+    if trigramas:
+        similitudes = [SimilitudPalabras(Value(texto), F(campo)) for campo in indice.campos]
+        queryset = queryset.annotate(
+            puntaje=Greatest(*similitudes) if len(similitudes) > 1 else similitudes[0]
+        ).order_by('-puntaje', 'pk')
+        return [Resultado(obj, obj.puntaje) for obj in queryset[:limite]]
+    return [Resultado(obj, 0.0) for obj in queryset.order_by('-pk')[:limite]]
+
+
+def buscar(texto, modelos=None, limite=RESULTADOS_POR_MODELO):
+    """Resultados de todos los modelos indexados, del más al menos relevante."""
+    tipo = motor()
+    resultados = []
+    for modelo in modelos or INDICES:
+        indice = INDICES[modelo]
+        if tipo == 'fts5':
+            resultados.extend(_buscar_fts(indice, texto, limite))
+        else:
+            resultados.extend(_buscar_campos(indice, texto, limite, trigramas=tipo == 'trigramas'))
+    return sorted(resultados, key=lambda resultado: -resultado.puntaje)
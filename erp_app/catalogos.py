@@ -0,0 +1,134 @@
+"""
+Caché de catálogos: materias primas, productos, proveedores, proveedores de
+servicios y clientes.
+
+Cada proceso guarda por catálogo las etiquetas (``str`` de cada registro) y la
+lista de opciones de los formularios, y las recarga cuando cambia su versión
+en la caché de Django, compartida por los workers; las señales de guardado y
+borrado la renuevan al confirmar la transacción (ver ``erp_app.versiones``). Para no consultar la caché en cada
+etiqueta, la versión se revisa como mucho una vez cada
+``CATALOGOS_REVISION_SEGUNDOS``. Con ``CATALOGOS_COMPARTIDOS`` los datos
+también se guardan en la caché de Django, y un proceso que recarga los toma de
+ahí antes de ir a la base.
+
+``estadisticas()`` devuelve los aciertos y fallos de cada catálogo en el proceso.
+"""
+import threading
+import time
+from collections import Counter
+from dataclasses import dataclass
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import DEFAULT_DB_ALIAS
+
+from . import versiones
+from .models import Cliente, MateriaPrima, ProductoTerminado, Proveedor, ProveedorServicio
+
+MODELOS = (MateriaPrima, ProductoTerminado, Proveedor, ProveedorServicio, Cliente)
+PREFIJO = 'erp:catalogos'
+
+_lock = threading.Lock()
+_catalogos = {}
+_contadores = {modelo._meta.label: Counter() for modelo in MODELOS}
+
+
+@dataclass(frozen=True)
+class Catalogo:
+    version: str
+    revisado: float
+    etiquetas: dict
+    opciones: list
+
+
+def _clave_version(modelo):
+    return f'{PREFIJO}:{modelo._meta.label_lower}:version'
+
+
+def es_catalogo(modelo):
+    return modelo in MODELOS
+
+
+def invalidar(modelo):
+    versiones.renovar(_clave_version(modelo))
+    # Este proceso ve el cambio de inmediato, sin esperar la próxima revisión
+    _catalogos.pop(modelo._meta.label, None)
+
+
+def _cargar(modelo, version):
+    compartidos = getattr(settings, 'CATALOGOS_COMPARTIDOS', False)
+    clave = f'{PREFIJO}:{modelo._meta.label_lower}:{version}'
+    if compartidos and (opciones := cache.get(clave)) is not None:
+        _contadores[modelo._meta.label]['compartidos'] += 1
+        return opciones
+    opciones = [(obj.pk, str(obj)) for obj in modelo._default_manager.order_by('pk')]
+    if compartidos:
+        cache.set(clave, opciones, None)
+    return opciones
+
+
+def _vigente(modelo):
+    etiqueta = modelo._meta.label
+    catalogo = _catalogos.get(etiqueta)
+    ahora = time.monotonic()
+    intervalo = getattr(settings, 'CATALOGOS_REVISION_SEGUNDOS', 1.0)
+    if catalogo is not None and ahora - catalogo.revisado < intervalo:
+        _contadores[etiqueta]['aciertos'] += 1
+        return catalogo
+    version = versiones.leer(_clave_version(modelo))
+    with _lock:
+        catalogo = _catalogos.get(etiqueta)
+        if catalogo is not None and catalogo.version == version:
+            _contadores[etiqueta]['aciertos'] += 1
+            catalogo = _catalogos[etiqueta] = Catalogo(version, ahora, catalogo.etiquetas, catalogo.opciones)
+            return catalogo
+        _contadores[etiqueta]['fallos'] += 1
+        opciones = _cargar(modelo, version)
+        catalogo = _catalogos[etiqueta] = Catalogo(version, ahora, dict(opciones), opciones)
+        return catalogo
+
+
+def etiquetas(modelo):
+    """{pk: str(registro)} del catálogo."""
+    return _vigente(modelo).etiquetas
+
+
+def etiqueta(modelo, pk):
+    return _vigente(modelo).etiquetas.get(pk)
+
+
+def opciones(modelo):
+    """[(pk, str(registro))] en orden de pk, como las que arma un ModelChoiceField."""
+    return _vigente(modelo).opciones
+
+
+def etiqueta_de(obj, campo):
+    """
+    ``str`` del registro relacionado por ``campo``: el objeto ya cargado si lo
+    está (p. ej. con ``select_related``), si no la etiqueta en caché.
+    """
+    field = obj._meta.get_field(campo)
+    # La caché refleja la base por defecto; otras bases (p. ej. las de benchmark) se consultan
+    if field.is_cached(obj) or not es_catalogo(field.related_model) or obj._state.db not in (None, DEFAULT_DB_ALIAS):
+        return str(getattr(obj, campo))
+    pk = getattr(obj, field.attname)
+    if pk is None:
+        return str(None)
+    texto = etiqueta(field.related_model, pk)
+    # Un registro recién creado en otro proceso puede no estar aún en la caché
+    return texto if texto is not None else str(getattr(obj, campo))
+
+
+def estadisticas():
+    """Aciertos, fallos y cargas desde la caché compartida por catálogo, con la tasa de aciertos."""
+    resultado = {}
+    for etiqueta_modelo, contador in _contadores.items():
+        consultas = contador['aciertos'] + contador['fallos']
+        resultado[etiqueta_modelo] = {
+            'aciertos': contador['aciertos'],
+            'fallos': contador['fallos'],
+            'compartidos': contador['compartidos'],
+            'tasa_aciertos': round(contador['aciertos'] / consultas, 4) if consultas else None,
+            'registros': len(_catalogos[etiqueta_modelo].etiquetas) if etiqueta_modelo in _catalogos else None,
+        }
+    return resultado
@@ -0,0 +1,246 @@
+"""
+Cierre de períodos: cada mes cerrado queda congelado en ``CuboMensual`` y los reportes
+calculan en vivo solo los meses abiertos.
+"""
+from collections import defaultdict
+from dataclasses import dataclass
+from datetime import date
+from decimal import Decimal
+
+from django.db import transaction
+from django.db.models import Count, DateField, DecimalField, F, Max, Min, Sum, Value
+from django.db.models.functions import TruncMonth
+from django.utils import timezone
+
+from .models import (
+    CompraMateriaPrima, CostoMaquila, Embarque, ItemOrdenVenta, OrdenVenta, ServicioLogistico,
+    CierrePeriodo, CuboMensual
+)
+from .tipo_cambio import a_usd, fecha_de_conversion
+
+CERO = Decimal(0)
+CENTAVO = Decimal('0.01')
+GRAMO = Decimal('0.001')
+IMPORTE = DecimalField(max_digits=20, decimal_places=4)
+DIMENSIONES = ('producto', 'materia_prima', 'cliente', 'proveedor', 'proveedor_servicio')
+# Columnas de cada celda que devuelve ``filas``, seguidas de si el mes está cerrado
+CAMPOS_CUBO = ['periodo', 'hecho', *(f'{dimension}_id' for dimension in DIMENSIONES), 'moneda', 'kg', 'monto', 'monto_usd', 'documentos']
+
+
+@dataclass(frozen=True)
+class Hecho:
+    modelo: type
+    fecha: str
+    # {dimensión del cubo: ruta desde el modelo}
+    dimensiones: dict
+    monto: object
+    kg: str = None
+    # None: el hecho es siempre en USD
+    moneda: str = None
+    fecha_conversion: str = None
+
+
+HECHOS = {
+    'venta': Hecho(
+        ItemOrdenVenta, 'orden__fecha', {'producto': 'producto', 'cliente': 'orden__cliente'},
+        monto=F('cantidad_kg') * F('precio_por_kg'), kg='cantidad_kg',
+    ),
+    'compra': Hecho(
+        CompraMateriaPrima, 'fecha', {'materia_prima': 'materia_prima', 'proveedor': 'proveedor'},
+        monto=F('cantidad_kg') * F('precio_por_kg'), kg='cantidad_kg', moneda='moneda', fecha_conversion='fecha',
+    ),
+    'maquila': Hecho(
+        CostoMaquila, 'fecha', {'producto': 'operacion__producto_terminado'},
+        monto=F('monto'), moneda='moneda', fecha_conversion='fecha',
+    ),
+    'logistica': Hecho(
+        ServicioLogistico, 'embarque__fecha_embarque',
+        {'proveedor_servicio': 'proveedor', 'cliente': 'embarque__orden_venta__cliente'},
+        monto=F('monto'), moneda='moneda', fecha_conversion='fecha_vencimiento',
+    ),
+}
+# Modelo y campo con la fecha que ubica cada hecho en un mes, para acotar el rango de datos
+FECHAS = ((OrdenVenta, 'fecha'), (CompraMateriaPrima, 'fecha'), (CostoMaquila, 'fecha'), (Embarque, 'fecha_embarque'))
+
+
+def mes(fecha):
+    return fecha.replace(day=1)
+
+
+def mes_siguiente(periodo):
+    return date(periodo.year + periodo.month // 12, periodo.month % 12 + 1, 1)
+
+
+def meses(desde, hasta):
+    """Primeros días de los meses de ``desde`` a ``hasta``, ambos incluidos."""
+    periodo = mes(desde)
+    while periodo <= hasta:
+        yield periodo
+        periodo = mes_siguiente(periodo)
+
+
+def rango_datos():
+    """(primer mes, último mes) con documentos, o ``None`` si no hay ninguno."""
+    extremos = [
+        modelo.objects.aggregate(primera=Min(campo), ultima=Max(campo)).values()
+        for modelo, campo in FECHAS
+    ]
+    primeras = [primera for primera, _ in extremos if primera]
+    ultimas = [ultima for _, ultima in extremos if ultima]
+    return (mes(min(primeras)), mes(max(ultimas))) if primeras else None
+
+
+def _celdas(hecho, desde, hasta, chunk_size):
+    """Filas agrupadas de un hecho en [desde, hasta): (mes, dimensiones, moneda, fecha, kg, monto, documentos)."""
+    queryset = hecho.modelo.objects.filter(**{f'{hecho.fecha}__gte': desde, f'{hecho.fecha}__lt': hasta})
+    dimensiones = list(hecho.dimensiones.values())
+    agrupar = [TruncMonth(hecho.fecha), *dimensiones]
+    if hecho.moneda:
+        agrupar += [hecho.moneda, fecha_de_conversion(hecho.fecha_conversion, hecho.moneda)]
+    else:
+        agrupar += [Value('USD'), Value(None, output_field=DateField())]
+    filas = queryset.values_list(*agrupar).annotate(
+        kg=Sum(hecho.kg) if hecho.kg else Value(CERO, output_field=IMPORTE),
+        total=Sum(hecho.monto, output_field=IMPORTE),
+        documentos=Count('pk'),
+    ).order_by()
+    for periodo, *fila in filas.iterator(chunk_size=chunk_size):
+        valores = dict(zip(hecho.dimensiones, fila))
+        moneda, fecha, kg, monto, documentos = fila[len(dimensiones):]
+        yield periodo, tuple(valores.get(dimension) for dimension in DIMENSIONES), moneda, fecha, kg, monto, documentos
+
+
+def calcular(desde, hasta, chunk_size=2000):
+    """
+    Celdas del cubo (``CuboMensual`` sin guardar) de los meses de ``desde`` a
+    ``hasta``, ambos incluidos, ordenadas por mes y hecho.
+    """
+    celdas = defaultdict(lambda: [CERO, CERO, CERO, 0])
+    for nombre, hecho in HECHOS.items():
+        for periodo, dimensiones, moneda, fecha, kg, monto, documentos in _celdas(
+            hecho, mes(desde), mes_siguiente(hasta), chunk_size,
+        ):
+            celda = celdas[periodo, nombre, dimensiones, moneda]
+            celda[0] += kg or CERO
+            celda[1] += monto or CERO
+            celda[2] += a_usd(monto or CERO, moneda, fecha)
+            celda[3] += documentos
+    orden_hechos = {nombre: i for i, nombre in enumerate(HECHOS)}
+    for (periodo, nombre, dimensiones, moneda), (kg, monto, monto_usd, documentos) in sorted(
+        celdas.items(),
+        key=lambda item: (item[0][0], orden_hechos[item[0][1]], [(v is None, v or 0) for v in item[0][2]], item[0][3]),
+    ):
+        yield CuboMensual(
+            periodo=periodo, hecho=nombre, moneda=moneda,
+            **{f'{dimension}_id': valor for dimension, valor in zip(DIMENSIONES, dimensiones)},
+            kg=kg.quantize(GRAMO), monto=monto.quantize(CENTAVO), monto_usd=monto_usd.quantize(CENTAVO), documentos=documentos,
+        )
+
+
+def _totales(celdas):
+    totales = defaultdict(Decimal)
+    for celda in celdas:
+        totales[celda.hecho] += celda.monto_usd
+    return dict(totales)
+
+
+def cerrar(periodo, rehacer=False, lote=2000):
+    """
+    Congela el mes de ``periodo`` en el cubo y devuelve su ``CierrePeriodo``.
+    Un mes ya cerrado se devuelve tal cual salvo con ``rehacer``. El mes en
+    curso y los futuros no se pueden cerrar.
+    """
+    periodo = mes(periodo)
+    if periodo >= mes(timezone.localdate()):
+        raise ValueError(f"El mes {periodo:%Y-%m} aún no termina.")
+    with transaction.atomic():
+        existente = CierrePeriodo.objects.select_for_update().filter(periodo=periodo).first()
+        if existente and not rehacer:
+            return existente
+        CuboMensual.objects.filter(periodo=periodo).delete()
+        filas, totales, bloque = 0, defaultdict(Decimal), []
+        for celda in calcular(periodo, periodo, lote):
+            bloque.append(celda)
+            totales[celda.hecho] += celda.monto_usd
+            if len(bloque) >= lote:
+                filas += len(CuboMensual.objects.bulk_create(bloque))
+                bloque = []
+        filas += len(CuboMensual.objects.bulk_create(bloque))
+        cierre, _ = CierrePeriodo.objects.update_or_create(periodo=periodo, defaults={
+            'cerrado': timezone.now(), 'filas': filas, 'total_usd': dict(totales),
+        })
+    return cierre
+
+
+def reabrir(periodo):
+    """Descarta el cubo del mes, que vuelve a calcularse en vivo."""
+    periodo = mes(periodo)
+    with transaction.atomic():
+        CuboMensual.objects.filter(periodo=periodo).delete()
+        return CierrePeriodo.objects.filter(periodo=periodo).delete()[0] > 0
+
+
+def cerrados(desde=None, hasta=None):
+    queryset = CierrePeriodo.objects.all()
+    if desde:
+        queryset = queryset.filter(periodo__gte=mes(desde))
+    if hasta:
+        queryset = queryset.filter(periodo__lte=mes(hasta))
+    return set(queryset.values_list('periodo', flat=True))
+
+
+def _tramos_abiertos(desde, hasta, congelados):
+    """Meses abiertos consecutivos como (primero, último), para calcularlos con una consulta por tramo."""
+    inicio = None
+    for periodo in meses(desde, hasta):
+        if periodo in congelados:
+            if inicio:
+                yield inicio, anterior
+            inicio = None
+        else:
+            inicio = inicio or periodo
+        anterior = periodo
+    if inicio:
+        yield inicio, anterior
+
+
+def filas(desde=None, hasta=None, chunk_size=2000):
+    """
+    Celdas del cubo de ``desde`` a ``hasta`` como tuplas de ``CAMPOS_CUBO``
+    más ``cerrado``: las de meses cerrados desde ``CuboMensual``, las demás en vivo.
+    """
+    if desde is None or hasta is None:
+        rango = rango_datos()
+        if rango is None:
+            return
+        desde, hasta = desde or rango[0], hasta or rango[1]
+    desde, hasta = mes(desde), mes(hasta)
+    congelados = cerrados(desde, hasta)
+    tramos = dict(_tramos_abiertos(desde, hasta, congelados))
+    guardadas = (
+        CuboMensual.objects.filter(periodo__gte=desde, periodo__lte=hasta)
+        .order_by('periodo', 'pk').values_list(*CAMPOS_CUBO).iterator(chunk_size=chunk_size)
+    )
+    # Intercala por mes las celdas congeladas (ya ordenadas) con los tramos en vivo
+    siguiente = next(guardadas, None)
+    for periodo in meses(desde, hasta):
+        if periodo in tramos:
+            for celda in calcular(periodo, tramos[periodo], chunk_size):
+                yield tuple(getattr(celda, campo) for campo in CAMPOS_CUBO) + (False,)
+        while siguiente is not None and siguiente[0] == periodo:
+            yield siguiente + (True,)
+            siguiente = next(guardadas, None)
+
+
+def diferencias(periodo):
+    """{hecho: (USD congelado, USD actual)} de los hechos cuyo total cambió desde el cierre."""
+    periodo = mes(periodo)
+    congelado = {
+        hecho: total.quantize(CENTAVO) for hecho, total in
+        CuboMensual.objects.filter(periodo=periodo).values_list('hecho').annotate(total=Sum('monto_usd')).order_by()
+    }
+    actual = _totales(calcular(periodo, periodo))
+    return {
+        hecho: (congelado.get(hecho, CERO), actual.get(hecho, CERO))
+        for hecho in HECHOS if congelado.get(hecho, CERO) != actual.get(hecho, CERO)
+    }
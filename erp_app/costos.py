@@ -0,0 +1,150 @@
+"""
+Motor de costos y márgenes por orden de venta.
+
+Todo se calcula con unas pocas consultas agrupadas (una por tabla de costos o
+ingresos) y se combina en memoria con ``Decimal``, sin recorrer instancias del
+ORM fila por fila:
+
+* costo de materia prima: precio medio ponderado por kg de las compras;
+* costo de procesamiento: materia prima consumida (``kg_entrada``) más
+  maquila, repartido sobre los kg producidos (``kg_salida_real``), lo que
+  traslada la merma al costo por kg de cada producto terminado;
+* logística: servicios de los embarques de cada orden, repartidos entre sus
+  ítems según los kg.
+
+Un producto sin operaciones de procesamiento no tiene costo conocido: sus
+líneas marcan el ``Margen`` como ``sin_costo`` y su margen queda en ``None``
+en vez de contarse como ingreso puro.
+
+Los montos en CLP se convierten con la tasa vigente en la fecha de cada
+documento (ver ``erp_app.tipo_cambio``).
+"""
+from collections import defaultdict
+from dataclasses import dataclass
+from decimal import Decimal
+
+from django.db.models import DecimalField, F, Sum
+
+from .models import (
+    CompraMateriaPrima, OperacionProcesamiento, CostoMaquila,
+    ItemOrdenVenta, ServicioLogistico
+)
+from .tipo_cambio import a_usd, fecha_de_conversion
+
+CERO = Decimal(0)
+IMPORTE = DecimalField(max_digits=20, decimal_places=4)
+
+
+@dataclass
+class Margen:
+    kg: Decimal = CERO
+    ingreso: Decimal = CERO
+    costo_producto: Decimal = CERO
+    logistica: Decimal = CERO
+    # Alguna línea es de un producto sin costo conocido
+    sin_costo: bool = False
+
+    @property
+    def margen(self):
+        if self.sin_costo:
+            return None
+        return self.ingreso - self.costo_producto - self.logistica
+
+    @property
+    def margen_pct(self):
+        return self.margen / self.ingreso * 100 if self.ingreso and not self.sin_costo else None
+
+    def sumar(self, kg, ingreso, costo_producto, logistica):
+        """``costo_producto`` es ``None`` si el producto no tiene costo conocido."""
+        self.kg += kg
+        self.ingreso += ingreso
+        if costo_producto is None:
+            self.sin_costo = True
+        else:
+            self.costo_producto += costo_producto
+        self.logistica += logistica
+
+
+def costo_unitario_productos(hasta=None):
+    """
+    Costo en USD por kg de cada producto terminado, con compras y procesos hasta
+    ``hasta``. Los productos sin kg producidos no figuran.
+    """
+    compras = CompraMateriaPrima.objects.all()
+    operaciones = OperacionProcesamiento.objects.all()
+    maquila = CostoMaquila.objects.all()
+    if hasta:
+        compras = compras.filter(fecha__lte=hasta)
+        operaciones = operaciones.filter(fecha__lte=hasta)
+        maquila = maquila.filter(operacion__fecha__lte=hasta)
+
+    kg_comprados = defaultdict(Decimal)
+    monto_compras = defaultdict(Decimal)
+    filas = compras.values_list('materia_prima', 'moneda', fecha_de_conversion('fecha')).annotate(
+        kg=Sum('cantidad_kg'),
+        monto=Sum(F('cantidad_kg') * F('precio_por_kg'), output_field=IMPORTE),
+    ).order_by()
+    for mp_id, moneda, fecha, kg, monto in filas:
+        kg_comprados[mp_id] += kg
+        monto_compras[mp_id] += a_usd(monto, moneda, fecha)
+    precio_mp = {mp_id: monto_compras[mp_id] / kg for mp_id, kg in kg_comprados.items() if kg}
+
+    costo_total = defaultdict(Decimal)
+    kg_producidos = defaultdict(Decimal)
+    filas = operaciones.values_list('materia_prima', 'producto_terminado').annotate(
+        entrada=Sum('kg_entrada'), salida=Sum('kg_salida_real'),
+    ).order_by()
+    for mp_id, pt_id, entrada, salida in filas:
+        costo_total[pt_id] += entrada * precio_mp.get(mp_id, CERO)
+        kg_producidos[pt_id] += salida
+    filas = maquila.values_list('operacion__producto_terminado', 'moneda', fecha_de_conversion('fecha')).annotate(
+        monto=Sum('monto'),
+    ).order_by()
+    for pt_id, moneda, fecha, monto in filas:
+        costo_total[pt_id] += a_usd(monto, moneda, fecha)
+
+    return {pt_id: costo_total[pt_id] / kg for pt_id, kg in kg_producidos.items() if kg}
+
+
+def calcular_margenes(desde=None, hasta=None):
+    """
+    Márgenes de las órdenes con fecha entre ``desde`` y ``hasta``. Devuelve un
+    diccionario con las claves 'ordenes', 'productos' y 'clientes', cada una
+    mapeando el id correspondiente a un ``Margen``.
+    """
+    costos = costo_unitario_productos(hasta)
+    items = ItemOrdenVenta.objects.all()
+    servicios = ServicioLogistico.objects.all()
+    if desde:
+        items = items.filter(orden__fecha__gte=desde)
+        servicios = servicios.filter(embarque__orden_venta__fecha__gte=desde)
+    if hasta:
+        items = items.filter(orden__fecha__lte=hasta)
+        servicios = servicios.filter(embarque__orden_venta__fecha__lte=hasta)
+
+    lineas = list(items.values_list('orden', 'orden__cliente', 'producto').annotate(
+        kg=Sum('cantidad_kg'),
+        ingreso=Sum(F('cantidad_kg') * F('precio_por_kg'), output_field=IMPORTE),
+    ).order_by())
+    kg_orden = defaultdict(Decimal)
+    for orden_id, _, _, kg, _ in lineas:
+        kg_orden[orden_id] += kg
+    logistica_orden = defaultdict(Decimal)
+    filas = servicios.values_list(
+        'embarque__orden_venta', 'moneda', fecha_de_conversion('fecha_vencimiento'),
+    ).annotate(monto=Sum('monto')).order_by()
+    for orden_id, moneda, fecha, monto in filas:
+        logistica_orden[orden_id] += a_usd(monto, moneda, fecha)
+
+    reporte = {
+        'ordenes': defaultdict(Margen),
+        'productos': defaultdict(Margen),
+        'clientes': defaultdict(Margen),
+    }
+    for orden_id, cliente_id, pt_id, kg, ingreso in lineas:
+        costo = kg * costos[pt_id] if pt_id in costos else None
+        logistica = logistica_orden[orden_id] * kg / kg_orden[orden_id] if kg_orden[orden_id] else CERO
+        reporte['ordenes'][orden_id].sumar(kg, ingreso, costo, logistica)
+        reporte['productos'][pt_id].sumar(kg, ingreso, costo, logistica)
+        reporte['clientes'][cliente_id].sumar(kg, ingreso, costo, logistica)
+    return {clave: dict(valores) for clave, valores in reporte.items()}
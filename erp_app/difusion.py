@@ -0,0 +1,94 @@
+"""
+Difusión de métricas del dashboard por server-sent events.
+
+Un solo ``Difusor`` por proceso consulta la instantánea de métricas cada
+``DASHBOARD_SSE_INTERVALO`` segundos mientras haya suscriptores y despierta a
+todos cuando cambia. Así, cualquier cantidad de pantallas abiertas cuesta una
+lectura de caché por intervalo y ningún hilo por espectador.
+
+El flujo solo se sirve bajo ASGI (ver ``views.dashboard_eventos``), donde el
+servidor corre un único event loop por proceso. El evento y la tarea de
+sondeo pertenecen a ese loop; si el difusor se usa desde otro loop (por
+ejemplo, en pruebas), los vuelve a crear allí y conserva la instantánea.
+"""
+import asyncio
+import json
+
+from django.conf import settings
+
+from .metricas import aobtener_snapshot
+
+LATIDO = 15         # segundos sin cambios antes de enviar un comentario de latido
+DURACION = 300      # segundos por conexión; el navegador reconecta solo
+REINTENTO_MS = 3000
+
+_difusor = None
+
+
+def _comparable(snapshot):
+    return {clave: valor for clave, valor in (snapshot or {}).items() if clave != 'generado'}
+
+
+class Difusor:
+    def __init__(self, intervalo):
+        self.intervalo = intervalo
+        self.snapshot = None
+        self.version = 0
+        self.suscriptores = 0
+        self._loop = None
+        self._cambio = None
+        self._tarea = None
+
+    def _preparar(self):
+        loop = asyncio.get_running_loop()
+        if loop is not self._loop:
+            self._loop = loop
+            self._cambio = asyncio.Event()
+            self._tarea = None
+        if self._tarea is None or self._tarea.done():
+            self._tarea = loop.create_task(self._sondear())
+
+    async def _sondear(self):
+        while self.suscriptores:
+            snapshot = await aobtener_snapshot()
+            if _comparable(snapshot) != _comparable(self.snapshot):
+                self.snapshot = snapshot
+                self.version += 1
+                self._cambio.set()
+                self._cambio = asyncio.Event()
+            await asyncio.sleep(self.intervalo)
+
+    async def esperar(self, version, timeout=LATIDO):
+        """(versión, instantánea) más nueva que ``version``, o None si no hubo cambios en ``timeout``."""
+        self._preparar()
+        if self.version <= version:
+            try:
+                await asyncio.wait_for(self._cambio.wait(), timeout)
+            except TimeoutError:
+                return None
+        return self.version, self.snapshot
+
+    async def eventos(self):
+        """Genera el flujo SSE para un suscriptor."""
+        self.suscriptores += 1
+        try:
+            yield f'retry: {REINTENTO_MS}\n\n'
+            loop = asyncio.get_running_loop()
+            fin = loop.time() + DURACION
+            version = 0
+            while loop.time() < fin:
+                cambio = await self.esperar(version)
+                if cambio is None:
+                    yield ': latido\n\n'
+                    continue
+                version, snapshot = cambio
+                yield f'id: {version}\nevent: metricas\ndata: {json.dumps(snapshot)}\n\n'
+        finally:
+            self.suscriptores -= 1
+
+
+def difusor():
+    global _difusor
+    if _difusor is None:
+        _difusor = Difusor(getattr(settings, 'DASHBOARD_SSE_INTERVALO', 5))
+    return _difusor
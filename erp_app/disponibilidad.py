@@ -0,0 +1,173 @@
+"""
+Disponible para prometer (``stock_kg - reservado_kg``), con reservas por ítem de las órdenes
+confirmadas aún sin embarque.
+"""
+from collections import defaultdict
+from decimal import Decimal
+
+from django.core.exceptions import ValidationError
+from django.db import transaction
+from django.db.models import DecimalField, ExpressionWrapper, F, Max, Q, Sum, Value
+from django.db.models.functions import Coalesce
+
+from . import catalogos
+from .inventario import bloquear_stock
+from .models import InventarioProductoFinal, ItemOrdenVenta, OrdenVenta, ProductoTerminado, ReservaStock
+from .transacciones import atomic_con_reintentos
+
+KG = DecimalField(max_digits=15, decimal_places=3)
+# Ítems que deben tener reserva
+RESERVABLES = Q(orden__estado='confirmada', orden__embarque__isnull=True)
+
+
+class StockInsuficiente(ValidationError):
+    """``faltantes`` mapea cada producto que no alcanza a (kg pedidos, kg disponibles)."""
+
+    def __init__(self, orden, faltantes):
+        self.orden = orden
+        self.faltantes = faltantes
+        detalle = '; '.join(
+            f"{catalogos.etiqueta(ProductoTerminado, pk) or pk}: pide {pedido} kg, hay {disponible} kg disponibles"
+            for pk, (pedido, disponible) in sorted(faltantes.items())
+        )
+        super().__init__(f"Stock insuficiente para confirmar {orden}: {detalle}.")
+
+
+def sincronizar_items(items, anular=False):
+    """Ajusta las reservas de los ítems a su orden (confirmada y sin embarque) y devuelve los ids que cambiaron."""
+    items = list(items)
+    if not items:
+        return []
+    reservables = set() if anular else set(
+        OrdenVenta.objects.filter(pk__in={item.orden_id for item in items}, estado='confirmada', embarque__isnull=True)
+        .values_list('pk', flat=True)
+    )
+    deseadas = {
+        item.pk: (item.producto_id, item.cantidad_kg) for item in items
+        if item.orden_id in reservables and item.cantidad_kg
+    }
+    ids = sorted(item.pk for item in items)
+    with transaction.atomic():
+        # Bloquear los ítems antes que el stock, en el mismo orden que el libro de inventario
+        list(ItemOrdenVenta.objects.select_for_update().filter(pk__in=ids).order_by('pk').values_list('pk', flat=True))
+        guardadas = {
+            pk: (producto_id, kg)
+            for pk, producto_id, kg in ReservaStock.objects.filter(item_orden_id__in=ids)
+            .values_list('item_orden_id', 'producto_id', 'cantidad_kg')
+        }
+        deltas = defaultdict(Decimal)
+        cambiados = []
+        for pk in ids:
+            antes, despues = guardadas.get(pk), deseadas.get(pk)
+            if antes == despues:
+                continue
+            cambiados.append(pk)
+            if antes:
+                deltas[antes[0]] -= antes[1]
+            if despues:
+                deltas[despues[0]] += despues[1]
+        if not cambiados:
+            return []
+        bloquear_stock(InventarioProductoFinal, 'producto_id', sorted(deltas))
+        ReservaStock.objects.filter(item_orden_id__in=cambiados).delete()
+        ReservaStock.objects.bulk_create(
+            ReservaStock(item_orden_id=pk, producto_id=deseadas[pk][0], cantidad_kg=deseadas[pk][1])
+            for pk in cambiados if pk in deseadas
+        )
+        for producto_id, delta in deltas.items():
+            if delta:
+                InventarioProductoFinal.objects.filter(producto_id=producto_id).update(
+                    reservado_kg=F('reservado_kg') + delta
+                )
+    return cambiados
+
+
+def sincronizar_ordenes(ids, anular=False):
+    return sincronizar_items(ItemOrdenVenta.objects.filter(orden_id__in=list(ids)), anular)
+
+
+def faltantes(orden_id):
+    """
+    {producto_id: (pedido, disponible)} de las líneas de la orden que no
+    caben en lo disponible, en una sola consulta. Las reservas de la propia
+    orden cuentan como disponibles, así que revalidar una orden confirmada es posible.
+    """
+    inventario = 'producto__inventarioproductofinal__'
+    filas = (
+        ItemOrdenVenta.objects.filter(orden_id=orden_id).order_by().values('producto_id')
+        .annotate(
+            pedido=Sum('cantidad_kg'),
+            propio=Coalesce(Sum('reserva__cantidad_kg'), Value(Decimal(0)), output_field=KG),
+            stock=Coalesce(Max(f'{inventario}stock_kg'), Value(Decimal(0)), output_field=KG),
+            reservado=Coalesce(Max(f'{inventario}reservado_kg'), Value(Decimal(0)), output_field=KG),
+        )
+        .annotate(disponible=ExpressionWrapper(F('stock') - F('reservado') + F('propio'), output_field=KG))
+        .filter(pedido__gt=F('disponible'))
+        .values_list('producto_id', 'pedido', 'disponible')
+    )
+    return {pk: (pedido, disponible) for pk, pedido, disponible in filas}
+
+
+@atomic_con_reintentos()
+def confirmar(orden):
+    """Confirma la orden y reserva su stock, o lanza ``StockInsuficiente`` sin cambiar nada."""
+    estado = OrdenVenta.objects.select_for_update().values_list('estado', flat=True).get(pk=orden.pk)
+    items = list(ItemOrdenVenta.objects.select_for_update().filter(orden_id=orden.pk).order_by('pk'))
+    bloquear_stock(InventarioProductoFinal, 'producto_id', sorted({item.producto_id for item in items}))
+    faltan = faltantes(orden.pk)
+    if faltan:
+        raise StockInsuficiente(orden, faltan)
+    if estado == 'confirmada':
+        sincronizar_items(items)
+    else:
+        # La señal de la orden reserva sus ítems
+        orden.estado = 'confirmada'
+        orden.save(update_fields=['estado'])
+    return orden
+
+
+def confirmar_ordenes(ordenes):
+    """Confirma cada orden en su propia transacción: {pk: None si se confirmó, o el error}."""
+    resultados = {}
+    for orden in ordenes:
+        try:
+            confirmar(orden)
+            resultados[orden.pk] = None
+        except StockInsuficiente as exc:
+            resultados[orden.pk] = exc
+    return resultados
+
+
+def disponible(productos=None):
+    """{producto_id: kg disponibles para prometer}."""
+    filas = InventarioProductoFinal.objects.all()
+    if productos is not None:
+        filas = filas.filter(producto_id__in=productos)
+    return dict(filas.values_list('producto_id').annotate(disponible=F('stock_kg') - F('reservado_kg')).order_by())
+
+
+def diferencias():
+    """Compara ``reservado_kg`` con las reservas que corresponden a las órdenes: {producto_id: (guardado, esperado)}."""
+    esperado = dict(
+        ItemOrdenVenta.objects.filter(RESERVABLES).order_by().values('producto_id')
+        .annotate(kg=Sum('cantidad_kg')).values_list('producto_id', 'kg')
+    )
+    guardado = dict(InventarioProductoFinal.objects.exclude(reservado_kg=0).values_list('producto_id', 'reservado_kg'))
+    return {
+        pk: (guardado.get(pk, Decimal(0)), esperado.get(pk, Decimal(0)))
+        for pk in sorted(guardado.keys() | esperado.keys()) if guardado.get(pk, 0) != esperado.get(pk, 0)
+    }
+
+
+def recalcular(lote=2000):
+    """Reconstruye reservas y totales reservados desde las órdenes confirmadas sin embarque."""
+    with transaction.atomic():
+        ReservaStock.objects.all().delete()
+        InventarioProductoFinal.objects.exclude(reservado_kg=0).update(reservado_kg=0)
+        bloque = []
+        for item in ItemOrdenVenta.objects.filter(RESERVABLES).order_by('pk').iterator(chunk_size=lote):
+            bloque.append(item)
+            if len(bloque) >= lote:
+                sincronizar_items(bloque)
+                bloque = []
+        sincronizar_items(bloque)
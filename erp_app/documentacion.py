@@ -0,0 +1,76 @@
+"""
+Preparación de la documentación de exportación.
+
+Cada ``DocumentacionExportacion`` tiene una máscara de los documentos
+presentes (``documentos``) y su porcentaje (``completitud``) en columnas que
+genera la base, así que siguen al día también tras ``update()`` o
+``bulk_update()``; en una instancia recién grabada se leen con
+``refresh_from_db()``. Los envíos pendientes con documentos faltantes están cubiertos por un índice
+parcial sobre ``plazo_envio_courier``, así que la cola de riesgo es una sola
+consulta por rango de plazo.
+
+El tramo de plazo (vencido, crítico, próximo, holgado) cambia con el día, por
+lo que no se guarda: se deriva al consultar comparando el plazo indexado con
+fechas fijas calculadas desde hoy.
+"""
+from datetime import timedelta
+
+from django.db.models import Case, CharField, Q, Value, When
+from django.utils import timezone
+
+from .models import DocumentacionExportacion
+
+# (tramo, etiqueta, días hasta el plazo desde, hasta); None deja el extremo abierto
+TRAMOS = [
+    ('vencido', 'Vencido', None, -1),
+    ('critico', 'Vence en 0 a 2 días', 0, 2),
+    ('proximo', 'Vence en 3 a 7 días', 3, 7),
+    ('holgado', 'Más de 7 días', 8, None),
+]
+# Tramos que forman la cola de riesgo
+TRAMOS_RIESGO = ('vencido', 'critico', 'proximo')
+# Filas que muestra la página de la cola
+FILAS_COLA = 500
+# Misma condición que el índice parcial doc_riesgo_plazo_idx
+INCOMPLETOS = Q(estado_envio='pendiente', completitud__lt=100)
+
+
+def incompletos():
+    """Envíos pendientes con documentos faltantes."""
+    return DocumentacionExportacion.objects.filter(INCOMPLETOS)
+
+
+def filtro_tramo(tramo, hoy=None):
+    hoy = hoy or timezone.localdate()
+    _, _, desde, hasta = next(t for t in TRAMOS if t[0] == tramo)
+    filtro = Q()
+    if desde is not None:
+        filtro &= Q(plazo_envio_courier__gte=hoy + timedelta(days=desde))
+    if hasta is not None:
+        filtro &= Q(plazo_envio_courier__lte=hoy + timedelta(days=hasta))
+    return filtro
+
+
+def con_tramo(queryset, hoy=None):
+    hoy = hoy or timezone.localdate()
+    return queryset.annotate(tramo_plazo=Case(
+        *(When(filtro_tramo(tramo, hoy), then=Value(tramo)) for tramo, *_ in TRAMOS),
+        output_field=CharField(),
+    ))
+
+
+def en_riesgo(hoy=None):
+    """Cola de riesgo: envíos incompletos en los tramos de ``TRAMOS_RIESGO``, del más urgente al menos urgente."""
+    hoy = hoy or timezone.localdate()
+    # Los tramos de riesgo son contiguos desde el vencido: basta un rango sobre el plazo
+    dias = max(hasta for tramo, _, _, hasta in TRAMOS if tramo in TRAMOS_RIESGO)
+    queryset = incompletos().filter(plazo_envio_courier__lte=hoy + timedelta(days=dias))
+    return con_tramo(queryset, hoy).select_related('embarque').order_by('plazo_envio_courier', 'pk')
+
+
+def faltantes(documentacion):
+    return [
+        DocumentacionExportacion._meta.get_field(campo).verbose_name
+        for i, campo in enumerate(DocumentacionExportacion.DOCUMENTOS)
+        if not documentacion.documentos & (1 << i)
+    ]
@@ -0,0 +1,199 @@
+"""
+Exportación en streaming a CSV o XLSX.
+
+Las filas se leen con ``values_list(...).iterator(chunk_size=...)`` y se
+escriben a medida que llegan, sin instanciar modelos ni cargar el resultado
+completo: la memoria usada es la de un bloque, sin importar cuántas filas se
+exporten. XLSX requiere ``openpyxl`` (``pip install openpyxl``), que en modo
+``write_only`` vuelca las filas a un archivo temporal.
+
+Las respuestas sirven el iterador síncrono tanto bajo WSGI como bajo ASGI; en
+ASGI cada bloque se pide con ``sync_to_async`` en vez de cargar el contenido
+completo en una lista, como haría ``StreamingHttpResponse``.
+
+Cada reporte de ``REPORTES`` es una función que recibe los parámetros del
+reporte y devuelve ``(encabezados, filas)``.
+"""
+import csv
+import io
+import tempfile
+from functools import cache
+from importlib.util import find_spec
+
+from asgiref.sync import sync_to_async
+from django.http import FileResponse, StreamingHttpResponse
+
+from . import catalogos, cierre
+from .costos import calcular_margenes
+from .models import (
+    Cliente, MateriaPrima, ProductoTerminado, Proveedor, ProveedorServicio,
+    InventarioMateriaPrima, InventarioProductoFinal, ItemOrdenVenta, ServicioLogistico
+)
+from .tipo_cambio import a_usd
+
+CHUNK_SIZE = 2000
+FILAS_POR_BLOQUE = 1000
+
+
+class BloquesAsincronosMixin:
+    async def __aiter__(self):
+        if self.is_async:
+            async for parte in self.streaming_content:
+                yield parte
+            return
+        contenido = iter(self.streaming_content)
+        siguiente = sync_to_async(next, thread_sensitive=True)
+        fin = object()
+        while (parte := await siguiente(contenido, fin)) is not fin:
+            yield parte
+
+
+class RespuestaStreaming(BloquesAsincronosMixin, StreamingHttpResponse):
+    pass
+
+
+class RespuestaArchivo(BloquesAsincronosMixin, FileResponse):
+    pass
+
+
+@cache
+def formatos():
+    # openpyxl se importa recién al escribir un XLSX: tarda más en cargar que todo erp_app
+    return ['csv', 'xlsx'] if find_spec('openpyxl') is not None else ['csv']
+
+
+def columnas(modelo, campos=None):
+    """Campos a exportar: los indicados o todos los campos concretos del modelo."""
+    return list(campos) if campos else [campo.name for campo in modelo._meta.concrete_fields]
+
+
+def filas_queryset(queryset, campos, chunk_size=CHUNK_SIZE):
+    return queryset.values_list(*campos).iterator(chunk_size=chunk_size)
+
+
+def bloques_csv(encabezados, filas, filas_por_bloque=FILAS_POR_BLOQUE):
+    """Genera el CSV en bloques de texto de ``filas_por_bloque`` filas."""
+    buffer = io.StringIO()
+    escritor = csv.writer(buffer)
+    escritor.writerow(encabezados)
+    for n, fila in enumerate(filas, 1):
+        escritor.writerow(fila)
+        if n % filas_por_bloque == 0:
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+    yield buffer.getvalue()
+
+
+def escribir_xlsx(destino, encabezados, filas, hoja='datos'):
+    if 'xlsx' not in formatos():
+        raise RuntimeError("La exportación a XLSX requiere openpyxl.")
+    from openpyxl import Workbook
+
+    libro = Workbook(write_only=True)
+    hoja = libro.create_sheet(hoja)
+    hoja.append(list(encabezados))
+    for fila in filas:
+        hoja.append(list(fila))
+    libro.save(destino)
+
+
+def respuesta(nombre, formato, encabezados, filas):
+    if formato == 'xlsx':
+        archivo = tempfile.TemporaryFile()
+        escribir_xlsx(archivo, encabezados, filas)
+        archivo.seek(0)
+        return RespuestaArchivo(archivo, as_attachment=True, filename=f'{nombre}.xlsx')
+    response = RespuestaStreaming(bloques_csv(encabezados, filas), content_type='text/csv; charset=utf-8')
+    response['Content-Disposition'] = f'attachment; filename="{nombre}.csv"'
+    return response
+
+
+def reporte_items_orden(desde=None, hasta=None, **params):
+    campos = [
+        'orden', 'orden__fecha', 'orden__cliente__nombre', 'orden__estado',
+        'producto', 'producto__nombre', 'producto__presentacion', 'cantidad_kg', 'precio_por_kg', 'subtotal',
+    ]
+    queryset = ItemOrdenVenta.objects.with_subtotal().order_by('orden', 'pk')
+    if desde:
+        queryset = queryset.filter(orden__fecha__gte=desde)
+    if hasta:
+        queryset = queryset.filter(orden__fecha__lte=hasta)
+    return campos, filas_queryset(queryset, campos)
+
+
+def reporte_margenes(por='clientes', desde=None, hasta=None, **params):
+    reporte = calcular_margenes(desde, hasta)[por]
+    nombres = {}
+    # Los nombres de productos y clientes son catálogos pequeños; las órdenes se exportan por id
+    if por != 'ordenes':
+        modelo = {'productos': ProductoTerminado, 'clientes': Cliente}[por]
+        nombres = {pk: str(obj) for pk, obj in modelo.objects.in_bulk(list(reporte)).items()}
+    encabezados = ['id', 'nombre', 'kg', 'ingreso_usd', 'costo_producto_usd', 'logistica_usd', 'margen_usd', 'margen_pct']
+
+    def fila(pk, m):
+        if m.sin_costo:
+            margen = ['sin costo', 'sin costo']
+        else:
+            margen = [round(m.margen, 2), round(m.margen_pct, 2) if m.margen_pct is not None else None]
+        return [pk, nombres.get(pk, ''), m.kg, round(m.ingreso, 2), round(m.costo_producto, 2), round(m.logistica, 2), *margen]
+
+    filas = (fila(pk, m) for pk, m in sorted(reporte.items()))
+    return encabezados, filas
+
+
+def reporte_inventario(**params):
+    def filas():
+        for fila in filas_queryset(
+            InventarioMateriaPrima.objects.order_by('materia_prima'), ['materia_prima', 'materia_prima__nombre', 'stock_kg']
+        ):
+            yield ('materia_prima', fila[0], fila[1], '', fila[2])
+        for fila in filas_queryset(
+            InventarioProductoFinal.objects.order_by('producto'),
+            ['producto', 'producto__nombre', 'producto__presentacion', 'stock_kg'],
+        ):
+            yield ('producto_terminado',) + fila
+    return ['tipo', 'id', 'nombre', 'presentacion', 'stock_kg'], filas()
+
+
+def reporte_cuentas_por_pagar(estado_pago=None, desde=None, hasta=None, **params):
+    campos = [
+        'pk', 'embarque__orden_venta', 'proveedor__nombre', 'documento_referencia',
+        'fecha_vencimiento', 'estado_pago', 'monto', 'moneda',
+    ]
+    queryset = ServicioLogistico.objects.order_by('fecha_vencimiento', 'pk')
+    if estado_pago:
+        queryset = queryset.filter(estado_pago=estado_pago)
+    if desde:
+        queryset = queryset.filter(fecha_vencimiento__gte=desde)
+    if hasta:
+        queryset = queryset.filter(fecha_vencimiento__lte=hasta)
+    filas = (
+        fila + (round(a_usd(fila[6], fila[7], fila[4]), 2),)
+        for fila in filas_queryset(queryset, campos)
+    )
+    return campos + ['monto_usd'], filas
+
+
+def reporte_cubo_mensual(desde=None, hasta=None, **params):
+    """Cubo mensual: meses cerrados desde las tablas de cierre, los abiertos calculados en vivo."""
+    # Mismo orden que cierre.DIMENSIONES; las etiquetas salen de la caché de catálogos
+    modelos = (ProductoTerminado, MateriaPrima, Cliente, Proveedor, ProveedorServicio)
+    encabezados = ['periodo', 'hecho', *cierre.DIMENSIONES, 'moneda', 'kg', 'monto', 'monto_usd', 'documentos', 'cerrado']
+    dimensiones = len(cierre.DIMENSIONES)
+    filas = (
+        [f'{fila[0]:%Y-%m}', fila[1]]
+        + [catalogos.etiqueta(modelo, pk) if pk else '' for modelo, pk in zip(modelos, fila[2:2 + dimensiones])]
+        + list(fila[2 + dimensiones:])
+        for fila in cierre.filas(desde, hasta)
+    )
+    return encabezados, filas
+
+
+REPORTES = {
+    'items_orden': reporte_items_orden,
+    'cuentas_por_pagar': reporte_cuentas_por_pagar,
+    'margenes': reporte_margenes,
+    'inventario': reporte_inventario,
+    'cubo_mensual': reporte_cubo_mensual,
+}
@@ -0,0 +1,215 @@
+"""
+Proyección de flujo de caja: partidas por documento y totales semanales y mensuales en
+``FlujoCaja`` que se actualizan por diferencia.
+"""
+from collections import defaultdict
+from datetime import timedelta
+from decimal import Decimal, ROUND_HALF_UP
+
+from django.db import transaction
+from django.db.models import F, Q, Sum
+from django.utils import timezone
+
+from .models import OrdenVenta, ServicioLogistico, PartidaFlujoCaja, FlujoCaja
+from .tipo_cambio import a_usd
+
+CENTAVO = Decimal('0.01')
+TRAMOS_ANTIGUEDAD = [(1, 30), (31, 60), (61, 90), (91, None)]
+
+
+def inicio_periodo(fecha, periodo):
+    if periodo == 'semana':
+        return fecha - timedelta(days=fecha.weekday())
+    return fecha.replace(day=1)
+
+
+def _aplicar(deltas):
+    """Suma los deltas {(periodo, inicio, tipo, moneda): monto} a los totales, bloqueando en orden."""
+    deltas = {clave: monto for clave, monto in deltas.items() if monto}
+    if not deltas:
+        return
+    claves = sorted(deltas)
+    FlujoCaja.objects.bulk_create(
+        [FlujoCaja(periodo=p, inicio=i, tipo=t, moneda=m) for p, i, t, m in claves], ignore_conflicts=True,
+    )
+    for periodo, inicio, tipo, moneda in claves:
+        FlujoCaja.objects.filter(periodo=periodo, inicio=inicio, tipo=tipo, moneda=moneda).update(
+            monto=F('monto') + deltas[(periodo, inicio, tipo, moneda)]
+        )
+
+
+def _sincronizar(campo, deseadas):
+    """
+    ``deseadas`` mapea el id de cada documento a sus partidas como tuplas
+    (tipo, concepto, fecha, moneda, monto); una lista vacía las elimina.
+    """
+    if not deseadas:
+        return
+    with transaction.atomic():
+        guardadas = defaultdict(list)
+        filas = (
+            PartidaFlujoCaja.objects.select_for_update()
+            .filter(**{f'{campo}__in': list(deseadas)})
+            .values_list(campo, 'tipo', 'concepto', 'fecha', 'moneda', 'monto')
+        )
+        for doc_id, *partida in filas:
+            guardadas[doc_id].append(tuple(partida))
+
+        deltas = defaultdict(Decimal)
+        cambiados = []
+        nuevas = []
+        for doc_id, partidas in deseadas.items():
+            partidas = sorted(p for p in partidas if p[4])
+            if partidas == sorted(guardadas[doc_id]):
+                continue
+            cambiados.append(doc_id)
+            for signo, lista in ((-1, guardadas[doc_id]), (1, partidas)):
+                for tipo, _, fecha, moneda, monto in lista:
+                    for periodo in ('semana', 'mes'):
+                        deltas[(periodo, inicio_periodo(fecha, periodo), tipo, moneda)] += signo * monto
+            nuevas.extend(
+                PartidaFlujoCaja(tipo=t, concepto=c, fecha=f, moneda=m, monto=monto, **{f'{campo}_id': doc_id})
+                for t, c, f, m, monto in partidas
+            )
+        if not cambiados:
+            return
+        PartidaFlujoCaja.objects.filter(**{f'{campo}__in': cambiados}).delete()
+        PartidaFlujoCaja.objects.bulk_create(nuevas)
+        _aplicar(deltas)
+
+
+def partidas_servicio(servicio):
+    if servicio.estado_pago != 'pendiente':
+        return []
+    return [('pago', 'servicio', servicio.fecha_vencimiento, servicio.moneda, servicio.monto)]
+
+
+def partidas_orden(orden):
+    adelanto = (orden.total_usd * orden.porcentaje_adelanto / 100).quantize(CENTAVO, ROUND_HALF_UP)
+    return [
+        ('cobro', 'adelanto', orden.fecha, 'USD', adelanto),
+        ('cobro', 'saldo', orden.fecha_estimada_pago_saldo, 'USD', orden.total_usd.quantize(CENTAVO) - adelanto),
+    ]
+
+
+def sincronizar_servicios(servicios, anular=False):
+    _sincronizar('servicio', {s.pk: [] if anular else partidas_servicio(s) for s in servicios})
+
+
+def sincronizar_ordenes(ids, anular=False):
+    """Sincroniza las órdenes indicadas por id; los totales se recalculan en SQL desde los ítems."""
+    ids = list(ids)
+    if anular:
+        _sincronizar('orden', {pk: [] for pk in ids})
+        return
+    deseadas = {pk: [] for pk in ids}
+    for orden in OrdenVenta.objects.filter(pk__in=ids).with_totals():
+        deseadas[orden.pk] = partidas_orden(orden)
+    _sincronizar('orden', deseadas)
+
+
+def proyeccion(periodo='semana', periodos=12, hoy=None):
+    """
+    Filas de la proyección desde el período actual: por cobrar y por pagar en
+    cada moneda y el neto en USD. Los pagos vencidos se acumulan en la primera fila.
+    """
+    hoy = hoy or timezone.localdate()
+    desde = inicio_periodo(hoy, periodo)
+    inicios = [desde]
+    for _ in range(periodos - 1):
+        siguiente = inicios[-1] + timedelta(days=7) if periodo == 'semana' else (inicios[-1] + timedelta(days=32)).replace(day=1)
+        inicios.append(siguiente)
+    hasta = inicios[-1]
+
+    montos = defaultdict(Decimal)
+    totales = FlujoCaja.objects.filter(periodo=periodo, inicio__lte=hasta).values_list('inicio', 'tipo', 'moneda', 'monto')
+    for inicio, tipo, moneda, monto in totales:
+        if inicio < desde:
+            # No hay registro de cobros recibidos, así que los cobros pasados no se proyectan;
+            # los pagos vencidos siguen pendientes y se suman al período actual
+            if tipo != 'pago':
+                continue
+            inicio = desde
+        montos[(inicio, tipo, moneda)] += monto
+
+    filas = []
+    for inicio in inicios:
+        fila = {'inicio': inicio}
+        neto = Decimal(0)
+        for tipo in ('cobro', 'pago'):
+            for moneda in ('USD', 'CLP'):
+                monto = montos[(inicio, tipo, moneda)]
+                fila[f'{tipo}_{moneda.lower()}'] = monto
+                neto += (1 if tipo == 'cobro' else -1) * a_usd(monto, moneda, inicio)
+        fila['neto_usd'] = neto.quantize(CENTAVO)
+        filas.append(fila)
+    return filas
+
+
+def _consultas_antiguedad(hoy):
+    for desde, hasta in TRAMOS_ANTIGUEDAD:
+        filtro = {'tipo': 'pago', 'fecha__lte': hoy - timedelta(days=desde)}
+        if hasta is not None:
+            filtro['fecha__gt'] = hoy - timedelta(days=hasta + 1)
+        tramo = f'{desde}-{hasta}' if hasta is not None else f'+{desde}'
+        yield tramo, PartidaFlujoCaja.objects.filter(**filtro), {
+            'usd': Sum('monto', filter=Q(moneda='USD'), default=Decimal(0)),
+            'clp': Sum('monto', filter=Q(moneda='CLP'), default=Decimal(0)),
+        }
+
+
+def antiguedad_por_pagar(hoy=None):
+    """Pagos pendientes vencidos por tramo de días de atraso y moneda."""
+    hoy = hoy or timezone.localdate()
+    return [
+        {'tramo': tramo, **queryset.aggregate(**totales)}
+        for tramo, queryset, totales in _consultas_antiguedad(hoy)
+    ]
+
+
+def recalcular(lote=2000):
+    """Reconstruye partidas y totales desde cero a partir de todos los documentos."""
+    with transaction.atomic():
+        PartidaFlujoCaja.objects.all().delete()
+        FlujoCaja.objects.all().delete()
+        servicios = ServicioLogistico.objects.filter(estado_pago='pendiente').order_by('pk').iterator(chunk_size=lote)
+        bloque = []
+        for servicio in servicios:
+            bloque.append(servicio)
+            if len(bloque) >= lote:
+                sincronizar_servicios(bloque)
+                bloque = []
+        sincronizar_servicios(bloque)
+        ids = OrdenVenta.objects.order_by('pk').values_list('pk', flat=True)
+        bloque = []
+        for pk in ids.iterator(chunk_size=lote):
+            bloque.append(pk)
+            if len(bloque) >= lote:
+                sincronizar_ordenes(bloque)
+                bloque = []
+        sincronizar_ordenes(bloque)
+
+
+def partidas_esperadas(lote=2000):
+    """Partidas de todos los documentos, calculadas en streaming sin leer ``PartidaFlujoCaja``."""
+    servicios = ServicioLogistico.objects.filter(estado_pago='pendiente').only(
+        'estado_pago', 'fecha_vencimiento', 'moneda', 'monto',
+    )
+    for servicio in servicios.iterator(chunk_size=lote):
+        yield from partidas_servicio(servicio)
+    for orden in OrdenVenta.objects.with_totals().order_by().iterator(chunk_size=lote):
+        yield from partidas_orden(orden)
+
+
+def diferencias(lote=2000):
+    """Compara los totales guardados con los calculados desde los documentos: {clave: (guardado, esperado)}."""
+    esperado = defaultdict(Decimal)
+    for tipo, _, fecha, moneda, monto in partidas_esperadas(lote):
+        for periodo in ('semana', 'mes'):
+            esperado[(periodo, inicio_periodo(fecha, periodo), tipo, moneda)] += monto
+    guardado = {
+        (periodo, inicio, tipo, moneda): monto
+        for periodo, inicio, tipo, moneda, monto in FlujoCaja.objects.values_list('periodo', 'inicio', 'tipo', 'moneda', 'monto')
+    }
+    claves = {clave for clave in guardado.keys() | esperado.keys() if guardado.get(clave, 0) != esperado.get(clave, 0)}
+    return {clave: (guardado.get(clave, Decimal(0)), esperado.get(clave, Decimal(0))) for clave in sorted(claves)}
@@ -0,0 +1,394 @@
+"""
+Importación masiva desde CSV de compras, operaciones de procesamiento (con sus
+costos de maquila) y órdenes de venta (con sus ítems).
+
+Las filas se leen en streaming y se procesan en lotes: cada fila se valida por
+separado y las inválidas se informan con su número de línea sin detener la
+importación; las válidas del lote se insertan con ``bulk_create`` en una
+transacción. Los nombres de proveedores, materias primas, productos y clientes
+se resuelven con diccionarios cargados una sola vez por importación; los que
+faltan, si se pide crearlos, se crean en la transacción del primer lote que
+los usa.
+
+Las operaciones y órdenes ocupan una fila por costo o ítem y se agrupan por la
+columna ``referencia``: la primera fila de cada referencia define la cabecera
+y las siguientes solo agregan costos o ítems. Las compras y operaciones
+marcadas como abastecidas se contabilizan en el libro de inventario en bloque.
+"""
+import csv
+from collections import Counter
+from dataclasses import dataclass, field
+from datetime import date
+from decimal import Decimal, InvalidOperation
+from itertools import islice
+
+from django.db import DatabaseError, transaction
+from django.utils import timezone
+
+from . import disponibilidad, flujo_caja, inventario, metricas, precios, rendimiento
+from .models import (
+    Cliente, MateriaPrima, ProductoTerminado, Proveedor,
+    CompraMateriaPrima, OperacionProcesamiento, CostoMaquila,
+    OrdenVenta, ItemOrdenVenta
+)
+from .transacciones import atomic_con_reintentos
+
+VERDADERO = {'1', 'true', 't', 'si', 'sí', 's', 'x', 'yes', 'y'}
+FALSO = {'', '0', 'false', 'f', 'no', 'n'}
+OBLIGATORIO = object()
+PRODUCTO_POR_DEFECTO = ProductoTerminado._meta.get_field('nombre').default
+
+
+class FilaInvalida(ValueError):
+    pass
+
+
+@dataclass
+class Resultado:
+    filas: int = 0
+    creados: Counter = field(default_factory=Counter)
+    errores: list = field(default_factory=list)
+
+    def error(self, linea, mensaje):
+        self.errores.append((linea, mensaje))
+
+
+def sin_reemplazos(fila):
+    """Rechaza la fila si al decodificarla hubo bytes que no eran UTF-8."""
+    if any('\ufffd' in valor for valor in fila.values() if isinstance(valor, str)):
+        raise FilaInvalida("La fila tiene caracteres que no son UTF-8; guarde el archivo como CSV UTF-8.")
+
+
+def leer_csv(lineas, delimitador=','):
+    """``DictReader`` con los encabezados normalizados a minúsculas."""
+    lector = csv.DictReader(lineas, delimiter=delimitador)
+    lector.fieldnames = [columna.strip().lower() for columna in lector.fieldnames or []]
+    return lector
+
+
+class Nuevo:
+    """Registro de catálogo que falta; se crea al guardar el primer lote que lo usa, en su transacción."""
+
+    def __init__(self, modelo, valores):
+        self.modelo = modelo
+        self.valores = valores
+        self.pk = None
+
+
+class Catalogo:
+    """Resuelve nombres a ids con un diccionario cargado una vez; opcionalmente crea los faltantes."""
+
+    def __init__(self, modelo, campos=('nombre',), crear=False):
+        self.modelo = modelo
+        self.campos = campos
+        self.crear = crear
+        self._ids = None
+
+    @staticmethod
+    def clave(valores):
+        return tuple(' '.join(valor.split()).casefold() for valor in valores)
+
+    def resolver(self, *valores):
+        """Id del registro, o un ``Nuevo`` si no existe y se pueden crear."""
+        if self._ids is None:
+            self._ids = {
+                self.clave(fila): pk for pk, *fila in self.modelo.objects.values_list('pk', *self.campos)
+            }
+        clave = self.clave(valores)
+        nombre = self.modelo._meta.verbose_name
+        if not all(clave):
+            raise FilaInvalida(f"Falta {nombre}.")
+        if clave not in self._ids:
+            if not self.crear:
+                raise FilaInvalida(f"{nombre.capitalize()} desconocido: {' / '.join(valores)}.")
+            self._ids[clave] = Nuevo(
+                self.modelo, {campo: ' '.join(valor.split()) for campo, valor in zip(self.campos, valores)}
+            )
+        return self._ids[clave]
+
+    def confirmar(self, nuevos):
+        """Reemplaza por su id los ``Nuevo`` creados en un lote ya confirmado."""
+        for clave, valor in (self._ids or {}).items():
+            if valor in nuevos:
+                self._ids[clave] = valor.pk
+
+
+def texto(fila, columna, defecto=OBLIGATORIO):
+    valor = (fila.get(columna) or '').strip()
+    if valor:
+        return valor
+    if defecto is OBLIGATORIO:
+        raise FilaInvalida(f"Falta {columna}.")
+    return defecto
+
+
+def decimal(fila, columna, modelo, campo=None, defecto=OBLIGATORIO):
+    """Decimal redondeado a los decimales del campo del modelo y dentro de sus dígitos."""
+    campo = modelo._meta.get_field(campo or columna)
+    valor = (fila.get(columna) or '').strip().replace(',', '.')
+    if not valor:
+        if defecto is OBLIGATORIO:
+            raise FilaInvalida(f"Falta {columna}.")
+        return defecto
+    try:
+        numero = Decimal(valor).quantize(Decimal(1).scaleb(-campo.decimal_places))
+    except InvalidOperation:
+        raise FilaInvalida(f"{columna} no es un número: {valor!r}.")
+    if numero < 0 or len(numero.as_tuple().digits) > campo.max_digits:
+        raise FilaInvalida(f"{columna} fuera de rango: {valor!r}.")
+    return numero
+
+
+def fecha(fila, columna, defecto=OBLIGATORIO):
+    valor = (fila.get(columna) or '').strip()
+    if not valor:
+        if defecto is OBLIGATORIO:
+            raise FilaInvalida(f"Falta {columna}.")
+        return defecto
+    try:
+        return date.fromisoformat(valor)
+    except ValueError:
+        raise FilaInvalida(f"{columna} no es una fecha AAAA-MM-DD: {valor!r}.")
+
+
+def booleano(fila, columna):
+    valor = (fila.get(columna) or '').strip().casefold()
+    if valor in VERDADERO:
+        return True
+    if valor in FALSO:
+        return False
+    raise FilaInvalida(f"{columna} no es sí/no: {valor!r}.")
+
+
+def opcion(fila, columna, modelo, campo=None, defecto=None):
+    campo = modelo._meta.get_field(campo or columna)
+    if defecto is None:
+        defecto = campo.default if campo.has_default() else OBLIGATORIO
+    valor = texto(fila, columna, defecto)
+    if valor not in {clave for clave, _ in campo.choices}:
+        raise FilaInvalida(f"{columna} inválido: {valor!r}.")
+    return valor
+
+
+class Importador:
+    modelos = ()
+
+    def __init__(self, lote=5000, crear_catalogos=False):
+        self.lote = lote
+        self.proveedores = Catalogo(Proveedor, crear=crear_catalogos)
+        self.materias = Catalogo(MateriaPrima, crear=crear_catalogos)
+        self.clientes = Catalogo(Cliente, crear=crear_catalogos)
+        self.productos = Catalogo(ProductoTerminado, ('nombre', 'presentacion'))
+
+    def importar(self, filas, progreso=None):
+        """
+        Importa un iterable de diccionarios (p. ej. ``leer_csv``) y devuelve un
+        ``Resultado``. ``progreso``, si se indica, se llama con el resultado
+        parcial al terminar cada lote.
+        """
+        resultado = Resultado()
+        numeradas = enumerate(filas, start=2)  # la línea 1 es el encabezado
+        while bloque := list(islice(numeradas, self.lote)):
+            self.iniciar_lote()
+            validas = []
+            for linea, fila in bloque:
+                resultado.filas += 1
+                try:
+                    sin_reemplazos(fila)
+                    validas.append((linea, self.validar(linea, fila)))
+                except FilaInvalida as exc:
+                    resultado.error(linea, str(exc))
+            if not validas:
+                continue
+            pendientes = self.pendientes(validas)
+            try:
+                resultado.creados.update(atomic_con_reintentos()(self.guardar_lote)(validas, pendientes))
+            except DatabaseError as exc:
+                resultado.error(
+                    validas[0][0], f"Lote descartado (líneas {validas[0][0]} a {validas[-1][0]}): {exc}",
+                )
+            else:
+                nuevos = {nuevo for _, _, nuevo in pendientes}
+                for catalogo in (self.proveedores, self.materias, self.clientes):
+                    catalogo.confirmar(nuevos)
+            if progreso:
+                progreso(resultado)
+        if resultado.creados:
+            transaction.on_commit(precios.invalidar)
+            transaction.on_commit(metricas.invalidar_snapshot)
+        return resultado
+
+    def iniciar_lote(self):
+        pass
+
+    def objetos(self, validas):
+        """Registros a insertar del lote."""
+        return [obj for _, obj in validas]
+
+    def pendientes(self, validas):
+        """[(registro, attname, Nuevo)] de las FK a catálogos que aún no existen."""
+        return [
+            (obj, field.attname, valor) for obj in self.objetos(validas) for field in obj._meta.concrete_fields
+            if field.is_relation and isinstance(valor := getattr(obj, field.attname), Nuevo)
+        ]
+
+    def guardar_lote(self, validas, pendientes):
+        # Los catálogos faltantes se crean aquí, en la transacción del lote: si se deshace o
+        # ninguna fila válida los usa, no quedan registros huérfanos. Con create() se disparan
+        # las señales de búsqueda, catálogos y auditoría. En un reintento se crean de nuevo.
+        # atomic_con_reintentos no abre transacción si ya hay una: el savepoint descarta el lote igual.
+        creados = Counter()
+        with transaction.atomic():
+            for nuevo in {nuevo for _, _, nuevo in pendientes}:
+                nuevo.pk = nuevo.modelo.objects.create(**nuevo.valores).pk
+                creados[nuevo.modelo._meta.model_name] += 1
+            for obj, attname, nuevo in pendientes:
+                setattr(obj, attname, nuevo.pk)
+            creados.update(self.guardar(validas))
+        return creados
+
+    def validar(self, linea, fila):
+        raise NotImplementedError
+
+    def guardar(self, validas):
+        raise NotImplementedError
+
+
+class ImportadorAgrupado(Importador):
+    """Cabeceras identificadas por ``referencia`` con un hijo por fila."""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.referencias = {}
+
+    def iniciar_lote(self):
+        self.cabeceras = {}
+
+    def objetos(self, validas):
+        return [*self.cabeceras.values(), *(hijo for _, (_, hijo) in validas if hijo is not None)]
+
+    def validar(self, linea, fila):
+        referencia = (fila.get('referencia') or '').strip() or f'#{linea}'
+        if referencia not in self.referencias and referencia not in self.cabeceras:
+            cabecera = self.validar_cabecera(fila)
+        else:
+            cabecera = None
+        hijo = self.validar_hijo(fila, cabecera)
+        if cabecera is not None:
+            self.cabeceras[referencia] = cabecera
+        return referencia, hijo
+
+    def guardar(self, validas):
+        modelo_cabecera, modelo_hijo = self.modelos
+        campo = self.campo_cabecera
+        cabeceras = modelo_cabecera.objects.bulk_create(list(self.cabeceras.values()))
+        ids = {**self.referencias, **{ref: obj.pk for ref, obj in zip(self.cabeceras, cabeceras)}}
+        hijos = []
+        for _, (referencia, hijo) in validas:
+            if hijo is not None:
+                setattr(hijo, f'{campo}_id', ids[referencia])
+                hijos.append(hijo)
+        modelo_hijo.objects.bulk_create(hijos)
+        self.despues_de_guardar(cabeceras, hijos)
+        # Solo se recuerdan las referencias de lotes confirmados
+        self.referencias = ids
+        return {modelo_cabecera._meta.model_name: len(cabeceras), modelo_hijo._meta.model_name: len(hijos)}
+
+    def despues_de_guardar(self, cabeceras, hijos):
+        pass
+
+
+class ImportadorCompras(Importador):
+    """Columnas: fecha, proveedor, materia_prima, cantidad_kg, precio_por_kg, moneda, abastecida."""
+    modelos = (CompraMateriaPrima,)
+
+    def validar(self, linea, fila):
+        return CompraMateriaPrima(
+            fecha=fecha(fila, 'fecha', timezone.localdate()),
+            proveedor_id=self.proveedores.resolver(texto(fila, 'proveedor')),
+            materia_prima_id=self.materias.resolver(texto(fila, 'materia_prima')),
+            cantidad_kg=decimal(fila, 'cantidad_kg', CompraMateriaPrima),
+            precio_por_kg=decimal(fila, 'precio_por_kg', CompraMateriaPrima),
+            moneda=opcion(fila, 'moneda', CompraMateriaPrima),
+            abastecida=booleano(fila, 'abastecida'),
+        )
+
+    def guardar(self, validas):
+        compras = CompraMateriaPrima.objects.bulk_create([compra for _, compra in validas])
+        inventario.sincronizar_compras([compra for compra in compras if compra.abastecida])
+        return {'compramateriaprima': len(compras)}
+
+
+class ImportadorOperaciones(ImportadorAgrupado):
+    """
+    Columnas: referencia, fecha, materia_prima, kg_entrada, producto, presentacion,
+    rendimiento_esperado_pct, kg_salida_real, abastecido y, opcionalmente por fila,
+    maquila_concepto, maquila_monto, maquila_moneda, maquila_fecha.
+    """
+    modelos = (OperacionProcesamiento, CostoMaquila)
+    campo_cabecera = 'operacion'
+
+    def validar_cabecera(self, fila):
+        return OperacionProcesamiento(
+            fecha=fecha(fila, 'fecha', timezone.localdate()),
+            materia_prima_id=self.materias.resolver(texto(fila, 'materia_prima')),
+            kg_entrada=decimal(fila, 'kg_entrada', OperacionProcesamiento),
+            producto_terminado_id=self.productos.resolver(texto(fila, 'producto', PRODUCTO_POR_DEFECTO), texto(fila, 'presentacion')),
+            rendimiento_esperado_pct=decimal(fila, 'rendimiento_esperado_pct', OperacionProcesamiento, defecto=None),
+            kg_salida_real=decimal(fila, 'kg_salida_real', OperacionProcesamiento),
+            abastecido_a_inventario=booleano(fila, 'abastecido'),
+        )
+
+    def validar_hijo(self, fila, cabecera):
+        if not (fila.get('maquila_monto') or '').strip():
+            return None
+        return CostoMaquila(
+            concepto=texto(fila, 'maquila_concepto', 'Maquila'),
+            monto=decimal(fila, 'maquila_monto', CostoMaquila, 'monto'),
+            moneda=opcion(fila, 'maquila_moneda', CostoMaquila, 'moneda'),
+            fecha=fecha(fila, 'maquila_fecha', fecha(fila, 'fecha', timezone.localdate())),
+        )
+
+    def despues_de_guardar(self, operaciones, costos):
+        inventario.sincronizar_operaciones([op for op in operaciones if op.abastecido_a_inventario])
+        rendimiento.sincronizar_operaciones(operaciones)
+
+
+class ImportadorOrdenes(ImportadorAgrupado):
+    """
+    Columnas: referencia, fecha, cliente, estado, porcentaje_adelanto, condicion_saldo,
+    fecha_estimada_pago_saldo y, por fila, producto, presentacion, cantidad_kg, precio_por_kg.
+    """
+    modelos = (OrdenVenta, ItemOrdenVenta)
+    campo_cabecera = 'orden'
+
+    def validar_cabecera(self, fila):
+        return OrdenVenta(
+            fecha=fecha(fila, 'fecha', timezone.localdate()),
+            cliente_id=self.clientes.resolver(texto(fila, 'cliente')),
+            estado=opcion(fila, 'estado', OrdenVenta),
+            porcentaje_adelanto=decimal(fila, 'porcentaje_adelanto', OrdenVenta, defecto=Decimal(0)),
+            condicion_saldo=opcion(fila, 'condicion_saldo', OrdenVenta, defecto='contra_copia'),
+            fecha_estimada_pago_saldo=fecha(fila, 'fecha_estimada_pago_saldo'),
+        )
+
+    def validar_hijo(self, fila, cabecera):
+        return ItemOrdenVenta(
+            producto_id=self.productos.resolver(texto(fila, 'producto', PRODUCTO_POR_DEFECTO), texto(fila, 'presentacion')),
+            cantidad_kg=decimal(fila, 'cantidad_kg', ItemOrdenVenta),
+            precio_por_kg=decimal(fila, 'precio_por_kg', ItemOrdenVenta),
+        )
+
+    def despues_de_guardar(self, ordenes, items):
+        # Incluye las órdenes de lotes anteriores que recibieron ítems en este lote
+        ids = {orden.pk for orden in ordenes} | {item.orden_id for item in items}
+        flujo_caja.sincronizar_ordenes(ids)
+        # Las órdenes importadas ya confirmadas reservan su stock sin validarlo: son hechos consumados
+        disponibilidad.sincronizar_ordenes(ids)
+
+
+IMPORTADORES = {
+    'compras': ImportadorCompras,
+    'operaciones': ImportadorOperaciones,
+    'ordenes': ImportadorOrdenes,
+}
@@ -0,0 +1,161 @@
+"""
+Motor de contabilización del libro de inventario.
+
+Cada documento (compra, operación de procesamiento, ítem de orden despachado)
+aporta movimientos con signo a ``MovimientoInventario``. Sincronizar un
+documento compara lo que debería estar contabilizado con lo ya registrado y
+agrega solo la diferencia, así que volver a sincronizar es idempotente y las
+correcciones quedan como movimientos nuevos. Los stocks denormalizados se
+actualizan incrementalmente con ``F()`` sobre filas bloqueadas.
+"""
+from collections import defaultdict
+from decimal import Decimal
+
+from django.db import transaction
+from django.db.models import F, Sum
+
+from . import metricas
+from .transacciones import atomic_con_reintentos
+from .models import (
+    CompraMateriaPrima, OperacionProcesamiento, ItemOrdenVenta, Embarque,
+    InventarioMateriaPrima, InventarioProductoFinal, MovimientoInventario
+)
+
+
+def bloquear_stock(modelo, campo, ids):
+    """Crea las filas de stock faltantes y las bloquea en orden para evitar interbloqueos."""
+    if not ids:
+        return
+    modelo.objects.bulk_create(
+        [modelo(**{campo: pk}) for pk in ids], ignore_conflicts=True
+    )
+    list(modelo.objects.select_for_update().filter(**{f'{campo}__in': ids}).order_by('pk'))
+
+
+def registrar_movimientos(movimientos):
+    """Inserta movimientos y aplica sus deltas al stock en una sola transacción."""
+    movimientos = [m for m in movimientos if m.cantidad_kg]
+    if not movimientos:
+        return []
+    deltas_mp = defaultdict(Decimal)
+    deltas_pt = defaultdict(Decimal)
+    for mov in movimientos:
+        if mov.materia_prima_id is not None:
+            deltas_mp[mov.materia_prima_id] += mov.cantidad_kg
+        else:
+            deltas_pt[mov.producto_id] += mov.cantidad_kg
+    with transaction.atomic():
+        bloquear_stock(InventarioMateriaPrima, 'materia_prima_id', sorted(deltas_mp))
+        bloquear_stock(InventarioProductoFinal, 'producto_id', sorted(deltas_pt))
+        MovimientoInventario.objects.bulk_create(movimientos)
+        for mp_id, delta in deltas_mp.items():
+            InventarioMateriaPrima.objects.filter(materia_prima_id=mp_id).update(stock_kg=F('stock_kg') + delta)
+        for pt_id, delta in deltas_pt.items():
+            InventarioProductoFinal.objects.filter(producto_id=pt_id).update(stock_kg=F('stock_kg') + delta)
+        if deltas_pt:
+            transaction.on_commit(metricas.invalidar_snapshot)
+    return movimientos
+
+
+def _sincronizar(modelo, campo, documentos, objetivo):
+    """
+    Contabiliza la diferencia entre el objetivo de cada documento y lo ya
+    registrado. ``objetivo(doc)`` devuelve tuplas (tipo, materia_prima_id,
+    producto_id, kg); devolver una lista vacía revierte el documento.
+    """
+    ids = [doc.pk for doc in documentos]
+    if not ids:
+        return []
+    with transaction.atomic():
+        # Bloquear los documentos serializa sincronizaciones concurrentes del mismo origen
+        list(modelo.objects.select_for_update().filter(pk__in=ids).order_by('pk').values_list('pk', flat=True))
+        registrado = defaultdict(Decimal)
+        filas = (
+            MovimientoInventario.objects.filter(**{f'{campo}__in': ids})
+            .values(campo, 'tipo', 'materia_prima', 'producto')
+            .annotate(total=Sum('cantidad_kg'))
+            .order_by()
+        )
+        for fila in filas:
+            registrado[(fila[campo], fila['tipo'], fila['materia_prima'], fila['producto'])] += fila['total']
+        deseado = defaultdict(Decimal)
+        for doc in documentos:
+            for tipo, mp_id, pt_id, kg in objetivo(doc):
+                deseado[(doc.pk, tipo, mp_id, pt_id)] += kg
+        movimientos = []
+        for clave in deseado.keys() | registrado.keys():
+            delta = deseado[clave] - registrado[clave]
+            if delta:
+                doc_id, tipo, mp_id, pt_id = clave
+                movimientos.append(MovimientoInventario(
+                    tipo=tipo, materia_prima_id=mp_id, producto_id=pt_id,
+                    cantidad_kg=delta, **{f'{campo}_id': doc_id}
+                ))
+        return registrar_movimientos(movimientos)
+
+
+def sincronizar_compras(compras, anular=False):
+    def objetivo(compra):
+        if anular or not compra.abastecida:
+            return []
+        return [('compra', compra.materia_prima_id, None, compra.cantidad_kg)]
+    return _sincronizar(CompraMateriaPrima, 'compra', compras, objetivo)
+
+
+def sincronizar_operaciones(operaciones, anular=False):
+    def objetivo(op):
+        if anular or not op.abastecido_a_inventario:
+            return []
+        return [
+            ('consumo', op.materia_prima_id, None, -op.kg_entrada),
+            ('produccion', None, op.producto_terminado_id, op.kg_salida_real),
+        ]
+    return _sincronizar(OperacionProcesamiento, 'operacion', operaciones, objetivo)
+
+
+def sincronizar_items_orden(items, anular=False):
+    """Descuenta del stock los ítems cuya orden ya tiene un embarque."""
+    items = list(items)
+    embarcadas = set(
+        Embarque.objects.filter(orden_venta_id__in={item.orden_id for item in items})
+        .values_list('orden_venta_id', flat=True)
+    )
+
+    def objetivo(item):
+        if anular or item.orden_id not in embarcadas:
+            return []
+        return [('venta', None, item.producto_id, -item.cantidad_kg)]
+    return _sincronizar(ItemOrdenVenta, 'item_orden', items, objetivo)
+
+
+def _abastecer(queryset, campo_flag, campo_mov, sincronizar):
+    """
+    Marca y contabiliza una selección completa en una sola transacción.
+    Devuelve el resultado por fila: 'abastecida' si se marcó ahora,
+    'regularizada' si ya estaba marcada pero faltaban movimientos y
+    'sin_cambios' en otro caso.
+    """
+    with transaction.atomic():
+        documentos = list(queryset.select_for_update().order_by('pk'))
+        nuevos = [doc.pk for doc in documentos if not getattr(doc, campo_flag)]
+        queryset.model.objects.filter(pk__in=nuevos).update(**{campo_flag: True})
+        for doc in documentos:
+            setattr(doc, campo_flag, True)
+        movimientos = sincronizar(documentos)
+        transaction.on_commit(metricas.invalidar_snapshot)
+    nuevos = set(nuevos)
+    ajustados = {getattr(mov, f'{campo_mov}_id') for mov in movimientos}
+    return {
+        doc.pk: 'abastecida' if doc.pk in nuevos else 'regularizada' if doc.pk in ajustados else 'sin_cambios'
+        for doc in documentos
+    }
+
+
+@atomic_con_reintentos()
+def abastecer_compras(queryset):
+    return _abastecer(queryset, 'abastecida', 'compra', sincronizar_compras)
+
+
+@atomic_con_reintentos()
+def abastecer_operaciones(queryset):
+    return _abastecer(queryset, 'abastecido_a_inventario', 'operacion', sincronizar_operaciones)
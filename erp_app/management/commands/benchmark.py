@@ -0,0 +1,233 @@
+import io
+import json
+import platform
+import statistics
+import subprocess
+import time
+
+import django
+from django.apps import apps
+from django.conf import settings
+from django.contrib import admin
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.test import Client, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+
+from erp_app import busqueda, disponibilidad, exportacion, flujo_caja, metricas, rendimiento, sintetico
+from erp_app.models import Cliente, OrdenVenta
+
+
+class Deshacer(Exception):
+    pass
+
+
+class Command(BaseCommand):
+    help = (
+        "Mide el dashboard, el listado y el formulario de cada modelo del admin, los totales de "
+        "órdenes y los reportes, y emite los tiempos en JSON comparable entre ejecuciones. "
+        "Todo corre en una transacción que se deshace al terminar."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--escala', type=int, default=0,
+            help="Órdenes de venta a generar antes de medir; con 0 se miden los datos existentes.",
+        )
+        parser.add_argument('--semilla', type=int, default=0)
+        parser.add_argument(
+            '--derivados', action='store_true',
+            help="Con --escala, reconstruye también libro de inventario, flujo de caja, rendimiento y reservas.",
+        )
+        parser.add_argument('--repeticiones', type=int, default=5)
+        parser.add_argument('--calentamiento', type=int, default=1, help="Ejecuciones previas sin medir.")
+        parser.add_argument('--solo', nargs='+', default=[], help="Prefijos de los casos a medir, p. ej. admin.ordenventa.")
+        parser.add_argument('--salida', help="Archivo JSON de resultados; por defecto se escribe en la salida estándar.")
+        parser.add_argument('--comparar', help="JSON de una ejecución anterior con el que comparar.")
+        parser.add_argument('--umbral', type=float, default=20, help="Porcentaje de aumento de la mediana que se marca.")
+
+    def handle(self, *args, escala, semilla, derivados, repeticiones, calentamiento, solo, salida, comparar, umbral, **options):
+        if repeticiones < 1:
+            raise CommandError("--repeticiones debe ser al menos 1.")
+        anterior = None
+        if comparar:
+            with open(comparar, encoding='utf-8') as f:
+                anterior = json.load(f)
+
+        resultados = {}
+        try:
+            # El cliente del admin crea usuario y sesión: también se deshacen
+            with transaction.atomic(), override_settings(ALLOWED_HOSTS=['testserver']):
+                if escala:
+                    self.generar(escala, semilla, derivados)
+                meta = self.meta(escala, semilla, repeticiones, calentamiento)
+                for nombre, (funcion, preparar) in self.casos().items():
+                    if solo and not nombre.startswith(tuple(solo)):
+                        continue
+                    resultados[nombre] = self.medir(funcion, preparar, repeticiones, calentamiento)
+                raise Deshacer
+        except Deshacer:
+            pass
+        finally:
+            sintetico.invalidar_caches()
+
+        informe = {'meta': meta, 'resultados': resultados}
+        texto = json.dumps(informe, indent=2, ensure_ascii=False)
+        if salida:
+            with open(salida, 'w', encoding='utf-8') as f:
+                f.write(texto + '\n')
+            self.tabla(resultados)
+            self.stdout.write(f"Resultados en {salida}.")
+        else:
+            self.stdout.write(texto)
+        if anterior is not None:
+            # Con el JSON en la salida estándar, la comparación va a la de errores
+            self.comparar(anterior, informe, umbral, self.stdout if salida else self.stderr)
+
+    def generar(self, escala, semilla, derivados):
+        inicio = time.perf_counter()
+        conteo = sintetico.Generador(escala, semilla).generar()
+        busqueda.reconstruir()
+        if derivados:
+            call_command('rebuild_stock', sincronizar_documentos=True, stdout=io.StringIO())
+            flujo_caja.recalcular()
+            rendimiento.recalcular()
+            disponibilidad.recalcular()
+        self.stderr.write(f"{sum(conteo.values())} filas generadas en {time.perf_counter() - inicio:.1f}s.")
+        if connection.vendor in ('sqlite', 'postgresql'):
+            with connection.cursor() as cursor:
+                cursor.execute('ANALYZE')
+
+    def meta(self, escala, semilla, repeticiones, calentamiento):
+        return {
+            'fecha': timezone.now().isoformat(),
+            'commit': self.commit(),
+            'python': platform.python_version(),
+            'django': django.get_version(),
+            'base': connection.vendor,
+            'escala': escala,
+            'semilla': semilla,
+            'repeticiones': repeticiones,
+            'calentamiento': calentamiento,
+            'filas': {
+                modelo.__name__: modelo._default_manager.count()
+                for modelo in apps.get_app_config('erp_app').get_models()
+            },
+        }
+
+    def commit(self):
+        try:
+            resultado = subprocess.run(
+                ['git', 'rev-parse', '--short', 'HEAD'], cwd=settings.BASE_DIR, capture_output=True, text=True, timeout=5,
+            )
+        except (OSError, subprocess.SubprocessError):
+            return None
+        return resultado.stdout.strip() or None
+
+    def casos(self):
+        """{nombre: (función a medir, preparación antes de cada medición o None)}."""
+        usuario = get_user_model().objects.create_superuser('benchmark', 'benchmark@example.com', None)
+        cliente = Client()
+        cliente.force_login(usuario)
+
+        def pagina(url):
+            def pedir():
+                response = cliente.get(url)
+                if response.status_code != 200:
+                    raise CommandError(f"{url} respondió {response.status_code}.")
+                if response.streaming:
+                    for _ in response.streaming_content:
+                        pass
+            return pedir
+
+        casos = {
+            'dashboard.metricas': (metricas.calcular_metricas, None),
+            'dashboard.vista': (pagina(reverse('erp_app:dashboard')), metricas.invalidar_snapshot),
+            'dashboard.vista_en_cache': (pagina(reverse('erp_app:dashboard')), None),
+            'flujo_caja.vista': (pagina(reverse('erp_app:flujo_caja')), None),
+            'documentacion.riesgo': (pagina(reverse('erp_app:documentacion_riesgo')), None),
+            'ordenes.totales_pagina': (
+                lambda: list(OrdenVenta.objects.with_totals().order_by('-fecha', '-pk')[:100]), None,
+            ),
+            'ordenes.totales_todas': (
+                lambda: sum(OrdenVenta.objects.with_totals().values_list('total_usd', flat=True).iterator(chunk_size=2000)),
+                None,
+            ),
+        }
+        # Un nombre de cliente existente (o uno genérico) para que la búsqueda encuentre algo
+        nombre = Cliente.objects.order_by('pk').values_list('nombre', flat=True).first() or 'cliente'
+        termino = (busqueda.palabras(nombre) or ['cli'])[0][:3]
+        casos['busqueda.global'] = (lambda: busqueda.buscar(termino), None)
+        casos['busqueda.vista'] = (pagina(f"{reverse('erp_app:busqueda')}?q={termino}"), None)
+        casos['admin.cliente.busqueda'] = (pagina(f"{reverse('admin:erp_app_cliente_changelist')}?q={termino}"), None)
+        for nombre, reporte in exportacion.REPORTES.items():
+            casos[f'reportes.{nombre}'] = (self.reporte(reporte), None)
+            casos[f'reportes.{nombre}.vista'] = (pagina(reverse('erp_app:exportar_reporte', args=[nombre, 'csv'])), None)
+        for modelo in admin.site._registry:
+            prefijo = f'admin.{modelo._meta.model_name}'
+            url = f'admin:{modelo._meta.app_label}_{modelo._meta.model_name}'
+            casos[f'{prefijo}.listado'] = (pagina(reverse(f'{url}_changelist')), None)
+            obj = modelo._default_manager.order_by('pk').first()
+            if obj is not None:
+                casos[f'{prefijo}.formulario'] = (pagina(reverse(f'{url}_change', args=[obj.pk])), None)
+        return casos
+
+    def reporte(self, funcion):
+        def exportar():
+            encabezados, filas = funcion()
+            return sum(len(bloque) for bloque in exportacion.bloques_csv(encabezados, filas))
+        return exportar
+
+    def medir(self, funcion, preparar, repeticiones, calentamiento):
+        for _ in range(calentamiento):
+            if preparar:
+                preparar()
+            funcion()
+        muestras = []
+        for _ in range(repeticiones):
+            if preparar:
+                preparar()
+            with CaptureQueriesContext(connection) as capturadas:
+                inicio = time.perf_counter()
+                funcion()
+                muestras.append((time.perf_counter() - inicio) * 1000)
+        return {
+            'mediana_ms': round(statistics.median(muestras), 3),
+            'p95_ms': round(percentil(muestras, 95), 3),
+            'min_ms': round(min(muestras), 3),
+            'max_ms': round(max(muestras), 3),
+            'consultas': len(capturadas),
+        }
+
+    def tabla(self, resultados):
+        self.stdout.write(f"{'caso':50} {'mediana':>10} {'p95':>10} {'consultas':>9}")
+        for nombre, r in resultados.items():
+            self.stdout.write(f"{nombre:50} {r['mediana_ms']:>8.2f}ms {r['p95_ms']:>8.2f}ms {r['consultas']:>9}")
+
+    def comparar(self, anterior, actual, umbral, salida):
+        if anterior['meta'].get('filas') != actual['meta']['filas']:
+            salida.write("Aviso: las dos ejecuciones no tienen las mismas filas por modelo.")
+        salida.write(f"{'caso':50} {'antes':>10} {'ahora':>10} {'cambio':>8} {'consultas':>11}")
+        for nombre, r in actual['resultados'].items():
+            previo = anterior['resultados'].get(nombre)
+            if previo is None:
+                continue
+            cambio = (r['mediana_ms'] - previo['mediana_ms']) * 100 / previo['mediana_ms'] if previo['mediana_ms'] else 0
+            marca = '  <- más lento' if cambio > umbral else ''
+            salida.write(
+                f"{nombre:50} {previo['mediana_ms']:>8.2f}ms {r['mediana_ms']:>8.2f}ms {cambio:>+7.1f}% "
+                f"{previo['consultas']:>5}->{r['consultas']:<5}{marca}"
+            )
+
+
+def percentil(muestras, p):
+    """Percentil por interpolación lineal entre las muestras ordenadas."""
+    ordenadas = sorted(muestras)
+    posicion = (len(ordenadas) - 1) * p / 100
+    base = int(posicion)
+    siguiente = min(base + 1, len(ordenadas) - 1)
+    return ordenadas[base] + (ordenadas[siguiente] - ordenadas[base]) * (posicion - base)
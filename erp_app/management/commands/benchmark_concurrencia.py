@@ -0,0 +1,111 @@
+import os
+import random
+import tempfile
+import threading
+import time
+from collections import Counter
+from decimal import Decimal
+
+from django.conf import settings
+from django.core.management import call_command
+from django.core.management.base import BaseCommand
+from django.db import OperationalError, connections, transaction
+
+from erp_app import sintetico
+from erp_app.models import CompraMateriaPrima, OrdenVenta, Embarque, InventarioProductoFinal
+from erp_app.transacciones import es_bloqueo
+from erp_avellanos.database import perfil_bd
+
+
+class Command(BaseCommand):
+    help = (
+        "Mide rendimiento y tasa de errores de bloqueo con N hilos de lecturas y escrituras "
+        "mixtas sobre una base SQLite temporal, para cada perfil de base de datos."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--hilos', type=int, default=8)
+        parser.add_argument('--segundos', type=float, default=10)
+        parser.add_argument('--escrituras', type=float, default=0.2, help="Fracción de operaciones de escritura.")
+        parser.add_argument('--escala', type=int, default=5000)
+        parser.add_argument('--perfiles', nargs='+', default=['sqlite-basico', 'sqlite'])
+
+    def handle(self, *args, hilos, segundos, escrituras, escala, perfiles, **options):
+        for perfil in perfiles:
+            with tempfile.TemporaryDirectory() as directorio:
+                alias = f'benchmark_{perfil}'.replace('-', '_')
+                config = perfil_bd(perfil, settings.BASE_DIR, {'ERP_DB_NOMBRE': os.path.join(directorio, 'bench.sqlite3')})
+                # Alias temporal con los valores por defecto que Django completa en DATABASES
+                connections.settings[alias] = connections.configure_settings({'default': config})['default']
+                try:
+                    self.preparar(alias, escala)
+                    resultado = self.ejecutar(alias, hilos, segundos, escrituras)
+                finally:
+                    connections[alias].close()
+                    del connections[alias]
+                    del connections.settings[alias]
+            total = sum(resultado.values())
+            self.stdout.write(
+                f"{perfil:15} {total / segundos:10.1f} op/s  lecturas={resultado['lectura']} "
+                f"escrituras={resultado['escritura']} bloqueos={resultado['bloqueo']} "
+                f"({resultado['bloqueo'] / max(total, 1):.2%}) otros_errores={resultado['error']}"
+            )
+
+    def preparar(self, alias, escala):
+        call_command('migrate', database=alias, verbosity=0)
+        with transaction.atomic(using=alias):
+            sintetico.Generador(escala, using=alias).generar()
+
+    def ejecutar(self, alias, hilos, segundos, escrituras):
+        resultado = Counter()
+        candado = threading.Lock()
+        fin = time.monotonic() + segundos
+        ordenes = list(OrdenVenta.objects.using(alias).values_list('pk', flat=True)[:1000])
+        compra_modelo = CompraMateriaPrima.objects.using(alias).values('proveedor_id', 'materia_prima_id').first()
+
+        def trabajador(semilla):
+            rnd = random.Random(semilla)
+            local = Counter()
+            try:
+                while time.monotonic() < fin:
+                    try:
+                        if rnd.random() < escrituras:
+                            self.escribir(alias, rnd, ordenes, compra_modelo)
+                            local['escritura'] += 1
+                        else:
+                            self.leer(alias, rnd)
+                            local['lectura'] += 1
+                    except OperationalError as exc:
+                        local['bloqueo' if es_bloqueo(exc) else 'error'] += 1
+            finally:
+                connections[alias].close()
+                with candado:
+                    resultado.update(local)
+
+        threads = [threading.Thread(target=trabajador, args=(i,)) for i in range(hilos)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        return resultado
+
+    def leer(self, alias, rnd):
+        if rnd.random() < 0.5:
+            OrdenVenta.objects.using(alias).filter(estado='pendiente').count()
+            Embarque.objects.using(alias).filter(fecha_embarque__gte='2024-01-01').count()
+            InventarioProductoFinal.objects.using(alias).filter(stock_kg__lt=100).count()
+        else:
+            list(OrdenVenta.objects.using(alias).select_related('cliente').order_by('-pk')[:100])
+
+    def escribir(self, alias, rnd, ordenes, compra_modelo):
+        # Lectura seguida de escritura en la misma transacción: el patrón que en modo
+        # DEFERRED termina en "database is locked" al promover el bloqueo.
+        with transaction.atomic(using=alias):
+            pk = rnd.choice(ordenes)
+            estado = OrdenVenta.objects.using(alias).filter(pk=pk).values_list('estado', flat=True).first()
+            OrdenVenta.objects.using(alias).filter(pk=pk).update(
+                estado='confirmada' if estado == 'pendiente' else 'pendiente'
+            )
+            CompraMateriaPrima.objects.using(alias).bulk_create([CompraMateriaPrima(
+                cantidad_kg=Decimal('100.000'), precio_por_kg=Decimal('1.00'), **compra_modelo
+            )])
@@ -0,0 +1,117 @@
+import statistics
+import time
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from django.utils import timezone
+
+from erp_app import metricas, sintetico
+from erp_app.models import (
+    CompraMateriaPrima, OperacionProcesamiento, OrdenVenta, Embarque,
+    ServicioLogistico, DocumentacionExportacion, InventarioProductoFinal
+)
+
+MODELOS_INDEXADOS = [
+    CompraMateriaPrima, OperacionProcesamiento, OrdenVenta, Embarque,
+    ServicioLogistico, DocumentacionExportacion, InventarioProductoFinal,
+]
+
+
+class Deshacer(Exception):
+    pass
+
+
+class Command(BaseCommand):
+    help = (
+        "Genera un conjunto sintético dentro de una transacción, mide las consultas de "
+        "dashboard y filtros del admin con y sin los índices, muestra los planes y deshace todo."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--escala', type=int, default=100_000, help="Órdenes de venta a generar.")
+        parser.add_argument('--repeticiones', type=int, default=5)
+        parser.add_argument('--semilla', type=int, default=0)
+
+    def consultas(self):
+        hoy = timezone.localdate()
+        proveedor_id = CompraMateriaPrima.objects.values_list('proveedor_id', flat=True).first()
+        dashboard = metricas.consultas_dashboard(hoy)
+        consultas = {f'dashboard.{nombre}': qs.count for nombre, qs in dashboard.items()}
+        consultas.update({
+            'dashboard.completo': lambda: metricas.calcular_metricas(hoy),
+            'admin.ordenes_confirmadas': lambda: list(OrdenVenta.objects.filter(estado='confirmada').order_by('-fecha')[:100]),
+            'admin.compras_pendientes_proveedor': lambda: list(
+                CompraMateriaPrima.objects.filter(abastecida=False, proveedor_id=proveedor_id)[:100]
+            ),
+            'admin.servicios_por_vencer': lambda: list(
+                ServicioLogistico.objects.filter(
+                    estado_pago='pendiente', fecha_vencimiento__lte=hoy + timedelta(days=30)
+                ).order_by('fecha_vencimiento')[:100]
+            ),
+            'admin.docs_pendientes_por_plazo': lambda: list(
+                DocumentacionExportacion.objects.filter(estado_envio='pendiente').order_by('plazo_envio_courier')[:100]
+            ),
+        })
+        planes = {
+            'dashboard.ordenes_pendientes': dashboard['ordenes_pendientes'],
+            'dashboard.operaciones_pendientes': dashboard['operaciones_pendientes'],
+            'dashboard.embarques_proximos': dashboard['embarques_proximos'],
+            'dashboard.inventario_bajo': dashboard['inventario_bajo'],
+            'admin.servicios_por_vencer': ServicioLogistico.objects.filter(
+                estado_pago='pendiente', fecha_vencimiento__lte=hoy + timedelta(days=30)
+            ).order_by('fecha_vencimiento'),
+            'admin.docs_pendientes_por_plazo': DocumentacionExportacion.objects.filter(
+                estado_envio='pendiente'
+            ).order_by('plazo_envio_courier'),
+        }
+        return consultas, planes
+
+    def plan(self, queryset, etiqueta):
+        # La etiqueta hace único el SQL: sqlite3 reutiliza sentencias EXPLAIN preparadas
+        # y mostraría el plan anterior al DROP INDEX.
+        sql, params = queryset.query.sql_with_params()
+        with connection.cursor() as cursor:
+            cursor.execute(f'{connection.ops.explain_query_prefix()} {sql} /* {etiqueta} */', params)
+            return '\n'.join(' '.join(str(col) for col in fila) for fila in cursor.fetchall())
+
+    def medir(self, consultas, repeticiones):
+        tiempos = {}
+        for nombre, consulta in consultas.items():
+            muestras = []
+            for _ in range(repeticiones):
+                inicio = time.perf_counter()
+                consulta()
+                muestras.append((time.perf_counter() - inicio) * 1000)
+            tiempos[nombre] = statistics.median(muestras)
+        return tiempos
+
+    def handle(self, *args, escala, repeticiones, semilla, **options):
+        try:
+            with transaction.atomic():
+                inicio = time.perf_counter()
+                conteo = sintetico.generar(escala, semilla)
+                self.stdout.write(f"Datos generados en {time.perf_counter() - inicio:.1f}s: {conteo}")
+                with connection.cursor() as cursor:
+                    cursor.execute('ANALYZE')
+
+                consultas, planes = self.consultas()
+                con_indices = self.medir(consultas, repeticiones)
+                planes_con = {nombre: self.plan(qs, 'con') for nombre, qs in planes.items()}
+
+                # DROP INDEX directo: el schema editor de SQLite no puede abrirse dentro de una transacción
+                with connection.cursor() as cursor:
+                    for modelo in MODELOS_INDEXADOS:
+                        for indice in modelo._meta.indexes:
+                            cursor.execute(f'DROP INDEX {connection.ops.quote_name(indice.name)}')
+                sin_indices = self.medir(consultas, repeticiones)
+                planes_sin = {nombre: self.plan(qs, 'sin') for nombre, qs in planes.items()}
+                raise Deshacer
+        except Deshacer:
+            pass
+
+        self.stdout.write(f"\n{'consulta':40} {'sin índices':>12} {'con índices':>12}")
+        for nombre in con_indices:
+            self.stdout.write(f"{nombre:40} {sin_indices[nombre]:>10.2f}ms {con_indices[nombre]:>10.2f}ms")
+        for nombre in planes_con:
+            self.stdout.write(f"\n== {nombre}\n-- sin índices\n{planes_sin[nombre]}\n-- con índices\n{planes_con[nombre]}")
@@ -0,0 +1,31 @@
+from datetime import date
+
+from django.core.management.base import BaseCommand
+
+from erp_app.costos import calcular_margenes
+from erp_app.models import OrdenVenta, ProductoTerminado, Cliente
+
+
+class Command(BaseCommand):
+    help = "Calcula márgenes por orden, producto y cliente para un período."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--desde', type=date.fromisoformat)
+        parser.add_argument('--hasta', type=date.fromisoformat)
+        parser.add_argument('--por', choices=['ordenes', 'productos', 'clientes'], default='clientes')
+
+    def handle(self, *args, desde, hasta, por, **options):
+        reporte = calcular_margenes(desde, hasta)[por]
+        modelo = {'ordenes': OrdenVenta, 'productos': ProductoTerminado, 'clientes': Cliente}[por]
+        nombres = modelo.objects.in_bulk(list(reporte))
+        self.stdout.write(f"{'':40} {'kg':>12} {'ingreso':>14} {'costo':>14} {'logística':>12} {'margen':>14} {'%':>7}")
+        # Los que no tienen costo conocido van al final
+        for pk, m in sorted(reporte.items(), key=lambda par: (not par[1].sin_costo, par[1].margen or 0), reverse=True):
+            if m.sin_costo:
+                margen, pct = 'sin costo', ''
+            else:
+                margen, pct = f"{m.margen:.2f}", f"{m.margen_pct:.1f}" if m.margen_pct is not None else '-'
+            self.stdout.write(
+                f"{str(nombres.get(pk, pk))[:40]:40} {m.kg:>12.1f} {m.ingreso:>14.2f} {m.costo_producto:>14.2f} "
+                f"{m.logistica:>12.2f} {margen:>14} {pct:>7}"
+            )
@@ -0,0 +1,64 @@
+from datetime import datetime, timedelta
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+
+from erp_app import cierre
+
+
+def mes(valor):
+    try:
+        return datetime.strptime(valor, '%Y-%m').date()
+    except ValueError:
+        raise CommandError(f"Mes inválido: {valor} (use AAAA-MM).")
+
+
+class Command(BaseCommand):
+    help = (
+        "Cierra meses: congela ventas, compras, maquila y logística en el cubo mensual, un mes por "
+        "transacción. Sin --mes cierra todos los meses abiertos hasta --hasta (por defecto, el mes anterior)."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--mes', type=mes, help="Un solo mes, AAAA-MM.")
+        parser.add_argument('--hasta', type=mes, help="Último mes a cerrar, AAAA-MM.")
+        parser.add_argument('--rehacer', action='store_true', help="Vuelve a congelar también los meses ya cerrados.")
+        parser.add_argument('--reabrir', action='store_true', help="Con --mes, descarta su cierre.")
+        parser.add_argument('--verificar', action='store_true', help="Solo compara los meses cerrados con los documentos actuales.")
+        parser.add_argument('--batch-size', type=int, default=2000)
+
+    def handle(self, *args, mes, hasta, rehacer, reabrir, verificar, batch_size, **options):
+        if reabrir:
+            if not mes:
+                raise CommandError("--reabrir requiere --mes.")
+            reabierto = cierre.reabrir(mes)
+            self.stdout.write(f"{mes:%Y-%m} reabierto." if reabierto else f"{mes:%Y-%m} no estaba cerrado.")
+            return
+        congelados = cierre.cerrados()
+        if mes:
+            periodos = [cierre.mes(mes)]
+        else:
+            rango = cierre.rango_datos()
+            anterior = cierre.mes(cierre.mes(timezone.localdate()) - timedelta(days=1))
+            periodos = list(cierre.meses(rango[0], cierre.mes(hasta) if hasta else anterior)) if rango else []
+
+        if verificar:
+            for periodo in periodos:
+                if periodo not in congelados:
+                    continue
+                for hecho, (guardado, actual) in cierre.diferencias(periodo).items():
+                    self.stdout.write(f"  {periodo:%Y-%m} {hecho}: cerrado {guardado} USD, actual {actual} USD")
+            return
+
+        cerrados = 0
+        for periodo in periodos:
+            if periodo in congelados and not rehacer:
+                continue
+            try:
+                resultado = cierre.cerrar(periodo, rehacer=rehacer, lote=batch_size)
+            except ValueError as exc:
+                raise CommandError(str(exc))
+            totales = ', '.join(f"{hecho} {total} USD" for hecho, total in resultado.total_usd.items()) or 'sin movimientos'
+            self.stdout.write(f"{periodo:%Y-%m}: {resultado.filas} celdas; {totales}.")
+            cerrados += 1
+        self.stdout.write(f"{cerrados} meses cerrados.")
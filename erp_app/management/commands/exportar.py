@@ -0,0 +1,61 @@
+from datetime import date
+
+from django.contrib import admin
+from django.core.management.base import BaseCommand, CommandError
+
+from erp_app import exportacion
+
+
+def modelos_exportables():
+    return {
+        modelo._meta.model_name: modeladmin
+        for modelo, modeladmin in admin.site._registry.items() if modelo._meta.app_label == 'erp_app'
+    }
+
+
+class Command(BaseCommand):
+    help = (
+        "Exporta en streaming un reporte o un modelo del admin a CSV o XLSX, con memoria "
+        "constante. Pensado para ejecutarse desde cron."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            'origen', help=f"Reporte ({', '.join(exportacion.REPORTES)}) o modelo del admin (p. ej. ordenventa).",
+        )
+        parser.add_argument('--formato', choices=['csv', 'xlsx'], default='csv')
+        parser.add_argument('--salida', help="Archivo de destino; por defecto la salida estándar (solo CSV).")
+        parser.add_argument('--desde', type=date.fromisoformat)
+        parser.add_argument('--hasta', type=date.fromisoformat)
+        parser.add_argument('--por', choices=['ordenes', 'productos', 'clientes'], default='clientes')
+        parser.add_argument('--estado-pago', choices=['pendiente', 'pagada'])
+        parser.add_argument('--chunk-size', type=int, default=exportacion.CHUNK_SIZE)
+
+    def handle(self, *args, origen, formato, salida, chunk_size, **options):
+        if formato not in exportacion.formatos():
+            raise CommandError("La exportación a XLSX requiere openpyxl.")
+        if formato == 'xlsx' and not salida:
+            raise CommandError("La exportación a XLSX requiere --salida.")
+
+        if origen in exportacion.REPORTES:
+            params = {clave: options[clave] for clave in ('desde', 'hasta', 'por', 'estado_pago')}
+            encabezados, filas = exportacion.REPORTES[origen](**params)
+        elif origen in modelos_exportables():
+            modeladmin = modelos_exportables()[origen]
+            # get_queryset del admin solo usa la petición para el orden, que aquí se fija por pk
+            queryset = modeladmin.get_queryset(None).order_by('pk')
+            encabezados = exportacion.columnas(modeladmin.model, modeladmin.campos_exportacion)
+            filas = exportacion.filas_queryset(queryset, encabezados, chunk_size)
+        else:
+            raise CommandError(f"Origen desconocido: {origen}")
+
+        if formato == 'xlsx':
+            exportacion.escribir_xlsx(salida, encabezados, filas)
+            return
+        if salida:
+            with open(salida, 'w', newline='', encoding='utf-8') as archivo:
+                for bloque in exportacion.bloques_csv(encabezados, filas):
+                    archivo.write(bloque)
+        else:
+            for bloque in exportacion.bloques_csv(encabezados, filas):
+                self.stdout.write(bloque, ending='')
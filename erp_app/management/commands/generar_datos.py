@@ -0,0 +1,54 @@
+import io
+import json
+import time
+
+from django.core.management import call_command
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from erp_app import busqueda, disponibilidad, flujo_caja, rendimiento, sintetico
+
+
+class Command(BaseCommand):
+    help = (
+        "Genera un conjunto de datos sintético y reproducible en la base configurada "
+        "(use ERP_DB_NOMBRE para apuntar a una base aparte) e imprime las filas creadas en JSON."
+    )
+
+    def add_arguments(self, parser):
+        tamano = parser.add_mutually_exclusive_group()
+        tamano.add_argument('--escala', type=int, help="Órdenes de venta a generar (por defecto 10000).")
+        tamano.add_argument('--filas', type=int, help="Filas totales aproximadas, p. ej. 10000 a 10000000.")
+        parser.add_argument('--semilla', type=int, default=0)
+        parser.add_argument('--lote', type=int, default=5000, help="Filas por bulk_create.")
+        parser.add_argument(
+            '--derivados', action='store_true',
+            help="Reconstruye después libro de inventario, flujo de caja, rendimiento y reservas de stock.",
+        )
+
+    def handle(self, *args, escala, filas, semilla, lote, derivados, **options):
+        if filas:
+            escala = sintetico.escala_para(filas)
+        escala = escala or 10_000
+        inicio = time.perf_counter()
+        with transaction.atomic():
+            conteo = sintetico.Generador(escala, semilla, lote).generar()
+            # bulk_create no dispara las señales que mantienen el índice de búsqueda
+            busqueda.reconstruir()
+        segundos = time.perf_counter() - inicio
+        resultado = {
+            'escala': escala,
+            'semilla': semilla,
+            'filas': conteo,
+            'total': sum(conteo.values()),
+            'segundos': round(segundos, 2),
+            'filas_por_segundo': round(sum(conteo.values()) / segundos),
+        }
+        if derivados:
+            inicio = time.perf_counter()
+            call_command('rebuild_stock', sincronizar_documentos=True, batch_size=lote, stdout=io.StringIO())
+            flujo_caja.recalcular()
+            rendimiento.recalcular()
+            disponibilidad.recalcular()
+            resultado['segundos_derivados'] = round(time.perf_counter() - inicio, 2)
+        self.stdout.write(json.dumps(resultado, indent=2, ensure_ascii=False))
@@ -0,0 +1,38 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from erp_app.importacion import IMPORTADORES, leer_csv
+
+
+class Command(BaseCommand):
+    help = (
+        "Importa compras, operaciones con costos de maquila u órdenes con ítems desde un CSV, "
+        "en lotes con bulk_create. Las filas inválidas se informan y se omiten."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('tipo', choices=list(IMPORTADORES))
+        parser.add_argument('archivo')
+        parser.add_argument('--batch-size', type=int, default=5000)
+        parser.add_argument('--delimitador', default=',')
+        parser.add_argument(
+            '--crear-catalogos', action='store_true',
+            help="Crea los proveedores, materias primas y clientes que no existan.",
+        )
+
+    def handle(self, *args, tipo, archivo, batch_size, delimitador, crear_catalogos, **options):
+        importador = IMPORTADORES[tipo](lote=batch_size, crear_catalogos=crear_catalogos)
+        inicio = time.perf_counter()
+        with open(archivo, newline='', encoding='utf-8-sig') as f:
+            resultado = importador.importar(leer_csv(f, delimitador))
+        segundos = time.perf_counter() - inicio
+        for linea, mensaje in resultado.errores:
+            self.stderr.write(f"Línea {linea}: {mensaje}")
+        creados = ', '.join(f"{n} {modelo}" for modelo, n in resultado.creados.items()) or 'nada'
+        self.stdout.write(
+            f"{resultado.filas} filas en {segundos:.1f}s ({resultado.filas / max(segundos, 1e-9):.0f} filas/s): "
+            f"creados {creados}; {len(resultado.errores)} errores."
+        )
+        if not resultado.creados and resultado.errores:
+            raise CommandError("No se importó ninguna fila.")
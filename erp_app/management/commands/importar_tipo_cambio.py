@@ -0,0 +1,48 @@
+import csv
+from datetime import date
+from decimal import Decimal, InvalidOperation
+
+from django.core.management.base import BaseCommand, CommandError
+
+from erp_app import tipo_cambio
+from erp_app.models import TipoCambio
+
+
+class Command(BaseCommand):
+    help = "Importa tasas históricas CLP/USD desde un CSV con columnas fecha,clp_por_usd."
+
+    def add_arguments(self, parser):
+        parser.add_argument('archivo')
+        parser.add_argument('--batch-size', type=int, default=2000)
+        parser.add_argument('--delimitador', default=',')
+
+    def handle(self, *args, archivo, batch_size, delimitador, **options):
+        importadas = errores = 0
+        lote = []
+        with open(archivo, newline='', encoding='utf-8') as f:
+            for numero, fila in enumerate(csv.reader(f, delimiter=delimitador), start=1):
+                if not fila or (numero == 1 and fila[0].strip().lower() == 'fecha'):
+                    continue
+                try:
+                    lote.append(TipoCambio(
+                        fecha=date.fromisoformat(fila[0].strip()),
+                        clp_por_usd=Decimal(fila[1].strip().replace(',', '.')),
+                    ))
+                except (IndexError, ValueError, InvalidOperation):
+                    errores += 1
+                    self.stderr.write(f"Línea {numero}: fila inválida {fila!r}")
+                    continue
+                if len(lote) >= batch_size:
+                    importadas += self._guardar(lote)
+                    lote = []
+        importadas += self._guardar(lote)
+        tipo_cambio.invalidar()
+        self.stdout.write(f"{importadas} tasas importadas, {errores} filas con errores.")
+        if importadas == 0 and errores:
+            raise CommandError("No se importó ninguna tasa.")
+
+    def _guardar(self, lote):
+        TipoCambio.objects.bulk_create(
+            lote, update_conflicts=True, unique_fields=['fecha'], update_fields=['clp_por_usd'],
+        )
+        return len(lote)
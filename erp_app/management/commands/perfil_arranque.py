@@ -0,0 +1,34 @@
+import json
+
+from django.core.management.base import BaseCommand
+
+from erp_app import arranque
+
+
+class Command(BaseCommand):
+    help = (
+        "Mide el arranque en frío de un worker (carga WSGI y URLconf en un intérprete nuevo): "
+        "tiempo, memoria residente y los módulos que más tardan en importarse."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--repeticiones', type=int, default=3)
+        parser.add_argument('--modulos', type=int, default=25, help="Módulos a listar.")
+        parser.add_argument('--prefijo', default='', help="Solo módulos con este prefijo, p. ej. erp_app.")
+        parser.add_argument('--json', action='store_true', dest='en_json', help="Emite el resultado en JSON.")
+
+    def handle(self, *args, repeticiones, modulos, prefijo, en_json, **options):
+        perfil = arranque.medir(repeticiones)
+        lentos = [modulo for modulo in arranque.importaciones() if modulo[0].startswith(prefijo)][:modulos]
+        if en_json:
+            perfil['importaciones'] = [
+                {'modulo': nombre, 'propio_ms': propio, 'acumulado_ms': acumulado} for nombre, propio, acumulado in lentos
+            ]
+            self.stdout.write(json.dumps(perfil, indent=2, ensure_ascii=False))
+            return
+        self.stdout.write(
+            f"Arranque en frío: {perfil['segundos']} s, {perfil['rss_mb']} MB residentes, {perfil['modulos']} módulos."
+        )
+        self.stdout.write(f"{'módulo':60} {'propio':>10} {'acumulado':>12}")
+        for nombre, propio, acumulado in lentos:
+            self.stdout.write(f"{nombre:60} {propio:>8.1f}ms {acumulado:>10.1f}ms")
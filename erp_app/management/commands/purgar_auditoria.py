@@ -0,0 +1,31 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from erp_app import auditoria
+from erp_app.models import RegistroAuditoria
+
+
+class Command(BaseCommand):
+    help = (
+        "Borra los registros de auditoría de los meses anteriores a la retención "
+        "(AUDITORIA_RETENCION_MESES, contando el mes actual), mes a mes y en lotes."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--meses', type=int, help="Meses a conservar; por defecto AUDITORIA_RETENCION_MESES.")
+        parser.add_argument('--batch-size', type=int, default=5000)
+        parser.add_argument('--dry-run', action='store_true', help="Solo informa cuántos registros se borrarían.")
+
+    def handle(self, *args, meses, batch_size, dry_run, **options):
+        meses = meses or getattr(settings, 'AUDITORIA_RETENCION_MESES', 24)
+        if meses < 1:
+            raise CommandError("--meses debe ser al menos 1.")
+        corte = auditoria.inicio_retencion(meses)
+        if dry_run:
+            total = RegistroAuditoria.objects.filter(periodo__lt=corte).count()
+            self.stdout.write(f"{total} registros anteriores a {corte:%Y-%m} se borrarían.")
+            return
+        borrados = auditoria.purgar(meses, batch_size)
+        for periodo, filas in borrados.items():
+            self.stdout.write(f"  {periodo[:7]}: {filas} registros")
+        self.stdout.write(f"{sum(borrados.values())} registros anteriores a {corte:%Y-%m} borrados.")
@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+
+from erp_app import busqueda
+
+
+class Command(BaseCommand):
+    help = "Reconstruye los índices de búsqueda FTS5 desde las tablas (solo SQLite; en PostgreSQL no hace falta)."
+
+    def handle(self, *args, **options):
+        if busqueda.motor() != 'fts5':
+            self.stdout.write(f"La base usa búsqueda por {busqueda.motor()}: no hay índices que reconstruir.")
+            return
+        for modelo, filas in busqueda.reconstruir().items():
+            self.stdout.write(f"{modelo}: {filas} filas indexadas.")
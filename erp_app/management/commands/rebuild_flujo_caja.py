@@ -0,0 +1,23 @@
+from django.core.management.base import BaseCommand
+
+from erp_app import flujo_caja
+
+
+class Command(BaseCommand):
+    help = (
+        "Verifica los totales precalculados de flujo de caja contra los documentos y, "
+        "salvo con --dry-run, reconstruye partidas y totales desde cero."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=2000)
+        parser.add_argument('--dry-run', action='store_true', help="Solo informa las diferencias.")
+
+    def handle(self, *args, batch_size, dry_run, **options):
+        diferencias = flujo_caja.diferencias(batch_size)
+        for (periodo, inicio, tipo, moneda), (guardado, esperado) in diferencias.items():
+            self.stdout.write(f"  {periodo} {inicio} {tipo} {moneda}: guardado {guardado}, esperado {esperado}")
+        self.stdout.write(f"{len(diferencias)} totales con diferencias.")
+        if not dry_run:
+            flujo_caja.recalcular(batch_size)
+            self.stdout.write("Partidas y totales reconstruidos.")
@@ -0,0 +1,21 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from erp_app import rendimiento
+from erp_app.models import EstadisticaRendimiento, MuestraRendimiento
+
+
+class Command(BaseCommand):
+    help = "Reconstruye desde cero las muestras y estadísticas diarias de rendimiento a partir de las operaciones."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=2000)
+
+    def handle(self, *args, batch_size, **options):
+        inicio = time.perf_counter()
+        rendimiento.recalcular(batch_size)
+        self.stdout.write(
+            f"{MuestraRendimiento.objects.count()} operaciones en {EstadisticaRendimiento.objects.count()} "
+            f"estadísticas diarias, en {time.perf_counter() - inicio:.1f}s."
+        )
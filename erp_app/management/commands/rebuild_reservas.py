@@ -0,0 +1,23 @@
+from django.core.management.base import BaseCommand
+
+from erp_app import disponibilidad
+
+
+class Command(BaseCommand):
+    help = (
+        "Verifica los kg reservados de cada producto contra las órdenes confirmadas sin embarque y, "
+        "salvo con --dry-run, reconstruye las reservas desde cero."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=2000)
+        parser.add_argument('--dry-run', action='store_true', help="Solo informa las diferencias.")
+
+    def handle(self, *args, batch_size, dry_run, **options):
+        diferencias = disponibilidad.diferencias()
+        for producto_id, (guardado, esperado) in diferencias.items():
+            self.stdout.write(f"  producto {producto_id}: reservado {guardado}, esperado {esperado}")
+        self.stdout.write(f"{len(diferencias)} productos con diferencias.")
+        if not dry_run:
+            disponibilidad.recalcular(batch_size)
+            self.stdout.write("Reservas reconstruidas.")
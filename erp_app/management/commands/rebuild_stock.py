@@ -0,0 +1,88 @@
+from collections import defaultdict
+from decimal import Decimal
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from erp_app import inventario
+from erp_app.models import (
+    CompraMateriaPrima, OperacionProcesamiento, ItemOrdenVenta,
+    InventarioMateriaPrima, InventarioProductoFinal, MovimientoInventario
+)
+
+
+class Command(BaseCommand):
+    help = "Recalcula los stocks denormalizados reproduciendo el libro de movimientos de inventario."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=5000)
+        parser.add_argument(
+            '--sincronizar-documentos', action='store_true',
+            help="Antes de reproducir, contabiliza compras, operaciones e ítems que aún no tengan movimientos.",
+        )
+        parser.add_argument('--dry-run', action='store_true', help="Solo informa las diferencias.")
+
+    def handle(self, *args, batch_size, sincronizar_documentos, dry_run, **options):
+        if sincronizar_documentos:
+            self._sincronizar_documentos(batch_size)
+
+        stock_mp = defaultdict(Decimal)
+        stock_pt = defaultdict(Decimal)
+        movimientos = (
+            MovimientoInventario.objects.order_by('pk')
+            .values_list('materia_prima_id', 'producto_id', 'cantidad_kg')
+            .iterator(chunk_size=batch_size)
+        )
+        total = 0
+        for mp_id, pt_id, kg in movimientos:
+            if mp_id is not None:
+                stock_mp[mp_id] += kg
+            else:
+                stock_pt[pt_id] += kg
+            total += 1
+        self.stdout.write(f"{total} movimientos reproducidos.")
+
+        with transaction.atomic():
+            for modelo, campo, stock in (
+                (InventarioMateriaPrima, 'materia_prima_id', stock_mp),
+                (InventarioProductoFinal, 'producto_id', stock_pt),
+            ):
+                diferencias = self._aplicar(modelo, campo, stock, batch_size, dry_run)
+                self.stdout.write(f"{modelo._meta.verbose_name}: {diferencias} filas con diferencias.")
+            if dry_run:
+                transaction.set_rollback(True)
+
+    def _aplicar(self, modelo, campo, stock, batch_size, dry_run):
+        existentes = set(modelo.objects.values_list(campo, flat=True))
+        faltantes = [modelo(**{campo: pk, 'stock_kg': kg}) for pk, kg in stock.items() if pk not in existentes]
+        modelo.objects.bulk_create(faltantes, batch_size=batch_size)
+
+        diferencias = len(faltantes)
+        lote = []
+        for fila in modelo.objects.select_for_update().order_by('pk').iterator(chunk_size=batch_size):
+            esperado = stock.get(getattr(fila, campo), Decimal(0))
+            if fila.stock_kg != esperado:
+                if dry_run:
+                    self.stdout.write(f"  {fila}: esperado {esperado} kg")
+                fila.stock_kg = esperado
+                lote.append(fila)
+                if len(lote) >= batch_size:
+                    modelo.objects.bulk_update(lote, ['stock_kg'])
+                    diferencias += len(lote)
+                    lote = []
+        modelo.objects.bulk_update(lote, ['stock_kg'])
+        return diferencias + len(lote)
+
+    def _sincronizar_documentos(self, batch_size):
+        for modelo, sincronizar in (
+            (CompraMateriaPrima, inventario.sincronizar_compras),
+            (OperacionProcesamiento, inventario.sincronizar_operaciones),
+            (ItemOrdenVenta, inventario.sincronizar_items_orden),
+        ):
+            lote = []
+            for doc in modelo.objects.order_by('pk').iterator(chunk_size=batch_size):
+                lote.append(doc)
+                if len(lote) >= batch_size:
+                    sincronizar(lote)
+                    lote = []
+            sincronizar(lote)
@@ -0,0 +1,91 @@
+import multiprocessing
+import os
+import signal
+import time
+import traceback
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from concurrent.futures.process import BrokenProcessPool
+
+import django
+from django.core.management.base import BaseCommand
+from django.db import connections
+
+from erp_app import trabajos
+
+
+def detener(signum, frame):
+    raise KeyboardInterrupt
+
+
+class Command(BaseCommand):
+    help = (
+        "Ejecuta los trabajos en segundo plano de la cola (modelo Trabajo) en un pool de procesos. "
+        "Con --en-proceso los ejecuta uno a uno en este proceso."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--procesos', type=int, default=os.cpu_count() or 1)
+        parser.add_argument('--intervalo', type=float, default=2.0, help="Segundos entre consultas a la cola vacía.")
+        parser.add_argument('--una-vez', action='store_true', help="Termina cuando no quedan trabajos vencidos.")
+        parser.add_argument('--en-proceso', action='store_true', help="Sin pool de procesos, para desarrollo local.")
+
+    def handle(self, *args, procesos, intervalo, una_vez, en_proceso, **options):
+        self.nombre = trabajos.nombre_trabajador()
+        self.stdout.write(f"Trabajador {self.nombre} iniciado.")
+        # El gestor de procesos detiene con SIGTERM: se trata como Ctrl+C para devolver los trabajos a la cola
+        anterior = signal.signal(signal.SIGTERM, detener)
+        try:
+            while True:
+                trabajos.recuperar_abandonados()
+                if en_proceso:
+                    ejecutados = trabajos.procesar(trabajador=self.nombre)
+                    if ejecutados:
+                        self.stdout.write(f"{ejecutados} trabajos ejecutados.")
+                    elif una_vez:
+                        break
+                    else:
+                        time.sleep(intervalo)
+                elif self.con_pool(procesos, intervalo, una_vez):
+                    break
+        except KeyboardInterrupt:
+            liberados = trabajos.liberar(self.nombre)
+            self.stdout.write(f"Detenido; {liberados} trabajos devueltos a la cola.")
+        finally:
+            signal.signal(signal.SIGTERM, anterior)
+
+    def con_pool(self, procesos, intervalo, una_vez):
+        """Ejecuta trabajos hasta vaciar la cola (con --una-vez) o hasta que el pool se rompa."""
+        # Los procesos hijos abren sus propias conexiones
+        connections.close_all()
+        contexto = multiprocessing.get_context('spawn')
+        en_curso = {}
+        with ProcessPoolExecutor(procesos, mp_context=contexto, initializer=django.setup) as pool:
+            while True:
+                while len(en_curso) < procesos and (trabajo := trabajos.reservar(self.nombre)):
+                    self.stdout.write(f"Iniciando {trabajo}.")
+                    en_curso[pool.submit(trabajos.ejecutar_por_id, trabajo.pk)] = trabajo.pk
+                if not en_curso:
+                    if una_vez:
+                        return True
+                    time.sleep(intervalo)
+                    trabajos.recuperar_abandonados()
+                    continue
+                hechos, _ = wait(en_curso, timeout=intervalo, return_when=FIRST_COMPLETED)
+                roto = False
+                for futuro in hechos:
+                    pk = en_curso.pop(futuro)
+                    try:
+                        ok = futuro.result()
+                    except BrokenProcessPool:
+                        roto = True
+                        trabajos.registrar_fallo(pk, traceback.format_exc(), self.nombre)
+                        ok = False
+                    except Exception:
+                        trabajos.registrar_fallo(pk, traceback.format_exc(), self.nombre)
+                        ok = False
+                    self.stdout.write(f"Trabajo #{pk} {'terminado' if ok else 'con error'}.")
+                if roto:
+                    # Un proceso murió (p. ej. sin memoria): se reintentan sus trabajos con un pool nuevo
+                    for pk in en_curso.values():
+                        trabajos.registrar_fallo(pk, "El pool de procesos se interrumpió.", self.nombre)
+                    return False
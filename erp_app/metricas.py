@@ -0,0 +1,69 @@
+"""
+Métricas del dashboard, calculadas en una sola consulta y guardadas en caché hasta que las
+señales las invalidan o vence ``DASHBOARD_CACHE_TTL``.
+"""
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.cache import cache
+from django.db import connection
+from django.utils import timezone
+
+from .models import (
+    OrdenVenta, OperacionProcesamiento, Embarque,
+    DocumentacionExportacion, InventarioProductoFinal
+)
+
+CACHE_KEY = 'erp:dashboard:snapshot'
+INVENTARIO_BAJO_KG = 100
+
+
+def consultas_dashboard(hoy):
+    return {
+        'ordenes_pendientes': OrdenVenta.objects.filter(estado='pendiente'),
+        'operaciones_pendientes': OperacionProcesamiento.objects.filter(abastecido_a_inventario=False),
+        'embarques_proximos': Embarque.objects.filter(fecha_embarque__gte=hoy),
+        'docs_pendientes': DocumentacionExportacion.objects.filter(estado_envio='pendiente'),
+        'inventario_bajo': InventarioProductoFinal.objects.filter(stock_kg__lt=INVENTARIO_BAJO_KG),
+    }
+
+
+def calcular_metricas(hoy=None):
+    """Calcula todas las métricas en un único viaje a la base de datos."""
+    hoy = hoy or timezone.localdate()
+    consultas = consultas_dashboard(hoy)
+    columnas, params = [], []
+    for nombre, qs in consultas.items():
+        sql, qs_params = qs.order_by().values('pk').query.sql_with_params()
+        columnas.append(f'(SELECT COUNT(*) FROM ({sql}) {nombre}_q) AS {nombre}')
+        params.extend(qs_params)
+    with connection.cursor() as cursor:
+        cursor.execute('SELECT ' + ', '.join(columnas), params)
+        fila = cursor.fetchone()
+    metricas = dict(zip(consultas, fila))
+    metricas['fecha'] = hoy.isoformat()
+    metricas['generado'] = timezone.now().isoformat()
+    return metricas
+
+
+def obtener_snapshot():
+    """Devuelve la instantánea en caché, recalculándola si expiró o cambió el día."""
+    hoy = timezone.localdate()
+    snapshot = cache.get(CACHE_KEY)
+    if snapshot is None or snapshot['fecha'] != hoy.isoformat():
+        snapshot = calcular_metricas(hoy)
+        cache.set(CACHE_KEY, snapshot, getattr(settings, 'DASHBOARD_CACHE_TTL', 60))
+    return snapshot
+
+
+async def aobtener_snapshot():
+    hoy = timezone.localdate()
+    snapshot = await cache.aget(CACHE_KEY)
+    if snapshot is None or snapshot['fecha'] != hoy.isoformat():
+        # Sigue siendo una sola consulta; el ORM asíncrono la ejecutaría igual en el hilo de sync_to_async
+        snapshot = await sync_to_async(calcular_metricas)(hoy)
+        await cache.aset(CACHE_KEY, snapshot, getattr(settings, 'DASHBOARD_CACHE_TTL', 60))
+    return snapshot
+
+
+def invalidar_snapshot():
+    cache.delete(CACHE_KEY)
@@ -0,0 +1,188 @@
+"""
+Instrumentación de consultas y latencia por vista.
+
+``PresupuestoConsultasMiddleware`` registra, para una muestra de las
+peticiones, cuántas consultas ejecutó la vista, cuántas fueron SQL duplicado
+(el síntoma típico de un N+1), el tiempo en base de datos y el tiempo total.
+Cada informe se emite como un registro JSON en el logger
+``erp_app.rendimiento``; las vistas que superan el presupuesto se registran
+con nivel WARNING. ``settings.LOGGING`` solo muestra esas, salvo que se
+defina ``ERP_LOG_RENDIMIENTO=INFO``. Se configura con ``settings.INSTRUMENTACION_CONSULTAS``::
+
+    INSTRUMENTACION_CONSULTAS = {
+        'HABILITADO': True,
+        'MUESTREO': 0.1,        # fracción de peticiones instrumentadas
+        'PRESUPUESTO': 30,      # consultas por petición
+    }
+
+Admite vistas síncronas y asíncronas; en ASGI no fuerza a las vistas
+asíncronas a ejecutarse en un hilo. En las respuestas en streaming el informe
+se emite al terminar de enviar el contenido e incluye las consultas hechas al
+recorrerlo (p. ej. las exportaciones), salvo si el contenido es asíncrono,
+como el flujo SSE del dashboard: entonces ``streaming_sin_contar`` lo indica.
+El encabezado ``Server-Timing`` solo se envía al staff o con ``DEBUG``.
+
+``AuditoriaMiddleware`` deja la petición en curso a disposición de
+``erp_app.auditoria`` para anotar el usuario de cada cambio.
+"""
+import json
+import logging
+import random
+import time
+from collections import Counter
+from contextlib import ExitStack
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction, sync_to_async
+from django.conf import settings
+from django.db import connections
+
+from .auditoria import peticion_actual
+
+logger = logging.getLogger('erp_app.rendimiento')
+
+
+class RegistroConsultas:
+    """``execute_wrapper`` que acumula el SQL ejecutado y su duración."""
+
+    def __init__(self):
+        self.sql = Counter()
+        self.tiempo_db = 0.0
+
+    def __call__(self, execute, sql, params, many, context):
+        inicio = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.tiempo_db += time.perf_counter() - inicio
+            self.sql[sql] += 1
+
+    @property
+    def total(self):
+        return sum(self.sql.values())
+
+    @property
+    def duplicadas(self):
+        return {sql: n for sql, n in self.sql.items() if n > 1}
+
+    def capturar(self):
+        pila = ExitStack()
+        for conexion in connections.all():
+            pila.enter_context(conexion.execute_wrapper(self))
+        return pila
+
+
+class PresupuestoConsultasMiddleware:
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.asincrono = iscoroutinefunction(get_response)
+        if self.asincrono:
+            markcoroutinefunction(self)
+        conf = getattr(settings, 'INSTRUMENTACION_CONSULTAS', {})
+        self.habilitado = conf.get('HABILITADO', settings.DEBUG)
+        self.muestreo = conf.get('MUESTREO', 1.0)
+        self.presupuesto = conf.get('PRESUPUESTO', 30)
+
+    def __call__(self, request):
+        if self.asincrono:
+            return self.__acall__(request)
+        if not self.habilitado or random.random() >= self.muestreo:
+            return self.get_response(request)
+
+        registro = RegistroConsultas()
+        inicio = time.perf_counter()
+        with registro.capturar():
+            response = self.get_response(request)
+        return self.informar(request, response, registro, inicio, self.mostrar_tiempos(request))
+
+    async def __acall__(self, request):
+        if not self.habilitado or random.random() >= self.muestreo:
+            return await self.get_response(request)
+
+        registro = RegistroConsultas()
+        inicio = time.perf_counter()
+        # Las conexiones son por hilo y el ORM asíncrono consulta desde el hilo de
+        # sync_to_async, así que la captura se instala y retira en ese hilo
+        pila = await sync_to_async(registro.capturar)()
+        try:
+            response = await self.get_response(request)
+        finally:
+            await sync_to_async(pila.close)()
+        # request.user se resuelve con el ORM síncrono
+        mostrar = await sync_to_async(self.mostrar_tiempos)(request)
+        return self.informar(request, response, registro, inicio, mostrar)
+
+    @staticmethod
+    def mostrar_tiempos(request):
+        # Los tiempos revelan detalles internos: solo para el staff o en desarrollo
+        usuario = getattr(request, 'user', None)
+        return settings.DEBUG or bool(usuario and usuario.is_staff)
+
+    def informar(self, request, response, registro, inicio, mostrar_tiempos):
+        if mostrar_tiempos:
+            response['Server-Timing'] = (
+                f"db;dur={round(registro.tiempo_db * 1000, 2)}, total;dur={round((time.perf_counter() - inicio) * 1000, 2)}"
+            )
+        # Los archivos ya escritos (p. ej. XLSX) no consultan al enviarse y conservan su envío directo
+        if response.streaming and not response.is_async and getattr(response, 'file_to_stream', None) is None:
+            response.streaming_content = self.al_terminar(response.streaming_content, request, response, registro, inicio)
+        else:
+            self.registrar(request, response, registro, time.perf_counter() - inicio)
+        return response
+
+    def al_terminar(self, contenido, request, response, registro, inicio):
+        try:
+            with registro.capturar():
+                yield from contenido
+        finally:
+            self.registrar(request, response, registro, time.perf_counter() - inicio)
+
+    def registrar(self, request, response, registro, total):
+        match = getattr(request, 'resolver_match', None)
+        duplicadas = registro.duplicadas
+        informe = {
+            'vista': match.view_name if match else None,
+            'ruta': request.path,
+            'metodo': request.method,
+            'estado': response.status_code,
+            'consultas': registro.total,
+            'consultas_duplicadas': sum(duplicadas.values()) - len(duplicadas),
+            'sql_mas_repetido': max(duplicadas, key=duplicadas.get)[:300] if duplicadas else None,
+            'tiempo_db_ms': round(registro.tiempo_db * 1000, 2),
+            'tiempo_total_ms': round(total * 1000, 2),
+            'presupuesto': self.presupuesto,
+            'excede_presupuesto': registro.total > self.presupuesto,
+            'streaming_sin_contar': response.streaming and response.is_async,
+        }
+        nivel = logging.WARNING if informe['excede_presupuesto'] else logging.INFO
+        logger.log(nivel, json.dumps(informe, ensure_ascii=False), extra={'informe': informe})
+
+
+class AuditoriaMiddleware:
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.asincrono = iscoroutinefunction(get_response)
+        if self.asincrono:
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if self.asincrono:
+            return self.__acall__(request)
+        token = peticion_actual.set(request)
+        try:
+            return self.get_response(request)
+        finally:
+            peticion_actual.reset(token)
+
+    async def __acall__(self, request):
+        # sync_to_async copia el contexto, así que las vistas síncronas también la ven
+        token = peticion_actual.set(request)
+        try:
+            return await self.get_response(request)
+        finally:
+            peticion_actual.reset(token)
@@ -0,0 +1,31 @@
+# Generated by Django 5.2.18 on 2026-10-18 10:46
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('erp_app', '0003_remove_ordenventa_operacion'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='MovimientoInventario',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('tipo', models.CharField(choices=[('compra', 'Recepción de compra'), ('consumo', 'Consumo en procesamiento'), ('produccion', 'Salida de procesamiento'), ('venta', 'Despacho de venta'), ('ajuste', 'Ajuste')], max_length=20)),
+                ('cantidad_kg', models.DecimalField(decimal_places=3, max_digits=15)),
+                ('creado', models.DateTimeField(auto_now_add=True)),
+                ('compra', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='movimientos', to='erp_app.compramateriaprima')),
+                ('item_orden', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='movimientos', to='erp_app.itemordenventa')),
+                ('materia_prima', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.PROTECT, to='erp_app.materiaprima')),
+                ('operacion', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='movimientos', to='erp_app.operacionprocesamiento')),
+                ('producto', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.PROTECT, to='erp_app.productoterminado')),
+            ],
+            options={
+                'constraints': [models.CheckConstraint(condition=models.Q(models.Q(('materia_prima__isnull', False), ('producto__isnull', True)), models.Q(('materia_prima__isnull', True), ('producto__isnull', False)), _connector='OR'), name='movimiento_un_solo_item')],
+            },
+        ),
+    ]
@@ -0,0 +1,41 @@
+# Generated by Django 5.2.18 on 2026-10-18 10:52
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('erp_app', '0005_tipocambio'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='compramateriaprima',
+            index=models.Index(fields=['abastecida', 'proveedor'], name='compra_abastecida_prov_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='documentacionexportacion',
+            index=models.Index(fields=['estado_envio', 'plazo_envio_courier'], name='doc_envio_plazo_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='embarque',
+            index=models.Index(fields=['fecha_embarque'], name='embarque_fecha_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='inventarioproductofinal',
+            index=models.Index(fields=['stock_kg'], name='invpf_stock_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='operacionprocesamiento',
+            index=models.Index(condition=models.Q(('abastecido_a_inventario', False)), fields=['fecha'], name='operacion_pendiente_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='ordenventa',
+            index=models.Index(fields=['estado', 'fecha'], name='ordenventa_estado_fecha_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='serviciologistico',
+            index=models.Index(fields=['estado_pago', 'fecha_vencimiento'], name='servicio_pago_venc_idx'),
+        ),
+    ]
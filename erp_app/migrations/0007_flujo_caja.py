@@ -0,0 +1,44 @@
+# Generated by Django 5.2.18 on 2026-10-18 11:06
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('erp_app', '0006_indices_filtros'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='FlujoCaja',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('tipo', models.CharField(choices=[('cobro', 'Por cobrar'), ('pago', 'Por pagar')], max_length=10)),
+                ('periodo', models.CharField(choices=[('semana', 'Semana'), ('mes', 'Mes')], max_length=10)),
+                ('inicio', models.DateField()),
+                ('moneda', models.CharField(choices=[('USD', 'USD'), ('CLP', 'CLP')], max_length=3)),
+                ('monto', models.DecimalField(decimal_places=2, default=0, max_digits=18)),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('periodo', 'inicio', 'tipo', 'moneda'), name='flujo_caja_unico')],
+            },
+        ),
+        migrations.CreateModel(
+            name='PartidaFlujoCaja',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('tipo', models.CharField(choices=[('cobro', 'Por cobrar'), ('pago', 'Por pagar')], max_length=10)),
+                ('concepto', models.CharField(max_length=20)),
+                ('fecha', models.DateField()),
+                ('moneda', models.CharField(choices=[('USD', 'USD'), ('CLP', 'CLP')], max_length=3)),
+                ('monto', models.DecimalField(decimal_places=2, max_digits=18)),
+                ('orden', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='partidas_flujo', to='erp_app.ordenventa')),
+                ('servicio', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='partidas_flujo', to='erp_app.serviciologistico')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['tipo', 'fecha'], name='partida_tipo_fecha_idx')],
+            },
+        ),
+    ]
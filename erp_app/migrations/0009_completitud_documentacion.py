@@ -0,0 +1,44 @@
+# Generated by Django 5.2.18 on 2026-10-18 11:14
+
+from django.db import migrations, models
+from django.db.models import Case, IntegerField, Value, When
+
+DOCUMENTOS = ('dus', 'guia_despacho', 'packing_list', 'certificado_origen')
+
+
+def calcular_completitud(apps, schema_editor):
+    """Completa máscara y porcentaje de los registros existentes con un solo UPDATE."""
+    DocumentacionExportacion = apps.get_model('erp_app', 'DocumentacionExportacion')
+    presentes = [
+        Case(When(**{campo: True}, then=Value(1)), default=Value(0), output_field=IntegerField())
+        for campo in DOCUMENTOS
+    ]
+    DocumentacionExportacion.objects.update(
+        documentos=sum((presente * (1 << i) for i, presente in enumerate(presentes[1:], 1)), presentes[0]),
+        completitud=sum(presentes[1:], presentes[0]) * 100 / len(DOCUMENTOS),
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('erp_app', '0008_trabajo'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='documentacionexportacion',
+            name='completitud',
+            field=models.PositiveSmallIntegerField(default=0, editable=False, help_text='Porcentaje de documentos presentes.'),
+        ),
+        migrations.AddField(
+            model_name='documentacionexportacion',
+            name='documentos',
+            field=models.PositiveSmallIntegerField(default=0, editable=False, help_text='Máscara de documentos presentes.'),
+        ),
+        migrations.AddIndex(
+            model_name='documentacionexportacion',
+            index=models.Index(condition=models.Q(('completitud__lt', 100), ('estado_envio', 'pendiente')), fields=['plazo_envio_courier'], name='doc_riesgo_plazo_idx'),
+        ),
+        migrations.RunPython(calcular_completitud, migrations.RunPython.noop),
+    ]
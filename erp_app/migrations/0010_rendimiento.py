@@ -0,0 +1,45 @@
+# Generated by Django 5.2.18 on 2026-10-18 11:16
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('erp_app', '0009_completitud_documentacion'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='MuestraRendimiento',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('fecha', models.DateField()),
+                ('rendimiento_pct', models.FloatField()),
+                ('esperado_pct', models.FloatField(blank=True, null=True)),
+                ('materia_prima', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='erp_app.materiaprima')),
+                ('operacion', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='muestra_rendimiento', to='erp_app.operacionprocesamiento')),
+                ('producto', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='erp_app.productoterminado')),
+            ],
+        ),
+        migrations.CreateModel(
+            name='EstadisticaRendimiento',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('fecha', models.DateField()),
+                ('n', models.PositiveIntegerField(default=0)),
+                ('media', models.FloatField(default=0)),
+                ('m2', models.FloatField(default=0)),
+                ('n_desvio', models.PositiveIntegerField(default=0)),
+                ('media_desvio', models.FloatField(default=0)),
+                ('m2_desvio', models.FloatField(default=0)),
+                ('histograma', models.JSONField(default=dict)),
+                ('materia_prima', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='erp_app.materiaprima')),
+                ('producto', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='erp_app.productoterminado')),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('materia_prima', 'producto', 'fecha'), name='estadistica_rendimiento_unica')],
+            },
+        ),
+    ]
@@ -0,0 +1,28 @@
+# Generated by Django 5.2.18 on 2026-10-18 11:27
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('erp_app', '0010_rendimiento'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='inventarioproductofinal',
+            name='reservado_kg',
+            field=models.DecimalField(decimal_places=3, default=0, editable=False, max_digits=15),
+        ),
+        migrations.CreateModel(
+            name='ReservaStock',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('cantidad_kg', models.DecimalField(decimal_places=3, max_digits=12)),
+                ('item_orden', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='reserva', to='erp_app.itemordenventa')),
+                ('producto', models.ForeignKey(on_delete=django.db.models.deletion.PROTECT, related_name='reservas', to='erp_app.productoterminado')),
+            ],
+        ),
+    ]
@@ -0,0 +1,51 @@
+from django.db import migrations
+
+# Tabla del modelo: campos indexados (ver erp_app.busqueda.INDICES)
+INDICES = {
+    'erp_app_cliente': ('nombre', 'pais', 'email'),
+    'erp_app_proveedor': ('nombre', 'region', 'contacto', 'email'),
+    'erp_app_proveedorservicio': ('nombre', 'contacto'),
+    'erp_app_serviciologistico': ('documento_referencia',),
+}
+
+
+def crear_indices(apps, schema_editor):
+    vendor = schema_editor.connection.vendor
+    if vendor == 'sqlite':
+        for tabla, campos in INDICES.items():
+            columnas = ', '.join(campos)
+            schema_editor.execute(
+                f"CREATE VIRTUAL TABLE IF NOT EXISTS {tabla}_busqueda USING fts5("
+                f"{columnas}, tokenize='unicode61 remove_diacritics 2', prefix='2 3')"
+            )
+            schema_editor.execute(
+                f"INSERT INTO {tabla}_busqueda (rowid, {columnas}) SELECT id, {columnas} FROM {tabla}"
+            )
+    elif vendor == 'postgresql':
+        schema_editor.execute('CREATE EXTENSION IF NOT EXISTS pg_trgm')
+        for tabla, campos in INDICES.items():
+            for campo in campos:
+                schema_editor.execute(
+                    f'CREATE INDEX IF NOT EXISTS {tabla}_{campo}_trgm ON {tabla} USING gin (UPPER({campo}::text) gin_trgm_ops)'
+                )
+
+
+def borrar_indices(apps, schema_editor):
+    vendor = schema_editor.connection.vendor
+    for tabla, campos in INDICES.items():
+        if vendor == 'sqlite':
+            schema_editor.execute(f'DROP TABLE IF EXISTS {tabla}_busqueda')
+        elif vendor == 'postgresql':
+            for campo in campos:
+                schema_editor.execute(f'DROP INDEX IF EXISTS {tabla}_{campo}_trgm')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('erp_app', '0011_reservas_stock'),
+    ]
+
+    operations = [
+        migrations.RunPython(crear_indices, borrar_indices),
+    ]
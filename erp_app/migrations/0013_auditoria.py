@@ -0,0 +1,38 @@
+# Generated by Django 5.2.18 on 2026-10-18 11:34
+
+import django.core.serializers.json
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('contenttypes', '0002_remove_content_type_name'),
+        ('erp_app', '0012_busqueda'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RegistroAuditoria',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('fecha', models.DateTimeField()),
+                ('periodo', models.DateField()),
+                ('objeto_id', models.BigIntegerField()),
+                ('raiz_id', models.BigIntegerField()),
+                ('accion', models.CharField(choices=[('alta', 'Alta'), ('cambio', 'Cambio'), ('baja', 'Baja')], max_length=10)),
+                ('objeto_repr', models.CharField(blank=True, max_length=200)),
+                ('cambios', models.JSONField(encoder=django.core.serializers.json.DjangoJSONEncoder, help_text='{campo: [antes, después]}')),
+                ('tipo', models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, related_name='+', to='contenttypes.contenttype')),
+                ('tipo_raiz', models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, related_name='+', to='contenttypes.contenttype')),
+                ('usuario', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'ordering': ['-fecha', '-pk'],
+                'indexes': [models.Index(fields=['tipo_raiz', 'raiz_id', '-fecha'], name='auditoria_raiz_fecha_idx'), models.Index(fields=['periodo'], name='auditoria_periodo_idx')],
+            },
+        ),
+    ]
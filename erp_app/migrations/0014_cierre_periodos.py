@@ -0,0 +1,82 @@
+# Generated by Django 5.2.18 on 2026-10-18 11:38
+
+import django.core.serializers.json
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('erp_app', '0013_auditoria'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CierrePeriodo',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('periodo', models.DateField(help_text='Primer día del mes.', unique=True)),
+                ('cerrado', models.DateTimeField()),
+                ('filas', models.PositiveIntegerField(default=0)),
+                ('total_usd', models.JSONField(default=dict, encoder=django.core.serializers.json.DjangoJSONEncoder, help_text='{hecho: monto en USD}')),
+            ],
+            options={
+                'ordering': ['-periodo'],
+            },
+        ),
+        migrations.CreateModel(
+            name='CuboMensual',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('periodo', models.DateField()),
+                ('hecho', models.CharField(choices=[('venta', 'Venta'), ('compra', 'Compra de materia prima'), ('maquila', 'Costo de maquila'), ('logistica', 'Servicio logístico')], max_length=10)),
+                ('moneda', models.CharField(choices=[('USD', 'USD'), ('CLP', 'CLP')], max_length=3)),
+                ('kg', models.DecimalField(decimal_places=3, default=0, max_digits=18)),
+                ('monto', models.DecimalField(decimal_places=2, max_digits=20)),
+                ('monto_usd', models.DecimalField(decimal_places=2, max_digits=20)),
+                ('documentos', models.PositiveIntegerField(default=0)),
+            ],
+        ),
+        migrations.AddIndex(
+            model_name='compramateriaprima',
+            index=models.Index(fields=['fecha'], name='compra_fecha_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='costomaquila',
+            index=models.Index(fields=['fecha'], name='maquila_fecha_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='ordenventa',
+            index=models.Index(fields=['fecha'], name='ordenventa_fecha_idx'),
+        ),
+        migrations.AddField(
+            model_name='cubomensual',
+            name='cliente',
+            field=models.ForeignKey(blank=True, db_index=False, null=True, on_delete=django.db.models.deletion.PROTECT, related_name='+', to='erp_app.cliente'),
+        ),
+        migrations.AddField(
+            model_name='cubomensual',
+            name='materia_prima',
+            field=models.ForeignKey(blank=True, db_index=False, null=True, on_delete=django.db.models.deletion.PROTECT, related_name='+', to='erp_app.materiaprima'),
+        ),
+        migrations.AddField(
+            model_name='cubomensual',
+            name='producto',
+            field=models.ForeignKey(blank=True, db_index=False, null=True, on_delete=django.db.models.deletion.PROTECT, related_name='+', to='erp_app.productoterminado'),
+        ),
+        migrations.AddField(
+            model_name='cubomensual',
+            name='proveedor',
+            field=models.ForeignKey(blank=True, db_index=False, null=True, on_delete=django.db.models.deletion.PROTECT, related_name='+', to='erp_app.proveedor'),
+        ),
+        migrations.AddField(
+            model_name='cubomensual',
+            name='proveedor_servicio',
+            field=models.ForeignKey(blank=True, db_index=False, null=True, on_delete=django.db.models.deletion.PROTECT, related_name='+', to='erp_app.proveedorservicio'),
+        ),
+        migrations.AddIndex(
+            model_name='cubomensual',
+            index=models.Index(fields=['periodo', 'hecho'], name='cubo_periodo_hecho_idx'),
+        ),
+    ]
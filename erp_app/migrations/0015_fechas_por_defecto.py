@@ -0,0 +1,34 @@
+# Generated by Django 5.2.18 on 2026-10-18 11:50
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('erp_app', '0014_cierre_periodos'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='compramateriaprima',
+            name='fecha',
+            field=models.DateField(default=django.utils.timezone.localdate, editable=False),
+        ),
+        migrations.AlterField(
+            model_name='cotizacion',
+            name='fecha',
+            field=models.DateField(default=django.utils.timezone.localdate, editable=False),
+        ),
+        migrations.AlterField(
+            model_name='operacionprocesamiento',
+            name='fecha',
+            field=models.DateField(default=django.utils.timezone.localdate, editable=False),
+        ),
+        migrations.AlterField(
+            model_name='ordenventa',
+            name='fecha',
+            field=models.DateField(default=django.utils.timezone.localdate, editable=False),
+        ),
+    ]
@@ -0,0 +1,19 @@
+# Generated by Django 5.2.18 on 2026-10-18 11:50
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('erp_app', '0015_fechas_por_defecto'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='trabajo',
+            name='ejecutar_desde',
+            field=models.DateTimeField(default=django.utils.timezone.now),
+        ),
+    ]
@@ -0,0 +1,13 @@
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+    # La tabla de CACHES se crea con ``manage.py createcachetable`` al desplegar (ver erp_avellanos/database.py).
+    # Esta migración la creaba y el runner de pruebas, que también la crea, la encontraba ya hecha;
+    # queda vacía para no romper las bases que ya la aplicaron.
+
+    dependencies = [
+        ('erp_app', '0016_trabajo_ejecutar_desde'),
+    ]
+
+    operations = []
@@ -0,0 +1,40 @@
+import django.db.models.expressions
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    # Django no altera columnas hacia columnas generadas: se quitan y se vuelven a agregar,
+    # junto con el índice parcial que depende de completitud. La base calcula los valores.
+
+    dependencies = [
+        ('erp_app', '0017_tabla_cache'),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='documentacionexportacion',
+            name='doc_riesgo_plazo_idx',
+        ),
+        migrations.RemoveField(
+            model_name='documentacionexportacion',
+            name='completitud',
+        ),
+        migrations.RemoveField(
+            model_name='documentacionexportacion',
+            name='documentos',
+        ),
+        migrations.AddField(
+            model_name='documentacionexportacion',
+            name='documentos',
+            field=models.GeneratedField(db_persist=True, expression=django.db.models.expressions.CombinedExpression(django.db.models.expressions.CombinedExpression(django.db.models.expressions.CombinedExpression(models.Case(models.When(dus=True, then=models.Value(1)), default=models.Value(0)), '+', models.Case(models.When(guia_despacho=True, then=models.Value(2)), default=models.Value(0))), '+', models.Case(models.When(packing_list=True, then=models.Value(4)), default=models.Value(0))), '+', models.Case(models.When(certificado_origen=True, then=models.Value(8)), default=models.Value(0))), help_text='Máscara de documentos presentes.', output_field=models.PositiveSmallIntegerField()),
+        ),
+        migrations.AddField(
+            model_name='documentacionexportacion',
+            name='completitud',
+            field=models.GeneratedField(db_persist=True, expression=django.db.models.expressions.CombinedExpression(django.db.models.expressions.CombinedExpression(django.db.models.expressions.CombinedExpression(django.db.models.expressions.CombinedExpression(django.db.models.expressions.CombinedExpression(models.Case(models.When(dus=True, then=models.Value(1)), default=models.Value(0)), '+', models.Case(models.When(guia_despacho=True, then=models.Value(1)), default=models.Value(0))), '+', models.Case(models.When(packing_list=True, then=models.Value(1)), default=models.Value(0))), '+', models.Case(models.When(certificado_origen=True, then=models.Value(1)), default=models.Value(0))), '*', models.Value(100)), '/', models.Value(4)), help_text='Porcentaje de documentos presentes.', output_field=models.PositiveSmallIntegerField()),
+        ),
+        migrations.AddIndex(
+            model_name='documentacionexportacion',
+            index=models.Index(condition=models.Q(('completitud__lt', 100), ('estado_envio', 'pendiente')), fields=['plazo_envio_courier'], name='doc_riesgo_plazo_idx'),
+        ),
+    ]
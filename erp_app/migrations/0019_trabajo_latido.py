@@ -0,0 +1,26 @@
+# Generated by Django 5.2.18 on 2026-10-18 12:24
+
+from django.db import migrations, models
+from django.db.models import F
+
+
+def latido_inicial(apps, schema_editor):
+    """Los trabajos en ejecución al migrar toman como latido su hora de inicio."""
+    Trabajo = apps.get_model('erp_app', 'Trabajo')
+    Trabajo.objects.filter(estado='ejecutando').update(latido=F('iniciado'))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('erp_app', '0018_documentacion_generada'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='trabajo',
+            name='latido',
+            field=models.DateTimeField(blank=True, help_text='Última señal del trabajador que lo ejecuta.', null=True),
+        ),
+        migrations.RunPython(latido_inicial, migrations.RunPython.noop),
+    ]
@@ -1,4 +1,19 @@
+import operator
+from decimal import Decimal
+from functools import reduce
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
 from django.db import models
+from django.db.models import Case, ExpressionWrapper, F, Sum, Value, When
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+
+LB_POR_KG = Decimal('2.20462')
+
+def _catalogo(obj, campo):
+    """Etiqueta del catálogo relacionado sin consultar la base si está en caché (ver erp_app.catalogos)."""
+    from .catalogos import etiqueta_de
+    return etiqueta_de(obj, campo)
 
 class Cliente(models.Model):
     nombre = models.CharField(max_length=100)
@@ -41,22 +56,35 @@ class CompraMateriaPrima(models.Model):
     cantidad_kg = models.DecimalField(max_digits=12, decimal_places=3)
     precio_por_kg = models.DecimalField(max_digits=12, decimal_places=2)
     moneda = models.CharField(max_length=3, choices=[('USD', 'USD'), ('CLP', 'CLP')], default='USD')
-    fecha = models.DateField(auto_now_add=True)
+    fecha = models.DateField(default=timezone.localdate, editable=False)
     abastecida = models.BooleanField(default=False)
+    class Meta:
+        indexes = [
+            models.Index(fields=['abastecida', 'proveedor'], name='compra_abastecida_prov_idx'),
+            # Cierre de período y mes abierto del cubo (ver erp_app.cierre)
+            models.Index(fields=['fecha'], name='compra_fecha_idx'),
+        ]
     def __str__(self):
-        return f"{self.cantidad_kg} kg de {self.materia_prima} de {self.proveedor}"
+        return f"{self.cantidad_kg} kg de {_catalogo(self, 'materia_prima')} de {_catalogo(self, 'proveedor')}"
 
 class InventarioMateriaPrima(models.Model):
     materia_prima = models.OneToOneField(MateriaPrima, on_delete=models.CASCADE)
     stock_kg = models.DecimalField(max_digits=15, decimal_places=3, default=0)
     def __str__(self):
-        return f"{self.stock_kg} kg de {self.materia_prima}"
+        return f"{self.stock_kg} kg de {_catalogo(self, 'materia_prima')}"
 
 class InventarioProductoFinal(models.Model):
     producto = models.OneToOneField(ProductoTerminado, on_delete=models.CASCADE)
     stock_kg = models.DecimalField(max_digits=15, decimal_places=3, default=0)
+    # Comprometido por órdenes confirmadas sin embarcar; lo mantiene erp_app.disponibilidad
+    reservado_kg = models.DecimalField(max_digits=15, decimal_places=3, default=0, editable=False)
+    class Meta:
+        indexes = [models.Index(fields=['stock_kg'], name='invpf_stock_idx')]
+    @property
+    def disponible_kg(self):
+        return self.stock_kg - self.reservado_kg
     def __str__(self):
-        return f"{self.stock_kg} kg de {self.producto}"
+        return f"{self.stock_kg} kg de {_catalogo(self, 'producto')}"
 
 class OperacionProcesamiento(models.Model):
     materia_prima = models.ForeignKey(MateriaPrima, on_delete=models.PROTECT)
@@ -64,8 +92,16 @@ class OperacionProcesamiento(models.Model):
     producto_terminado = models.ForeignKey(ProductoTerminado, on_delete=models.PROTECT)
     rendimiento_esperado_pct = models.DecimalField(max_digits=5, decimal_places=2, blank=True, null=True)
     kg_salida_real = models.DecimalField(max_digits=12, decimal_places=3)
-    fecha = models.DateField(auto_now_add=True)
+    fecha = models.DateField(default=timezone.localdate, editable=False)
     abastecido_a_inventario = models.BooleanField(default=False)
+    class Meta:
+        indexes = [
+            # Solo las operaciones pendientes, que son las que cuenta el dashboard
+            models.Index(
+                fields=['fecha'], condition=models.Q(abastecido_a_inventario=False),
+                name='operacion_pendiente_idx',
+            ),
+        ]
     def __str__(self):
         return f"OP-{self.id}: {self.kg_entrada} kg → {self.kg_salida_real} kg"
 
@@ -75,9 +111,30 @@ class CostoMaquila(models.Model):
     monto = models.DecimalField(max_digits=12, decimal_places=2)
     moneda = models.CharField(max_length=3, choices=[('USD', 'USD'), ('CLP', 'CLP')], default='USD')
     fecha = models.DateField()
+    class Meta:
+        indexes = [models.Index(fields=['fecha'], name='maquila_fecha_idx')]
     def __str__(self):
         return f"{self.concepto}: {self.monto} {self.moneda}"
 
+class OrdenVentaQuerySet(models.QuerySet):
+    def with_totals(self):
+        """Anota total_kg, total_lb y total_usd calculados en SQL a partir de los ítems."""
+        return self.annotate(
+            total_kg=Coalesce(
+                Sum('items__cantidad_kg'), Value(Decimal(0)),
+                output_field=models.DecimalField(max_digits=15, decimal_places=3),
+            ),
+            total_usd=Coalesce(
+                Sum(F('items__cantidad_kg') * F('items__precio_por_kg')), Value(Decimal(0)),
+                output_field=models.DecimalField(max_digits=20, decimal_places=2),
+            ),
+        ).annotate(
+            total_lb=ExpressionWrapper(
+                F('total_kg') * Value(LB_POR_KG),
+                output_field=models.DecimalField(max_digits=18, decimal_places=3),
+            ),
+        )
+
 class OrdenVenta(models.Model):
     ESTADO_CHOICES = [
         ('pendiente', 'Pendiente'),
@@ -94,23 +151,41 @@ class OrdenVenta(models.Model):
         ]
     )
     fecha_estimada_pago_saldo = models.DateField()
-    fecha = models.DateField(auto_now_add=True)
+    fecha = models.DateField(default=timezone.localdate, editable=False)
+    objects = OrdenVentaQuerySet.as_manager()
+    class Meta:
+        indexes = [
+            models.Index(fields=['estado', 'fecha'], name='ordenventa_estado_fecha_idx'),
+            models.Index(fields=['fecha'], name='ordenventa_fecha_idx'),
+        ]
     def __str__(self):
-        return f"OV-{self.id} - {self.cliente}"
+        return f"OV-{self.id} - {_catalogo(self, 'cliente')}"
+
+class ItemOrdenVentaQuerySet(models.QuerySet):
+    def with_subtotal(self):
+        return self.annotate(subtotal=ExpressionWrapper(
+            F('cantidad_kg') * F('precio_por_kg'),
+            output_field=models.DecimalField(max_digits=20, decimal_places=2),
+        ))
 
 class ItemOrdenVenta(models.Model):
     orden = models.ForeignKey(OrdenVenta, on_delete=models.CASCADE, related_name='items')
     producto = models.ForeignKey(ProductoTerminado, on_delete=models.PROTECT)
     cantidad_kg = models.DecimalField(max_digits=12, decimal_places=3)
     precio_por_kg = models.DecimalField(max_digits=12, decimal_places=2)
+    objects = ItemOrdenVentaQuerySet.as_manager()
     @property
     def cantidad_lb(self):
-        return float(self.cantidad_kg) * 2.20462
+        if self.cantidad_kg is None:
+            return None
+        return (self.cantidad_kg * LB_POR_KG).quantize(Decimal('0.001'))
     @property
     def subtotal_usd(self):
-        return float(self.cantidad_kg) * float(self.precio_por_kg)
+        if self.cantidad_kg is None or self.precio_por_kg is None:
+            return None
+        return (self.cantidad_kg * self.precio_por_kg).quantize(Decimal('0.01'))
     def __str__(self):
-        return f"{self.cantidad_kg} kg de {self.producto}"
+        return f"{self.cantidad_kg} kg de {_catalogo(self, 'producto')}"
 
 class ProveedorServicio(models.Model):
     TIPO_CHOICES = [
@@ -130,8 +205,10 @@ class ProveedorServicio(models.Model):
 class Embarque(models.Model):
     orden_venta = models.ForeignKey(OrdenVenta, on_delete=models.CASCADE)
     fecha_embarque = models.DateField()
+    class Meta:
+        indexes = [models.Index(fields=['fecha_embarque'], name='embarque_fecha_idx')]
     def __str__(self):
-        return f"Embarque OV-{self.orden_venta.id}"
+        return f"Embarque OV-{self.orden_venta_id}"
 
 class ServicioLogistico(models.Model):
     ESTADO_PAGO_CHOICES = [
@@ -145,8 +222,18 @@ class ServicioLogistico(models.Model):
     moneda = models.CharField(max_length=3, choices=[('USD', 'USD'), ('CLP', 'CLP')], default='USD')
     fecha_vencimiento = models.DateField()
     estado_pago = models.CharField(max_length=20, choices=ESTADO_PAGO_CHOICES, default='pendiente')
+    class Meta:
+        indexes = [
+            models.Index(fields=['estado_pago', 'fecha_vencimiento'], name='servicio_pago_venc_idx'),
+        ]
     def __str__(self):
-        return f"{self.proveedor}: {self.monto} {self.moneda}"
+        return f"{_catalogo(self, 'proveedor')}: {self.monto} {self.moneda}"
+
+def _presentes(campos, valor):
+    """Suma en SQL de ``valor(i)`` por cada campo booleano ``campos[i]`` verdadero."""
+    return reduce(operator.add, (
+        Case(When(**{campo: True}, then=Value(valor(i))), default=Value(0)) for i, campo in enumerate(campos)
+    ))
 
 class DocumentacionExportacion(models.Model):
     ESTADO_ENVIO_CHOICES = [
@@ -162,8 +249,33 @@ class DocumentacionExportacion(models.Model):
     fecha_arribo_estimada = models.DateField()
     plazo_envio_courier = models.DateField()
     estado_envio = models.CharField(max_length=20, choices=ESTADO_ENVIO_CHOICES, default='pendiente')
+
+    # Cada documento ocupa el bit de su posición en ``documentos``
+    DOCUMENTOS = ('dus', 'guia_despacho', 'packing_list', 'certificado_origen')
+    # Columnas generadas por la base a partir de DOCUMENTOS: se mantienen también con
+    # update() y bulk_update(), que no pasan por save() (ver erp_app.documentacion)
+    documentos = models.GeneratedField(
+        expression=_presentes(DOCUMENTOS, lambda i: 1 << i),
+        output_field=models.PositiveSmallIntegerField(), db_persist=True,
+        help_text="Máscara de documentos presentes.",
+    )
+    completitud = models.GeneratedField(
+        expression=_presentes(DOCUMENTOS, lambda i: 1) * 100 / len(DOCUMENTOS),
+        output_field=models.PositiveSmallIntegerField(), db_persist=True,
+        help_text="Porcentaje de documentos presentes.",
+    )
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['estado_envio', 'plazo_envio_courier'], name='doc_envio_plazo_idx'),
+            models.Index(
+                fields=['plazo_envio_courier'], condition=models.Q(estado_envio='pendiente', completitud__lt=100),
+                name='doc_riesgo_plazo_idx',
+            ),
+        ]
+
     def __str__(self):
-        return f"Doc OV-{self.embarque.orden_venta.id}"
+        return f"Doc OV-{self.embarque.orden_venta_id}"
 
 class Cotizacion(models.Model):
     cliente = models.ForeignKey(Cliente, on_delete=models.SET_NULL, null=True, blank=True)
@@ -172,7 +284,268 @@ class Cotizacion(models.Model):
     costo_estimado_total = models.DecimalField(max_digits=12, decimal_places=2)
     margen_pct = models.DecimalField(max_digits=5, decimal_places=2)
     precio_sugerido_kg = models.DecimalField(max_digits=12, decimal_places=2, default=0)
-    fecha = models.DateField(auto_now_add=True)
+    fecha = models.DateField(default=timezone.localdate, editable=False)
     convertida_a_orden = models.BooleanField(default=False)
     def __str__(self):
-        return f"Cotización {self.id} - {self.cliente}"
\ No newline at end of file
+        return f"Cotización {self.id} - {_catalogo(self, 'cliente')}"
+
+class MovimientoInventario(models.Model):
+    TIPO_CHOICES = [
+        ('compra', 'Recepción de compra'),
+        ('consumo', 'Consumo en procesamiento'),
+        ('produccion', 'Salida de procesamiento'),
+        ('venta', 'Despacho de venta'),
+        ('ajuste', 'Ajuste'),
+    ]
+    tipo = models.CharField(max_length=20, choices=TIPO_CHOICES)
+    materia_prima = models.ForeignKey(MateriaPrima, on_delete=models.PROTECT, null=True, blank=True)
+    producto = models.ForeignKey(ProductoTerminado, on_delete=models.PROTECT, null=True, blank=True)
+    cantidad_kg = models.DecimalField(max_digits=15, decimal_places=3)
+    compra = models.ForeignKey(CompraMateriaPrima, on_delete=models.SET_NULL, null=True, blank=True, related_name='movimientos')
+    operacion = models.ForeignKey(OperacionProcesamiento, on_delete=models.SET_NULL, null=True, blank=True, related_name='movimientos')
+    item_orden = models.ForeignKey(ItemOrdenVenta, on_delete=models.SET_NULL, null=True, blank=True, related_name='movimientos')
+    creado = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        constraints = [
+            models.CheckConstraint(
+                condition=(
+                    models.Q(materia_prima__isnull=False, producto__isnull=True)
+                    | models.Q(materia_prima__isnull=True, producto__isnull=False)
+                ),
+                name='movimiento_un_solo_item',
+            ),
+        ]
+
+    def save(self, *args, **kwargs):
+        # El libro es de solo inserción: las correcciones se registran como nuevos movimientos
+        if self.pk is not None:
+            raise ValueError("Los movimientos de inventario no se pueden modificar.")
+        super().save(*args, **kwargs)
+
+    def delete(self, *args, **kwargs):
+        raise ValueError("Los movimientos de inventario no se pueden eliminar.")
+
+    def __str__(self):
+        return f"{self.get_tipo_display()}: {self.cantidad_kg} kg"
+
+
+class TipoCambio(models.Model):
+    fecha = models.DateField(unique=True)
+    clp_por_usd = models.DecimalField(max_digits=10, decimal_places=2)
+
+    class Meta:
+        ordering = ['-fecha']
+
+    def __str__(self):
+        return f"{self.fecha}: {self.clp_por_usd} CLP/USD"
+
+
+class PartidaFlujoCaja(models.Model):
+    """Cobro o pago proyectado de un documento; se mantiene sincronizado con ``erp_app.flujo_caja``."""
+    TIPO_CHOICES = [
+        ('cobro', 'Por cobrar'),
+        ('pago', 'Por pagar'),
+    ]
+    tipo = models.CharField(max_length=10, choices=TIPO_CHOICES)
+    concepto = models.CharField(max_length=20)
+    fecha = models.DateField()
+    moneda = models.CharField(max_length=3, choices=[('USD', 'USD'), ('CLP', 'CLP')])
+    monto = models.DecimalField(max_digits=18, decimal_places=2)
+    orden = models.ForeignKey(OrdenVenta, on_delete=models.CASCADE, null=True, blank=True, related_name='partidas_flujo')
+    servicio = models.ForeignKey(ServicioLogistico, on_delete=models.CASCADE, null=True, blank=True, related_name='partidas_flujo')
+
+    class Meta:
+        indexes = [models.Index(fields=['tipo', 'fecha'], name='partida_tipo_fecha_idx')]
+
+    def __str__(self):
+        return f"{self.get_tipo_display()} {self.fecha}: {self.monto} {self.moneda}"
+
+
+class FlujoCaja(models.Model):
+    """Total proyectado por tipo, período (semana o mes) y moneda, actualizado incrementalmente."""
+    PERIODO_CHOICES = [
+        ('semana', 'Semana'),
+        ('mes', 'Mes'),
+    ]
+    tipo = models.CharField(max_length=10, choices=PartidaFlujoCaja.TIPO_CHOICES)
+    periodo = models.CharField(max_length=10, choices=PERIODO_CHOICES)
+    inicio = models.DateField()
+    moneda = models.CharField(max_length=3, choices=[('USD', 'USD'), ('CLP', 'CLP')])
+    monto = models.DecimalField(max_digits=18, decimal_places=2, default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['periodo', 'inicio', 'tipo', 'moneda'], name='flujo_caja_unico'),
+        ]
+
+    def __str__(self):
+        return f"{self.get_tipo_display()} {self.periodo} {self.inicio}: {self.monto} {self.moneda}"
+
+
+class ReservaStock(models.Model):
+    """Kg de un ítem de orden confirmada y sin embarcar, sumados a ``InventarioProductoFinal.reservado_kg``."""
+    item_orden = models.OneToOneField(ItemOrdenVenta, on_delete=models.CASCADE, related_name='reserva')
+    producto = models.ForeignKey(ProductoTerminado, on_delete=models.PROTECT, related_name='reservas')
+    cantidad_kg = models.DecimalField(max_digits=12, decimal_places=3)
+
+    def __str__(self):
+        return f"{self.cantidad_kg} kg de {_catalogo(self, 'producto')} (ítem {self.item_orden_id})"
+
+
+class Trabajo(models.Model):
+    """Trabajo en segundo plano ejecutado por ``manage.py trabajador`` (ver ``erp_app.trabajos``)."""
+    ESTADO_CHOICES = [
+        ('pendiente', 'Pendiente'),
+        ('ejecutando', 'Ejecutando'),
+        ('terminado', 'Terminado'),
+        ('fallido', 'Fallido'),
+        ('cancelado', 'Cancelado'),
+    ]
+    tarea = models.CharField(max_length=50)
+    parametros = models.JSONField(default=dict, blank=True)
+    clave = models.CharField(max_length=64, help_text="Evita encolar dos veces el mismo trabajo activo.")
+    estado = models.CharField(max_length=20, choices=ESTADO_CHOICES, default='pendiente')
+    intentos = models.PositiveSmallIntegerField(default=0)
+    max_intentos = models.PositiveSmallIntegerField(default=3)
+    ejecutar_desde = models.DateTimeField(default=timezone.now)
+    progreso = models.PositiveSmallIntegerField(default=0)
+    mensaje = models.CharField(max_length=200, blank=True)
+    resultado = models.JSONField(null=True, blank=True)
+    error = models.TextField(blank=True)
+    trabajador = models.CharField(max_length=100, blank=True)
+    creado = models.DateTimeField(auto_now_add=True)
+    iniciado = models.DateTimeField(null=True, blank=True)
+    latido = models.DateTimeField(null=True, blank=True, help_text="Última señal del trabajador que lo ejecuta.")
+    terminado = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        ordering = ['-pk']
+        indexes = [models.Index(fields=['estado', 'ejecutar_desde'], name='trabajo_estado_desde_idx')]
+        constraints = [
+            models.UniqueConstraint(
+                fields=['clave'], condition=models.Q(estado__in=['pendiente', 'ejecutando']),
+                name='trabajo_activo_unico',
+            ),
+        ]
+
+    def __str__(self):
+        return f"#{self.pk} {self.tarea} ({self.get_estado_display()})"
+
+
+class MuestraRendimiento(models.Model):
+    """Rendimiento de una operación ya incorporado a ``EstadisticaRendimiento`` (ver ``erp_app.rendimiento``)."""
+    operacion = models.OneToOneField(OperacionProcesamiento, on_delete=models.CASCADE, related_name='muestra_rendimiento')
+    materia_prima = models.ForeignKey(MateriaPrima, on_delete=models.CASCADE, related_name='+')
+    producto = models.ForeignKey(ProductoTerminado, on_delete=models.CASCADE, related_name='+')
+    fecha = models.DateField()
+    rendimiento_pct = models.FloatField()
+    esperado_pct = models.FloatField(null=True, blank=True)
+
+    def __str__(self):
+        return f"OP-{self.operacion_id}: {self.rendimiento_pct:.1f}%"
+
+
+class EstadisticaRendimiento(models.Model):
+    """
+    Estadísticas diarias de rendimiento por materia prima y producto,
+    mantenidas con actualizaciones de Welford: cantidad, media y suma de
+    cuadrados de desviaciones (``m2``) del rendimiento real y de su desvío
+    respecto del esperado, más un histograma por punto porcentual.
+    """
+    materia_prima = models.ForeignKey(MateriaPrima, on_delete=models.CASCADE, related_name='+')
+    producto = models.ForeignKey(ProductoTerminado, on_delete=models.CASCADE, related_name='+')
+    fecha = models.DateField()
+    n = models.PositiveIntegerField(default=0)
+    media = models.FloatField(default=0)
+    m2 = models.FloatField(default=0)
+    n_desvio = models.PositiveIntegerField(default=0)
+    media_desvio = models.FloatField(default=0)
+    m2_desvio = models.FloatField(default=0)
+    histograma = models.JSONField(default=dict)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['materia_prima', 'producto', 'fecha'], name='estadistica_rendimiento_unica'),
+        ]
+
+    def __str__(self):
+        return f"{self.materia_prima_id}/{self.producto_id} {self.fecha}: n={self.n} media={self.media:.1f}%"
+
+
+class RegistroAuditoria(models.Model):
+    """Cambio de un registro del ERP con los valores de cada campo modificado (ver ``erp_app.auditoria``)."""
+    ACCION_CHOICES = [
+        ('alta', 'Alta'),
+        ('cambio', 'Cambio'),
+        ('baja', 'Baja'),
+    ]
+    fecha = models.DateTimeField()
+    # Primer día del mes de ``fecha``: la retención borra meses completos por este índice
+    periodo = models.DateField()
+    # Sin índices propios en las FK a ContentType: el historial usa el de (tipo_raiz, raiz_id, fecha)
+    tipo = models.ForeignKey('contenttypes.ContentType', on_delete=models.CASCADE, related_name='+', db_index=False)
+    objeto_id = models.BigIntegerField()
+    # Registro en cuyo historial aparece el cambio: el propio o, p. ej., la orden de un ítem
+    tipo_raiz = models.ForeignKey('contenttypes.ContentType', on_delete=models.CASCADE, related_name='+', db_index=False)
+    raiz_id = models.BigIntegerField()
+    accion = models.CharField(max_length=10, choices=ACCION_CHOICES)
+    objeto_repr = models.CharField(max_length=200, blank=True)
+    cambios = models.JSONField(encoder=DjangoJSONEncoder, help_text="{campo: [antes, después]}")
+    usuario = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.SET_NULL, null=True, blank=True, related_name='+')
+
+    class Meta:
+        ordering = ['-fecha', '-pk']
+        indexes = [
+            models.Index(fields=['tipo_raiz', 'raiz_id', '-fecha'], name='auditoria_raiz_fecha_idx'),
+            models.Index(fields=['periodo'], name='auditoria_periodo_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.get_accion_display()} {self.tipo.model} #{self.objeto_id} ({self.fecha:%Y-%m-%d %H:%M})"
+
+
+class CierrePeriodo(models.Model):
+    """Mes cerrado: sus totales quedan congelados en ``CuboMensual`` (ver ``erp_app.cierre``)."""
+    periodo = models.DateField(unique=True, help_text="Primer día del mes.")
+    cerrado = models.DateTimeField()
+    filas = models.PositiveIntegerField(default=0)
+    total_usd = models.JSONField(default=dict, encoder=DjangoJSONEncoder, help_text="{hecho: monto en USD}")
+
+    class Meta:
+        ordering = ['-periodo']
+
+    def __str__(self):
+        return f"Cierre {self.periodo:%Y-%m}"
+
+
+class CuboMensual(models.Model):
+    """
+    Totales de un mes cerrado por hecho, producto, cliente, proveedor y
+    moneda. Cada hecho usa solo las dimensiones que tiene; las demás quedan nulas.
+    """
+    HECHO_CHOICES = [
+        ('venta', 'Venta'),
+        ('compra', 'Compra de materia prima'),
+        ('maquila', 'Costo de maquila'),
+        ('logistica', 'Servicio logístico'),
+    ]
+    periodo = models.DateField()
+    hecho = models.CharField(max_length=10, choices=HECHO_CHOICES)
+    # Sin índice por FK: se consulta por (periodo, hecho) y la tabla es chica
+    producto = models.ForeignKey(ProductoTerminado, on_delete=models.PROTECT, null=True, blank=True, related_name='+', db_index=False)
+    materia_prima = models.ForeignKey(MateriaPrima, on_delete=models.PROTECT, null=True, blank=True, related_name='+', db_index=False)
+    cliente = models.ForeignKey(Cliente, on_delete=models.PROTECT, null=True, blank=True, related_name='+', db_index=False)
+    proveedor = models.ForeignKey(Proveedor, on_delete=models.PROTECT, null=True, blank=True, related_name='+', db_index=False)
+    proveedor_servicio = models.ForeignKey(ProveedorServicio, on_delete=models.PROTECT, null=True, blank=True, related_name='+', db_index=False)
+    moneda = models.CharField(max_length=3, choices=[('USD', 'USD'), ('CLP', 'CLP')])
+    kg = models.DecimalField(max_digits=18, decimal_places=3, default=0)
+    monto = models.DecimalField(max_digits=20, decimal_places=2)
+    monto_usd = models.DecimalField(max_digits=20, decimal_places=2)
+    documentos = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        indexes = [models.Index(fields=['periodo', 'hecho'], name='cubo_periodo_hecho_idx')]
+
+    def __str__(self):
+        return f"{self.periodo:%Y-%m} {self.get_hecho_display()}: {self.monto} {self.moneda}"
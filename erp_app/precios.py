@@ -0,0 +1,237 @@
+"""
+Motor de precios para cotizaciones.
+
+El costo estimado por kg de un producto terminado combina:
+
+* materia prima: precio medio de las compras recientes de cada materia prima
+  (``COTIZACION_DIAS_PRECIOS``), ponderado por la mezcla y el rendimiento
+  histórico de las operaciones que producen el producto;
+* maquila: costo medio de maquila por kg producido;
+* logística: costo medio de servicios logísticos por kg despachado.
+
+Un producto sin operaciones de procesamiento, o con una materia prima que
+nunca se compró, queda ``sin_costo`` y no se cotiza.
+
+Los modelos de costo se memorizan por producto en el proceso. Las señales de
+compras, operaciones, maquila y tipos de cambio incrementan al confirmar una
+``erp_app.versiones.Version`` y cada proceso descarta sus modelos al notarlo,
+igual que ``erp_app.tipo_cambio``. Se descartan todos: una compra cambia el
+precio de su materia prima en cada producto que la usa. La logística por kg es
+una tasa común con su propia versión, que es lo único que invalidan los ítems,
+embarques y servicios.
+"""
+import threading
+from collections import defaultdict
+from dataclasses import dataclass, replace
+from datetime import timedelta
+from decimal import Decimal, ROUND_HALF_UP
+
+from django.conf import settings
+from django.db.models import F, Sum
+from django.utils import timezone
+
+from .costos import IMPORTE
+from .models import (
+    CompraMateriaPrima, OperacionProcesamiento, CostoMaquila,
+    ItemOrdenVenta, Embarque, ServicioLogistico, ProductoTerminado, Cotizacion
+)
+from .tipo_cambio import a_usd, fecha_de_conversion, total_usd
+from .versiones import Version
+
+VERSION = Version('erp:precios:version')
+VERSION_LOGISTICA = Version('erp:precios:logistica')
+CERO = Decimal(0)
+CENTAVO = Decimal('0.01')
+
+_lock = threading.Lock()
+_modelos = {}
+_logistica_kg = None
+_version = None
+_version_logistica = None
+
+
+class SinCosto(ValueError):
+    pass
+
+
+@dataclass(frozen=True)
+class ModeloCosto:
+    producto_id: int
+    materia_prima_kg: Decimal
+    maquila_kg: Decimal
+    logistica_kg: Decimal
+    # Sin operaciones de procesamiento o con materia prima sin compras
+    sin_costo: bool = False
+
+    @property
+    def costo_kg(self):
+        if self.sin_costo:
+            return None
+        return self.materia_prima_kg + self.maquila_kg + self.logistica_kg
+
+
+def invalidar():
+    VERSION.invalidar()
+    VERSION_LOGISTICA.invalidar()
+
+
+def invalidar_logistica():
+    VERSION_LOGISTICA.invalidar()
+
+
+def _vigentes():
+    """Descarta lo memorizado si otro proceso (o este) registró cambios; devuelve las versiones vigentes."""
+    global _version, _version_logistica, _logistica_kg
+    version, logistica = VERSION.actual(), VERSION_LOGISTICA.actual()
+    if (version, logistica) != (_version, _version_logistica):
+        with _lock:
+            if version != _version:
+                _modelos.clear()
+                _version = version
+            if logistica != _version_logistica:
+                _logistica_kg = None
+                _version_logistica = logistica
+    return version, logistica
+
+
+def _sigue_vigente(version, actual, vigente):
+    # Lo calculado bajo ``version`` se memoriza solo si no hubo una invalidación mientras tanto
+    return vigente == version and actual.actual() == version
+
+
+def _precios_materia_prima(materias, desde):
+    if not materias:
+        return {}
+    kg = defaultdict(Decimal)
+    monto = defaultdict(Decimal)
+    compras = CompraMateriaPrima.objects.filter(materia_prima__in=materias)
+    for qs in (compras.filter(fecha__gte=desde), compras):
+        filas = qs.filter(materia_prima__in=set(materias) - set(kg)).values_list(
+            'materia_prima', 'moneda', fecha_de_conversion('fecha'),
+        ).annotate(
+            kg=Sum('cantidad_kg'), monto=Sum(F('cantidad_kg') * F('precio_por_kg'), output_field=IMPORTE),
+        ).order_by()
+        for mp_id, moneda, fecha, kg_fila, monto_fila in filas:
+            kg[mp_id] += kg_fila
+            monto[mp_id] += a_usd(monto_fila, moneda, fecha)
+        # Las materias primas sin compras recientes usan todo el historial
+        if set(kg) >= set(materias):
+            break
+    return {mp_id: monto[mp_id] / kg[mp_id] for mp_id in kg if kg[mp_id]}
+
+
+def _logistica_por_kg(version):
+    """Costo logístico medio por kg despachado, común a todos los productos."""
+    global _logistica_kg
+    if _logistica_kg is not None:
+        return _logistica_kg
+    despachado = ItemOrdenVenta.objects.filter(orden__in=Embarque.objects.values('orden_venta')).aggregate(
+        kg=Sum('cantidad_kg')
+    )['kg']
+    logistica = total_usd(ServicioLogistico.objects.all(), campo_fecha='fecha_vencimiento')
+    valor = logistica / despachado if despachado else CERO
+    with _lock:
+        if _sigue_vigente(version, VERSION_LOGISTICA, _version_logistica):
+            _logistica_kg = valor
+    return valor
+
+
+def _calcular(productos):
+    """Costo de materia prima y maquila por kg; la logística la agrega ``modelos_costo``."""
+    desde = timezone.localdate() - timedelta(days=getattr(settings, 'COTIZACION_DIAS_PRECIOS', 90))
+    entradas = defaultdict(dict)
+    salida = defaultdict(Decimal)
+    filas = OperacionProcesamiento.objects.filter(producto_terminado__in=productos).values_list(
+        'producto_terminado', 'materia_prima',
+    ).annotate(entrada=Sum('kg_entrada'), salida=Sum('kg_salida_real')).order_by()
+    for pt_id, mp_id, kg_entrada, kg_salida in filas:
+        entradas[pt_id][mp_id] = kg_entrada
+        salida[pt_id] += kg_salida
+    precios = _precios_materia_prima({mp_id for mezcla in entradas.values() for mp_id in mezcla}, desde)
+
+    maquila = defaultdict(Decimal)
+    filas = CostoMaquila.objects.filter(operacion__producto_terminado__in=productos).values_list(
+        'operacion__producto_terminado', 'moneda', fecha_de_conversion('fecha'),
+    ).annotate(monto=Sum('monto')).order_by()
+    for pt_id, moneda, fecha, monto in filas:
+        maquila[pt_id] += a_usd(monto, moneda, fecha)
+
+    modelos = {}
+    for pt_id in productos:
+        kg_salida = salida[pt_id]
+        if not kg_salida or not entradas[pt_id].keys() <= precios.keys():
+            modelos[pt_id] = ModeloCosto(pt_id, CERO, CERO, CERO, sin_costo=True)
+            continue
+        materia = sum((kg * precios[mp_id] for mp_id, kg in entradas[pt_id].items()), CERO)
+        modelos[pt_id] = ModeloCosto(pt_id, materia / kg_salida, maquila[pt_id] / kg_salida, CERO)
+    return modelos
+
+
+def modelos_costo(productos):
+    """Modelos de costo de los productos pedidos, calculando en bloque solo los que faltan."""
+    version, version_logistica = _vigentes()
+    productos = set(productos)
+    vigentes = {pt_id: _modelos[pt_id] for pt_id in productos if pt_id in _modelos}
+    faltantes = productos - vigentes.keys()
+    if faltantes:
+        calculados = _calcular(faltantes)
+        vigentes.update(calculados)
+        with _lock:
+            if _sigue_vigente(version, VERSION, _version):
+                _modelos.update(calculados)
+    logistica = _logistica_por_kg(version_logistica)
+    return {pt_id: replace(modelo, logistica_kg=logistica) for pt_id, modelo in vigentes.items()}
+
+
+def margen_por_defecto():
+    return Decimal(getattr(settings, 'COTIZACION_MARGEN_PCT', 25))
+
+
+def precio_sugerido(costo_kg, margen_pct):
+    """Precio por kg que deja ``margen_pct`` de margen sobre el precio de venta."""
+    if not 0 <= margen_pct < 100:
+        raise ValueError("El margen debe estar entre 0% y menos de 100%.")
+    return (costo_kg / (1 - Decimal(margen_pct) / 100)).quantize(CENTAVO, ROUND_HALF_UP)
+
+
+def _aplicar(cotizacion, modelo):
+    if modelo.sin_costo:
+        raise SinCosto(f"{cotizacion.producto} no tiene costo conocido: faltan operaciones o compras de su materia prima.")
+    # Solo un margen sin indicar toma el por defecto; 0% es un margen válido
+    if cotizacion.margen_pct is None:
+        cotizacion.margen_pct = margen_por_defecto()
+    cotizacion.costo_estimado_total = (modelo.costo_kg * cotizacion.cantidad_kg).quantize(CENTAVO, ROUND_HALF_UP)
+    cotizacion.precio_sugerido_kg = precio_sugerido(modelo.costo_kg, cotizacion.margen_pct)
+    return cotizacion
+
+
+def cotizar_lote(cotizaciones, guardar=True):
+    """Calcula costo, margen y precio sugerido de muchas cotizaciones; devuelve solo las de productos con costo."""
+    cotizaciones = list(cotizaciones)
+    modelos = modelos_costo({c.producto_id for c in cotizaciones})
+    cotizaciones = [c for c in cotizaciones if not modelos[c.producto_id].sin_costo]
+    for cotizacion in cotizaciones:
+        _aplicar(cotizacion, modelos[cotizacion.producto_id])
+    if guardar:
+        Cotizacion.objects.bulk_update(
+            [c for c in cotizaciones if c.pk], ['costo_estimado_total', 'margen_pct', 'precio_sugerido_kg'],
+            batch_size=500,
+        )
+    return cotizaciones
+
+
+def cotizar(cotizacion):
+    """Cotiza una sola cotización; ``SinCosto`` si su producto no tiene costo conocido."""
+    return _aplicar(cotizacion, modelos_costo({cotizacion.producto_id})[cotizacion.producto_id])
+
+
+def lista_precios(cliente=None, cantidad_kg=Decimal(1000), margen_pct=None, productos=None):
+    """Cotizaciones sin guardar de todos los productos (o los indicados) con costo conocido para un cliente."""
+    productos = productos if productos is not None else ProductoTerminado.objects.all()
+    return cotizar_lote(
+        [
+            Cotizacion(cliente=cliente, producto=producto, cantidad_kg=cantidad_kg, margen_pct=margen_pct)
+            for producto in productos
+        ],
+        guardar=False,
+    )
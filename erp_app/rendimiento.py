@@ -0,0 +1,329 @@
+"""
+Analítica de rendimiento de las operaciones de procesamiento.
+
+El rendimiento de una operación es ``kg_salida_real / kg_entrada`` en
+porcentaje; su desvío es la diferencia con ``rendimiento_esperado_pct``.
+Cada operación aporta una muestra (``MuestraRendimiento``) a la estadística
+diaria de su materia prima, producto y fecha (``EstadisticaRendimiento``).
+
+Sincronizar una operación compara su muestra con la registrada y, si cambió,
+la quita y agrega a la estadística con las actualizaciones de Welford, que
+son reversibles; nunca se vuelve a recorrer el historial. Las consultas de un
+rango combinan los días con la fórmula de Chan, y los percentiles salen del
+histograma por punto porcentual. ``rebuild_rendimiento`` recalcula todo.
+"""
+import math
+from collections import defaultdict
+from dataclasses import dataclass, field
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import F, FloatField, Q, Sum
+from django.utils import timezone
+
+from .flujo_caja import inicio_periodo
+from .models import (
+    EstadisticaRendimiento, MateriaPrima, MuestraRendimiento, OperacionProcesamiento, ProductoTerminado
+)
+
+# El último casillero del histograma agrupa los rendimientos mayores
+HISTOGRAMA_MAX = 150
+
+
+@dataclass
+class Welford:
+    n: int = 0
+    media: float = 0.0
+    m2: float = 0.0
+
+    def agregar(self, x):
+        self.n += 1
+        delta = x - self.media
+        self.media += delta / self.n
+        self.m2 += delta * (x - self.media)
+
+    def quitar(self, x):
+        if self.n <= 1:
+            self.n, self.media, self.m2 = 0, 0.0, 0.0
+            return
+        anterior = self.media
+        self.media = (self.n * anterior - x) / (self.n - 1)
+        self.m2 = max(self.m2 - (x - anterior) * (x - self.media), 0.0)
+        self.n -= 1
+
+    def combinar(self, otro):
+        if not otro.n:
+            return
+        n = self.n + otro.n
+        delta = otro.media - self.media
+        self.m2 += otro.m2 + delta * delta * self.n * otro.n / n
+        self.media += delta * otro.n / n
+        self.n = n
+
+    @property
+    def varianza(self):
+        return self.m2 / (self.n - 1) if self.n > 1 else None
+
+    @property
+    def desviacion(self):
+        varianza = self.varianza
+        return math.sqrt(varianza) if varianza is not None else None
+
+
+@dataclass
+class Resumen:
+    rendimiento: Welford = field(default_factory=Welford)
+    desvio: Welford = field(default_factory=Welford)
+    histograma: dict = field(default_factory=lambda: defaultdict(int))
+
+    @classmethod
+    def de_fila(cls, fila):
+        return cls(
+            Welford(fila.n, fila.media, fila.m2),
+            Welford(fila.n_desvio, fila.media_desvio, fila.m2_desvio),
+            defaultdict(int, {int(k): v for k, v in fila.histograma.items()}),
+        )
+
+    def a_fila(self, fila):
+        fila.n, fila.media, fila.m2 = self.rendimiento.n, self.rendimiento.media, self.rendimiento.m2
+        fila.n_desvio, fila.media_desvio, fila.m2_desvio = self.desvio.n, self.desvio.media, self.desvio.m2
+        fila.histograma = {str(k): v for k, v in sorted(self.histograma.items()) if v}
+
+    def aplicar(self, signo, rendimiento, esperado):
+        casillero = min(max(int(rendimiento), 0), HISTOGRAMA_MAX)
+        self.histograma[casillero] += signo
+        (self.rendimiento.agregar if signo > 0 else self.rendimiento.quitar)(rendimiento)
+        if esperado is not None:
+            (self.desvio.agregar if signo > 0 else self.desvio.quitar)(rendimiento - esperado)
+
+    def combinar(self, otro):
+        self.rendimiento.combinar(otro.rendimiento)
+        self.desvio.combinar(otro.desvio)
+        for casillero, n in otro.histograma.items():
+            self.histograma[casillero] += n
+
+    def percentil(self, q):
+        """Percentil ``q`` (0-100) interpolando dentro del casillero de un punto porcentual."""
+        total = sum(self.histograma.values())
+        if not total:
+            return None
+        objetivo = q / 100 * total
+        acumulado = 0
+        for casillero in sorted(self.histograma):
+            n = self.histograma[casillero]
+            if n and acumulado + n >= objetivo:
+                return casillero + (objetivo - acumulado) / n
+            acumulado += n
+        return float(max(self.histograma))
+
+
+def muestra(operacion):
+    """(materia_prima_id, producto_id, fecha, rendimiento, esperado) de la operación, o ``None``."""
+    if not operacion.kg_entrada or operacion.kg_entrada <= 0:
+        return None
+    esperado = operacion.rendimiento_esperado_pct
+    return (
+        operacion.materia_prima_id, operacion.producto_terminado_id, operacion.fecha,
+        float(operacion.kg_salida_real / operacion.kg_entrada * 100),
+        float(esperado) if esperado is not None else None,
+    )
+
+
+def _aplicar(cambios):
+    """Aplica {(mp, pt, fecha): [(signo, rendimiento, esperado)]} a las estadísticas diarias."""
+    claves = sorted(cambios)
+    EstadisticaRendimiento.objects.bulk_create(
+        [EstadisticaRendimiento(materia_prima_id=mp, producto_id=pt, fecha=f) for mp, pt, f in claves],
+        ignore_conflicts=True,
+    )
+    fechas = defaultdict(set)
+    for mp, pt, f in claves:
+        fechas[(mp, pt)].add(f)
+    filtro = Q()
+    for (mp, pt), dias in fechas.items():
+        filtro |= Q(materia_prima_id=mp, producto_id=pt, fecha__in=dias)
+    filas = EstadisticaRendimiento.objects.select_for_update().filter(filtro).order_by('pk')
+    actualizadas = []
+    for fila in filas:
+        resumen = Resumen.de_fila(fila)
+        for signo, rendimiento, esperado in cambios[(fila.materia_prima_id, fila.producto_id, fila.fecha)]:
+            resumen.aplicar(signo, rendimiento, esperado)
+        resumen.a_fila(fila)
+        actualizadas.append(fila)
+    EstadisticaRendimiento.objects.bulk_update(
+        actualizadas, ['n', 'media', 'm2', 'n_desvio', 'media_desvio', 'm2_desvio', 'histograma'], batch_size=500,
+    )
+
+
+def sincronizar_operaciones(operaciones, anular=False):
+    operaciones = {op.pk: op for op in operaciones}
+    if not operaciones:
+        return
+    with transaction.atomic():
+        registradas = {
+            m.operacion_id: m for m in MuestraRendimiento.objects.select_for_update().filter(operacion__in=list(operaciones))
+        }
+        cambios = defaultdict(list)
+        nuevas = []
+        cambiadas = []
+        for pk, operacion in operaciones.items():
+            deseada = None if anular else muestra(operacion)
+            anterior = registradas.get(pk)
+            if anterior is not None:
+                anterior_tupla = (
+                    anterior.materia_prima_id, anterior.producto_id, anterior.fecha,
+                    anterior.rendimiento_pct, anterior.esperado_pct,
+                )
+                if anterior_tupla == deseada:
+                    continue
+                cambios[anterior_tupla[:3]].append((-1, *anterior_tupla[3:]))
+                cambiadas.append(pk)
+            if deseada is not None:
+                cambios[deseada[:3]].append((1, *deseada[3:]))
+                mp, pt, fecha, rendimiento, esperado = deseada
+                nuevas.append(MuestraRendimiento(
+                    operacion_id=pk, materia_prima_id=mp, producto_id=pt, fecha=fecha,
+                    rendimiento_pct=rendimiento, esperado_pct=esperado,
+                ))
+        if not cambios:
+            return
+        MuestraRendimiento.objects.filter(operacion__in=cambiadas).delete()
+        MuestraRendimiento.objects.bulk_create(nuevas)
+        _aplicar(cambios)
+
+
+def resumen(materia_prima, producto, desde=None, hasta=None):
+    """Estadística combinada de un par materia prima × producto entre dos fechas."""
+    filas = EstadisticaRendimiento.objects.filter(materia_prima=materia_prima, producto=producto)
+    if desde:
+        filas = filas.filter(fecha__gte=desde)
+    if hasta:
+        filas = filas.filter(fecha__lte=hasta)
+    total = Resumen()
+    for fila in filas.iterator():
+        total.combinar(Resumen.de_fila(fila))
+    return total
+
+
+def serie(materia_prima, producto, desde, hasta, periodo='dia'):
+    """Filas por día, semana o mes con n, media, desviación, percentiles 10/50/90 y desvío medio."""
+    grupos = defaultdict(Resumen)
+    filas = EstadisticaRendimiento.objects.filter(
+        materia_prima=materia_prima, producto=producto, fecha__range=(desde, hasta), n__gt=0,
+    ).order_by('fecha')
+    for fila in filas.iterator():
+        inicio = fila.fecha if periodo == 'dia' else inicio_periodo(fila.fecha, periodo)
+        grupos[inicio].combinar(Resumen.de_fila(fila))
+    return [
+        {
+            'inicio': inicio, 'n': r.rendimiento.n, 'media': r.rendimiento.media,
+            'desviacion': r.rendimiento.desviacion,
+            'p10': r.percentil(10), 'p50': r.percentil(50), 'p90': r.percentil(90),
+            'desvio_medio': r.desvio.media if r.desvio.n else None,
+        }
+        for inicio, r in sorted(grupos.items())
+    ]
+
+
+def grafico(filas, ancho=800, alto=260, margen=40):
+    """
+    Coordenadas SVG de la serie: línea de la media, banda entre los
+    percentiles 10 y 90 y marcas del eje vertical, escaladas al rango de datos.
+    """
+    if not filas:
+        return None
+    valores = [v for f in filas for v in (f['p10'], f['p90'], f['media']) if v is not None]
+    minimo, maximo = math.floor(min(valores)) - 1, math.ceil(max(valores)) + 1
+    paso_x = (ancho - 2 * margen) / max(len(filas) - 1, 1)
+
+    def y(valor):
+        return round(alto - margen - (valor - minimo) / (maximo - minimo) * (alto - 2 * margen), 1)
+
+    xs = [round(margen + i * paso_x, 1) for i in range(len(filas))]
+    return {
+        'ancho': ancho, 'alto': alto, 'margen': margen,
+        'media': ' '.join(f"{x},{y(f['media'])}" for x, f in zip(xs, filas)),
+        'banda': ' '.join(
+            [f"{x},{y(f['p90'])}" for x, f in zip(xs, filas)]
+            + [f"{x},{y(f['p10'])}" for x, f in reversed(list(zip(xs, filas)))]
+        ),
+        'eje': [(y(v), v) for v in range(minimo, maximo + 1, max((maximo - minimo) // 5, 1))],
+        'etiquetas': [(xs[i], filas[i]['inicio']) for i in range(0, len(filas), max(len(filas) // 6, 1))],
+    }
+
+
+def _totales(filtro):
+    # Combinación de Chan en SQL: M2 = Σ m2_i + Σ n_i·media_i² − N·media²
+    return {
+        'n': Sum('n', filter=filtro, default=0),
+        'suma': Sum(F('n') * F('media'), filter=filtro, default=0.0, output_field=FloatField()),
+        'cuadrados': Sum(F('m2') + F('n') * F('media') * F('media'), filter=filtro, default=0.0, output_field=FloatField()),
+        'desvio': Sum(F('n_desvio') * F('media_desvio'), filter=filtro, default=0.0, output_field=FloatField()),
+        'n_desvio': Sum('n_desvio', filter=filtro, default=0),
+    }
+
+
+def _welford(n, suma, cuadrados):
+    if not n:
+        return Welford()
+    media = suma / n
+    return Welford(n, media, max(cuadrados - n * media * media, 0.0))
+
+
+def alertas(hoy=None):
+    """
+    Pares materia prima × producto cuyo rendimiento medio de la ventana
+    reciente (``RENDIMIENTO_VENTANA_DIAS``) se aleja de la base anterior
+    (``RENDIMIENTO_BASE_DIAS``) en más de ``RENDIMIENTO_UMBRAL_Z`` errores
+    estándar. Una sola consulta agregada sobre las estadísticas diarias.
+    """
+    hoy = hoy or timezone.localdate()
+    ventana = getattr(settings, 'RENDIMIENTO_VENTANA_DIAS', 30)
+    base = getattr(settings, 'RENDIMIENTO_BASE_DIAS', 365)
+    umbral = getattr(settings, 'RENDIMIENTO_UMBRAL_Z', 3)
+    minimo = getattr(settings, 'RENDIMIENTO_MIN_MUESTRAS', 5)
+    corte = hoy - timedelta(days=ventana)
+    reciente = Q(fecha__gt=corte)
+    anterior = Q(fecha__lte=corte)
+    filas = (
+        EstadisticaRendimiento.objects.filter(fecha__gt=corte - timedelta(days=base), fecha__lte=hoy)
+        .values('materia_prima', 'producto')
+        .annotate(
+            **{f'{k}_r': v for k, v in _totales(reciente).items()},
+            **{f'{k}_b': v for k, v in _totales(anterior).items()},
+        )
+        .order_by()
+    )
+    resultado = []
+    for fila in filas:
+        r = _welford(fila['n_r'], fila['suma_r'], fila['cuadrados_r'])
+        b = _welford(fila['n_b'], fila['suma_b'], fila['cuadrados_b'])
+        if r.n < minimo or b.n < minimo or not b.desviacion:
+            continue
+        z = (r.media - b.media) / (b.desviacion / math.sqrt(r.n))
+        if abs(z) >= umbral:
+            resultado.append({
+                'materia_prima': fila['materia_prima'], 'producto': fila['producto'], 'n': r.n, 'media': r.media, 'media_base': b.media, 'z': z,
+                'desvio_medio': fila['desvio_r'] / fila['n_desvio_r'] if fila['n_desvio_r'] else None,
+            })
+    materias = MateriaPrima.objects.in_bulk({a['materia_prima'] for a in resultado})
+    productos = ProductoTerminado.objects.in_bulk({a['producto'] for a in resultado})
+    for alerta in resultado:
+        alerta['materia_prima_nombre'] = str(materias[alerta['materia_prima']])
+        alerta['producto_nombre'] = str(productos[alerta['producto']])
+    return sorted(resultado, key=lambda a: -abs(a['z']))
+
+
+def recalcular(lote=2000):
+    """Reconstruye muestras y estadísticas desde todas las operaciones."""
+    with transaction.atomic():
+        MuestraRendimiento.objects.all().delete()
+        EstadisticaRendimiento.objects.all().delete()
+        bloque = []
+        for operacion in OperacionProcesamiento.objects.order_by('pk').iterator(chunk_size=lote):
+            bloque.append(operacion)
+            if len(bloque) >= lote:
+                sincronizar_operaciones(bloque)
+                bloque = []
+        sincronizar_operaciones(bloque)
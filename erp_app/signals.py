@@ -0,0 +1,186 @@
+from functools import partial
+
+from django.db import transaction
+from django.db.models.signals import post_save, post_delete, pre_delete, pre_save
+from django.dispatch import receiver
+
+from . import auditoria, busqueda, catalogos, disponibilidad, flujo_caja, inventario, metricas, precios, rendimiento, tipo_cambio
+from .models import (
+    CompraMateriaPrima, OperacionProcesamiento, CostoMaquila, ItemOrdenVenta, ServicioLogistico,
+    OrdenVenta, Embarque, DocumentacionExportacion, InventarioProductoFinal,
+    TipoCambio, Cliente, MateriaPrima, ProductoTerminado, Proveedor, ProveedorServicio
+)
+
+
+@receiver([post_save, post_delete], sender=OrdenVenta)
+@receiver([post_save, post_delete], sender=OperacionProcesamiento)
+@receiver([post_save, post_delete], sender=Embarque)
+@receiver([post_save, post_delete], sender=DocumentacionExportacion)
+@receiver([post_save, post_delete], sender=InventarioProductoFinal)
+def invalidar_dashboard(sender, **kwargs):
+    # Al confirmar: antes, otra petición podría recalcular con los datos previos y guardarlos en la caché
+    transaction.on_commit(metricas.invalidar_snapshot)
+
+
+@receiver(post_save, sender=CompraMateriaPrima)
+def contabilizar_compra(sender, instance, raw=False, **kwargs):
+    if not raw:
+        inventario.sincronizar_compras([instance])
+
+
+@receiver(pre_delete, sender=CompraMateriaPrima)
+def revertir_compra(sender, instance, **kwargs):
+    inventario.sincronizar_compras([instance], anular=True)
+
+
+@receiver(post_save, sender=OperacionProcesamiento)
+def contabilizar_operacion(sender, instance, raw=False, **kwargs):
+    if not raw:
+        inventario.sincronizar_operaciones([instance])
+
+
+@receiver(pre_delete, sender=OperacionProcesamiento)
+def revertir_operacion(sender, instance, **kwargs):
+    inventario.sincronizar_operaciones([instance], anular=True)
+
+
+@receiver(post_save, sender=OperacionProcesamiento)
+def registrar_rendimiento(sender, instance, raw=False, **kwargs):
+    if not raw:
+        rendimiento.sincronizar_operaciones([instance])
+
+
+@receiver(pre_delete, sender=OperacionProcesamiento)
+def retirar_rendimiento(sender, instance, **kwargs):
+    rendimiento.sincronizar_operaciones([instance], anular=True)
+
+
+@receiver(post_save, sender=ItemOrdenVenta)
+def contabilizar_item_orden(sender, instance, raw=False, **kwargs):
+    if not raw:
+        inventario.sincronizar_items_orden([instance])
+
+
+@receiver(pre_delete, sender=ItemOrdenVenta)
+def revertir_item_orden(sender, instance, **kwargs):
+    inventario.sincronizar_items_orden([instance], anular=True)
+
+
+@receiver([post_save, post_delete], sender=Embarque)
+def contabilizar_despacho(sender, instance, raw=False, **kwargs):
+    if not raw:
+        inventario.sincronizar_items_orden(ItemOrdenVenta.objects.filter(orden_id=instance.orden_venta_id))
+
+
+@receiver(post_save, sender=ItemOrdenVenta)
+def reservar_item_orden(sender, instance, raw=False, **kwargs):
+    if not raw:
+        disponibilidad.sincronizar_items([instance])
+
+
+@receiver(pre_delete, sender=ItemOrdenVenta)
+def liberar_item_orden(sender, instance, **kwargs):
+    disponibilidad.sincronizar_items([instance], anular=True)
+
+
+@receiver(post_save, sender=OrdenVenta)
+@receiver([post_save, post_delete], sender=Embarque)
+def reservar_orden(sender, instance, raw=False, **kwargs):
+    # Confirmar reserva los ítems; volver a pendiente o embarcar los libera
+    if not raw:
+        disponibilidad.sincronizar_ordenes([instance.pk if sender is OrdenVenta else instance.orden_venta_id])
+
+
+@receiver([post_save, post_delete], sender=TipoCambio)
+def invalidar_tipo_cambio(sender, **kwargs):
+    # Al confirmar: antes, otro proceso podría recargar las tasas previas bajo la versión nueva
+    transaction.on_commit(tipo_cambio.invalidar)
+
+
+@receiver([post_save, post_delete], sender=Cliente)
+@receiver([post_save, post_delete], sender=MateriaPrima)
+@receiver([post_save, post_delete], sender=ProductoTerminado)
+@receiver([post_save, post_delete], sender=Proveedor)
+@receiver([post_save, post_delete], sender=ProveedorServicio)
+def invalidar_catalogo(sender, **kwargs):
+    transaction.on_commit(partial(catalogos.invalidar, sender))
+
+
+@receiver(post_save, sender=Cliente)
+@receiver(post_save, sender=Proveedor)
+@receiver(post_save, sender=ProveedorServicio)
+@receiver(post_save, sender=ServicioLogistico)
+def indexar_busqueda(sender, instance, **kwargs):
+    # También con raw: los datos cargados desde fixtures deben poder buscarse
+    busqueda.indexar([instance])
+
+
+@receiver(post_delete, sender=Cliente)
+@receiver(post_delete, sender=Proveedor)
+@receiver(post_delete, sender=ProveedorServicio)
+@receiver(post_delete, sender=ServicioLogistico)
+def retirar_busqueda(sender, instance, **kwargs):
+    busqueda.retirar(sender, [instance.pk])
+
+
+@receiver([post_save, post_delete], sender=CompraMateriaPrima)
+@receiver([post_save, post_delete], sender=OperacionProcesamiento)
+@receiver([post_save, post_delete], sender=CostoMaquila)
+@receiver([post_save, post_delete], sender=TipoCambio)
+def invalidar_precios(sender, **kwargs):
+    transaction.on_commit(precios.invalidar)
+
+
+@receiver([post_save, post_delete], sender=ServicioLogistico)
+@receiver([post_save, post_delete], sender=ItemOrdenVenta)
+@receiver([post_save, post_delete], sender=Embarque)
+def invalidar_logistica(sender, **kwargs):
+    transaction.on_commit(precios.invalidar_logistica)
+
+
+@receiver(post_save, sender=ServicioLogistico)
+def proyectar_servicio(sender, instance, raw=False, **kwargs):
+    if not raw:
+        flujo_caja.sincronizar_servicios([instance])
+
+
+@receiver(pre_delete, sender=ServicioLogistico)
+def retirar_servicio(sender, instance, **kwargs):
+    flujo_caja.sincronizar_servicios([instance], anular=True)
+
+
+@receiver(post_save, sender=OrdenVenta)
+def proyectar_orden(sender, instance, raw=False, **kwargs):
+    if not raw:
+        flujo_caja.sincronizar_ordenes([instance.pk])
+
+
+@receiver(pre_delete, sender=OrdenVenta)
+def retirar_orden(sender, instance, **kwargs):
+    flujo_caja.sincronizar_ordenes([instance.pk], anular=True)
+
+
+@receiver([post_save, post_delete], sender=ItemOrdenVenta)
+def proyectar_items_orden(sender, instance, raw=False, **kwargs):
+    if not raw:
+        flujo_caja.sincronizar_ordenes([instance.orden_id])
+
+
+def leer_para_auditoria(sender, instance, raw=False, using=None, update_fields=None, **kwargs):
+    if not raw:
+        auditoria.leer_anteriores(instance, using, update_fields)
+
+
+def auditar_guardado(sender, instance, created, raw=False, using=None, update_fields=None, **kwargs):
+    if not raw:
+        auditoria.registrar_guardado(instance, created, using, update_fields)
+
+
+def auditar_borrado(sender, instance, using=None, **kwargs):
+    auditoria.registrar_borrado(instance, using)
+
+
+for modelo in auditoria.AUDITADOS:
+    pre_save.connect(leer_para_auditoria, sender=modelo)
+    post_save.connect(auditar_guardado, sender=modelo)
+    post_delete.connect(auditar_borrado, sender=modelo)
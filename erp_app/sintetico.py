@@ -0,0 +1,254 @@
+"""
+Generador de datos sintéticos reproducibles para pruebas de carga.
+
+``generar(escala, semilla)`` crea con ``bulk_create`` un conjunto de datos
+proporcional a ``escala`` (número de órdenes de venta) en los dieciséis modelos
+del ERP, más los tipos de cambio diarios; la misma semilla produce los mismos
+datos. Al usar inserciones masivas no se disparan señales: el libro de
+inventario, el flujo de caja, las estadísticas de rendimiento y las reservas
+de stock no se actualizan, lo que es deseable para medir consultas sobre
+tablas grandes.
+``manage.py generar_datos --derivados`` los reconstruye después.
+"""
+import math
+import random
+from collections import Counter
+from datetime import date, timedelta
+from decimal import Decimal
+
+from django.db import DEFAULT_DB_ALIAS, transaction
+
+from . import catalogos, metricas, precios, tipo_cambio
+from .models import (
+    Cliente, MateriaPrima, ProductoTerminado, Proveedor,
+    CompraMateriaPrima, InventarioMateriaPrima, InventarioProductoFinal,
+    OperacionProcesamiento, CostoMaquila, OrdenVenta, ItemOrdenVenta,
+    ProveedorServicio, Embarque, ServicioLogistico,
+    DocumentacionExportacion, Cotizacion, TipoCambio
+)
+
+DIAS_HISTORIA = 3 * 365
+# Filas que se generan en promedio por orden de venta, sumando todos los modelos
+FILAS_POR_ORDEN = 9.2
+CONCEPTOS_MAQUILA = ['Cocción', 'Desconchado', 'Congelado IQF', 'Envasado', 'Frío']
+
+
+class Generador:
+    def __init__(self, escala, semilla=0, lote=5000, hoy=None, using=DEFAULT_DB_ALIAS):
+        self.escala = escala
+        self.using = using
+        self.rnd = random.Random(semilla)
+        self.lote = lote
+        self.hoy = hoy or date.today()
+        self.conteo = Counter()
+
+    def fecha(self, dias=DIAS_HISTORIA, futuro=0):
+        return self.hoy - timedelta(days=self.rnd.randint(-futuro, dias))
+
+    def decimal(self, desde, hasta, decimales=2):
+        return Decimal(str(round(self.rnd.uniform(desde, hasta), decimales)))
+
+    def insertar(self, modelo, filas):
+        """Inserta un generador de instancias en lotes y devuelve la lista de ids."""
+        ids = []
+        lote = []
+
+        def volcar():
+            creados = modelo.objects.using(self.using).bulk_create(lote)
+            self.conteo[modelo.__name__] += len(creados)
+            ids.extend(obj.pk for obj in creados)
+
+        for fila in filas:
+            lote.append(fila)
+            if len(lote) >= self.lote:
+                volcar()
+                lote = []
+        volcar()
+        return ids
+
+    def catalogos(self):
+        n = self.escala
+        self.clientes = self.insertar(Cliente, (
+            Cliente(nombre=f'Cliente {i}', pais=self.rnd.choice(['España', 'Italia', 'EE.UU.', 'China', 'Francia']))
+            for i in range(n // 100 + 1)
+        ))
+        self.proveedores = self.insertar(Proveedor, (
+            Proveedor(nombre=f'Proveedor {i}', region=self.rnd.choice(['Los Lagos', 'Aysén', 'Biobío']))
+            for i in range(n // 200 + 1)
+        ))
+        # El nombre es único: se numera a continuación de las ya existentes
+        existentes = MateriaPrima.objects.using(self.using).count()
+        self.materias = self.insertar(MateriaPrima, (
+            MateriaPrima(nombre=f'Materia prima {i}') for i in range(existentes, existentes + 5)
+        ))
+        tipos = [tipo for tipo, _ in ProductoTerminado.TIPO_CHOICES]
+        precios = [self.decimal(3, 9) for _ in range(12)]
+        self.productos = self.insertar(ProductoTerminado, (
+            ProductoTerminado(
+                tipo=tipos[i % len(tipos)], presentacion=f'Formato {i}', precio_kg_usd=precio
+            ) for i, precio in enumerate(precios)
+        ))
+        self.precios = dict(zip(self.productos, precios))
+        self.proveedores_servicio = self.insertar(ProveedorServicio, (
+            ProveedorServicio(nombre=f'Servicio {i}', tipo=tipo)
+            for i, (tipo, _) in enumerate(ProveedorServicio.TIPO_CHOICES * 3)
+        ))
+
+    def compras(self):
+        return self.insertar(CompraMateriaPrima, (
+            CompraMateriaPrima(
+                proveedor_id=self.rnd.choice(self.proveedores), materia_prima_id=self.rnd.choice(self.materias),
+                cantidad_kg=self.decimal(500, 20000, 3), precio_por_kg=self.decimal(0.5, 1.5),
+                fecha=self.fecha(), abastecida=self.rnd.random() < 0.9,
+            ) for _ in range(self.escala)
+        ))
+
+    def operaciones(self):
+        self.fechas_operaciones = []
+
+        def operaciones():
+            for _ in range(self.escala // 2):
+                entrada = self.decimal(500, 10000, 3)
+                fecha = self.fecha()
+                self.fechas_operaciones.append(fecha)
+                yield OperacionProcesamiento(
+                    materia_prima_id=self.rnd.choice(self.materias), kg_entrada=entrada,
+                    producto_terminado_id=self.rnd.choice(self.productos),
+                    rendimiento_esperado_pct=Decimal('35.00'),
+                    kg_salida_real=(entrada * self.decimal(0.28, 0.42)).quantize(Decimal('0.001')),
+                    fecha=fecha, abastecido_a_inventario=self.rnd.random() < 0.95,
+                )
+        self.operaciones_ids = self.insertar(OperacionProcesamiento, operaciones())
+        return self.operaciones_ids
+
+    def costos(self):
+        def costos():
+            for pk, fecha in zip(self.operaciones_ids, self.fechas_operaciones):
+                for concepto in self.rnd.sample(CONCEPTOS_MAQUILA, self.rnd.randint(1, 2)):
+                    moneda = 'CLP' if self.rnd.random() < 0.3 else 'USD'
+                    yield CostoMaquila(
+                        operacion_id=pk, concepto=concepto, moneda=moneda, fecha=fecha,
+                        monto=self.decimal(50_000, 2_000_000, 0) if moneda == 'CLP' else self.decimal(50, 2000),
+                    )
+        return self.insertar(CostoMaquila, costos())
+
+    def inventario(self):
+        self.insertar(InventarioMateriaPrima, (
+            InventarioMateriaPrima(materia_prima_id=pk, stock_kg=self.decimal(0, 50000, 3)) for pk in self.materias
+        ))
+        self.insertar(InventarioProductoFinal, (
+            InventarioProductoFinal(producto_id=pk, stock_kg=self.decimal(0, 5000, 3)) for pk in self.productos
+        ))
+
+    def tipos_cambio(self):
+        """Un valor por día con una caminata aleatoria acotada alrededor de 900 CLP por USD."""
+        # Se respetan los tipos de cambio ya cargados para las mismas fechas
+        existentes = set(TipoCambio.objects.using(self.using).values_list('fecha', flat=True))
+
+        def valores():
+            valor = 900.0
+            for dias in range(DIAS_HISTORIA, -1, -1):
+                valor = min(max(valor + self.rnd.gauss(0, 4), 750), 1050)
+                fecha = self.hoy - timedelta(days=dias)
+                if fecha not in existentes:
+                    yield TipoCambio(fecha=fecha, clp_por_usd=Decimal(f'{valor:.2f}'))
+        return self.insertar(TipoCambio, valores())
+
+    def ordenes(self):
+        estados = [estado for estado, _ in OrdenVenta.ESTADO_CHOICES]
+        self.ordenes_ids = self.insertar(OrdenVenta, (
+            OrdenVenta(
+                cliente_id=self.rnd.choice(self.clientes), estado=self.rnd.choice(estados),
+                porcentaje_adelanto=self.rnd.choice([0, 30, 50]), condicion_saldo='contra_copia',
+                fecha_estimada_pago_saldo=self.fecha(futuro=90), fecha=self.fecha(),
+            ) for _ in range(self.escala)
+        ))
+        return self.ordenes_ids
+
+    def items(self):
+        def items():
+            for pk in self.ordenes_ids:
+                for producto in self.rnd.sample(self.productos, self.rnd.randint(1, 4)):
+                    precio = self.precios[producto] * self.decimal(0.9, 1.3)
+                    yield ItemOrdenVenta(
+                        orden_id=pk, producto_id=producto, cantidad_kg=self.decimal(100, 8000, 3),
+                        precio_por_kg=precio.quantize(Decimal('0.01')),
+                    )
+        return self.insertar(ItemOrdenVenta, items())
+
+    def embarques(self):
+        self.embarques_ids = self.insertar(Embarque, (
+            Embarque(orden_venta_id=pk, fecha_embarque=self.fecha(futuro=60))
+            for pk in self.ordenes_ids if self.rnd.random() < 0.8
+        ))
+        return self.embarques_ids
+
+    def documentacion(self):
+        return self.insertar(DocumentacionExportacion, (
+            DocumentacionExportacion(
+                embarque_id=pk, dus=self.rnd.random() < 0.8, guia_despacho=self.rnd.random() < 0.8,
+                packing_list=self.rnd.random() < 0.9, certificado_origen=self.rnd.random() < 0.7,
+                fecha_arribo_estimada=self.fecha(futuro=60), plazo_envio_courier=self.fecha(futuro=30),
+                estado_envio='enviada' if self.rnd.random() < 0.85 else 'pendiente',
+            )
+            for pk in self.embarques_ids
+        ))
+
+    def servicios(self):
+        return self.insertar(ServicioLogistico, (
+            ServicioLogistico(
+                embarque_id=pk, proveedor_id=self.rnd.choice(self.proveedores_servicio),
+                documento_referencia=f'F-{pk}-{i}', monto=self.decimal(100, 5000),
+                moneda=self.rnd.choice(['USD', 'CLP']), fecha_vencimiento=self.fecha(futuro=90),
+                estado_pago='pagada' if self.rnd.random() < 0.8 else 'pendiente',
+            ) for pk in self.embarques_ids for i in range(2)
+        ))
+
+    def cotizaciones(self):
+        def cotizaciones():
+            for _ in range(self.escala // 5):
+                producto = self.rnd.choice(self.productos)
+                kg = self.decimal(500, 20000, 3)
+                margen = self.decimal(10, 35)
+                costo = (kg * self.precios[producto] * self.decimal(0.6, 0.8)).quantize(Decimal('0.01'))
+                yield Cotizacion(
+                    cliente_id=self.rnd.choice(self.clientes), producto_id=producto, cantidad_kg=kg,
+                    costo_estimado_total=costo, margen_pct=margen,
+                    precio_sugerido_kg=(costo / kg * (1 + margen / 100)).quantize(Decimal('0.01')),
+                    fecha=self.fecha(), convertida_a_orden=self.rnd.random() < 0.4,
+                )
+        return self.insertar(Cotizacion, cotizaciones())
+
+    def generar(self):
+        """Genera todos los modelos y devuelve las filas creadas por modelo."""
+        self.catalogos()
+        self.inventario()
+        for paso in (
+            self.tipos_cambio, self.compras, self.operaciones, self.costos, self.ordenes, self.items,
+            self.embarques, self.documentacion, self.servicios, self.cotizaciones,
+        ):
+            paso()
+        if self.using == DEFAULT_DB_ALIAS:
+            # Ahora para las lecturas de esta misma transacción y otra vez al confirmarla para los demás procesos
+            invalidar_caches()
+            transaction.on_commit(invalidar_caches)
+        return dict(self.conteo)
+
+
+def invalidar_caches():
+    """Invalida las cachés que normalmente invalidan las señales, que ``bulk_create`` no dispara."""
+    for modelo in catalogos.MODELOS:
+        catalogos.invalidar(modelo)
+    tipo_cambio.invalidar()
+    precios.invalidar()
+    metricas.invalidar_snapshot()
+
+
+def escala_para(filas):
+    """Órdenes de venta necesarias para generar aproximadamente ``filas`` filas en total."""
+    # Los tipos de cambio diarios no dependen de la escala
+    return max(1, math.ceil((filas - DIAS_HISTORIA - 1) / FILAS_POR_ORDEN))
+
+
+def generar(escala, semilla=0, lote=5000):
+    return Generador(escala, semilla, lote).generar()
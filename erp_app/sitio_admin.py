@@ -0,0 +1,17 @@
+"""Sitio del admin del ERP. Se importa al cargar las apps: no debe importar modelos."""
+from django.conf import settings
+from django.contrib import admin
+from django.contrib.admin.apps import AdminConfig
+
+
+class ErpAdminSite(admin.AdminSite):
+    index_title = "Panel de Administración"
+
+    def __init__(self, name='admin'):
+        super().__init__(name)
+        self.site_header = getattr(settings, 'ADMIN_SITE_HEADER', self.site_header)
+        self.site_title = getattr(settings, 'ADMIN_SITE_TITLE', self.site_title)
+
+
+class ErpAdminConfig(AdminConfig):
+    default_site = 'erp_app.sitio_admin.ErpAdminSite'
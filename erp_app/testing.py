@@ -0,0 +1,78 @@
+"""
+Utilidades de prueba para presupuestos de consultas.
+
+``PresupuestoAdminMixin`` recorre cada ``ModelAdmin`` registrado y comprueba
+que su listado y su formulario no superen un número máximo de consultas::
+
+    class AdminTests(PresupuestoAdminMixin, TestCase):
+        def test_presupuestos(self):
+            self.assertPresupuestosAdmin()
+"""
+from contextlib import contextmanager
+
+from django.contrib import admin
+from django.contrib.auth import get_user_model
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+
+@contextmanager
+def presupuesto_consultas(testcase, maximo, contexto=''):
+    """Falla si el bloque ejecuta más de ``maximo`` consultas, mostrando las repetidas."""
+    with CaptureQueriesContext(connection) as capturadas:
+        yield capturadas
+    ejecutadas = [q['sql'] for q in capturadas.captured_queries]
+    if len(ejecutadas) > maximo:
+        repetidas = sorted({sql for sql in ejecutadas if ejecutadas.count(sql) > 1})
+        testcase.fail(
+            f"{contexto}: {len(ejecutadas)} consultas, presupuesto {maximo}.\n"
+            + "\n".join(f"  x{ejecutadas.count(sql)} {sql}" for sql in repetidas)
+        )
+
+
+class PresupuestoAdminMixin:
+    sitio_admin = admin.site
+    presupuesto_listado = 15
+    presupuesto_formulario = 25
+    # Presupuestos particulares, por ejemplo {OrdenVenta: {'formulario': 30}}
+    presupuestos = {}
+
+    def setUp(self):
+        super().setUp()
+        usuario = get_user_model().objects.create_superuser('presupuesto', 'presupuesto@example.com', 'x')
+        self.client.force_login(usuario)
+
+    def _url(self, model, vista, *args):
+        return reverse(
+            f'{self.sitio_admin.name}:{model._meta.app_label}_{model._meta.model_name}_{vista}', args=args
+        )
+
+    def contar_consultas_admin(self):
+        """Número de consultas de cada listado y formulario del sitio, por (modelo, vista)."""
+        conteo = {}
+        for model in self.sitio_admin._registry:
+            obj = model._default_manager.order_by('pk').first()
+            vistas = [('listado', self._url(model, 'changelist'))]
+            if obj is not None:
+                vistas.append(('formulario', self._url(model, 'change', obj.pk)))
+            for vista, url in vistas:
+                with CaptureQueriesContext(connection) as capturadas:
+                    self.client.get(url)
+                conteo[model.__name__, vista] = len(capturadas)
+        return conteo
+
+    def assertPresupuestosAdmin(self):
+        for model in self.sitio_admin._registry:
+            propios = self.presupuestos.get(model, {})
+            with self.subTest(model=model.__name__, vista='listado'):
+                with presupuesto_consultas(self, propios.get('listado', self.presupuesto_listado), f"{model.__name__} listado"):
+                    response = self.client.get(self._url(model, 'changelist'))
+                self.assertEqual(response.status_code, 200)
+            obj = model._default_manager.order_by('pk').first()
+            if obj is None:
+                continue
+            with self.subTest(model=model.__name__, vista='formulario'):
+                with presupuesto_consultas(self, propios.get('formulario', self.presupuesto_formulario), f"{model.__name__} formulario"):
+                    response = self.client.get(self._url(model, 'change', obj.pk))
+                self.assertEqual(response.status_code, 200)
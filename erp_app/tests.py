@@ -1,3 +1,1078 @@
-from django.test import TestCase
+import csv
+import io
+import json
+import os
+import signal
+import statistics
+import tempfile
+from datetime import date, timedelta
+from decimal import Decimal
+from unittest import mock
 
-# Create your tests here.
+from asgiref.sync import async_to_sync
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.contrib.auth.models import AnonymousUser
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import CommandError, call_command
+from django.db import DatabaseError, OperationalError, connection, transaction
+from django.db.models import Sum
+from django.http import HttpResponse, StreamingHttpResponse
+from django.test import RequestFactory, SimpleTestCase, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+
+from erp_avellanos.database import configurar_bd, configurar_cache
+
+from . import (
+    arranque, auditoria, busqueda, catalogos, cierre, costos, difusion, disponibilidad, documentacion, exportacion,
+    flujo_caja, importacion, inventario, metricas, precios, rendimiento, sintetico, tipo_cambio, trabajos, versiones
+)
+from .models import (
+    LB_POR_KG,
+    Cliente, MateriaPrima, ProductoTerminado, Proveedor,
+    CompraMateriaPrima, InventarioMateriaPrima, InventarioProductoFinal, MovimientoInventario,
+    OperacionProcesamiento, CostoMaquila, OrdenVenta, ItemOrdenVenta,
+    ProveedorServicio, Embarque, ServicioLogistico,
+    DocumentacionExportacion, Cotizacion, RegistroAuditoria, CuboMensual, PartidaFlujoCaja, FlujoCaja, Trabajo,
+    TipoCambio
+)
+from .admin import CompraMateriaPrimaAdmin
+from .middleware import PresupuestoConsultasMiddleware
+from .testing import PresupuestoAdminMixin
+from .transacciones import atomic_con_reintentos
+
+
+def crear_datos(n=3):
+    """Crea ``n`` registros encadenados de cada modelo del ERP."""
+    hoy = date.today()
+    mp, _ = MateriaPrima.objects.get_or_create(nombre='Mejillón en concha')
+    pt, _ = ProductoTerminado.objects.get_or_create(
+        tipo='congelado', presentacion='IQF 1 kg', defaults={'precio_kg_usd': Decimal('5.50')}
+    )
+    naviera, _ = ProveedorServicio.objects.get_or_create(nombre='Naviera Sur', tipo='naviera')
+    for i in range(n):
+        cliente = Cliente.objects.create(nombre=f'Cliente {i}', pais='España')
+        proveedor = Proveedor.objects.create(nombre=f'Proveedor {i}')
+        CompraMateriaPrima.objects.create(
+            proveedor=proveedor, materia_prima=mp, cantidad_kg=1000, precio_por_kg=Decimal('0.80'), abastecida=True
+        )
+        op = OperacionProcesamiento.objects.create(
+            materia_prima=mp, kg_entrada=500, producto_terminado=pt, kg_salida_real=300, abastecido_a_inventario=True
+        )
+        CostoMaquila.objects.create(operacion=op, concepto='Cocción', monto=100, fecha=hoy)
+        orden = OrdenVenta.objects.create(
+            cliente=cliente, porcentaje_adelanto=30, condicion_saldo='contra_copia', fecha_estimada_pago_saldo=hoy
+        )
+        ItemOrdenVenta.objects.create(orden=orden, producto=pt, cantidad_kg=10, precio_por_kg=Decimal('6.00'))
+        embarque = Embarque.objects.create(orden_venta=orden, fecha_embarque=hoy)
+        ServicioLogistico.objects.create(
+            embarque=embarque, proveedor=naviera, documento_referencia=f'BL-{i}', monto=200, fecha_vencimiento=hoy
+        )
+        DocumentacionExportacion.objects.create(embarque=embarque, fecha_arribo_estimada=hoy, plazo_envio_courier=hoy)
+        Cotizacion.objects.create(
+            cliente=cliente, producto=pt, cantidad_kg=100, costo_estimado_total=400, margen_pct=20
+        )
+
+
+class PresupuestoConsultasAdminTests(PresupuestoAdminMixin, TestCase):
+    def setUp(self):
+        super().setUp()
+        crear_datos()
+
+    def test_presupuestos_por_model_admin(self):
+        self.assertPresupuestosAdmin()
+
+
+@override_settings(DEBUG=False, INSTRUMENTACION_CONSULTAS={'HABILITADO': True, 'MUESTREO': 1.0, 'PRESUPUESTO': 2})
+class PresupuestoConsultasMiddlewareTests(TestCase):
+    def vista(self, request):
+        list(Cliente.objects.all())
+        list(Cliente.objects.all())
+        return HttpResponse('ok')
+
+    def vista_streaming(self, request):
+        def filas():
+            for _ in range(3):
+                yield f'{Cliente.objects.count()}\n'
+        return StreamingHttpResponse(filas())
+
+    def pedir(self, vista, usuario=None):
+        request = RequestFactory().get('/reporte/')
+        request.user = usuario or AnonymousUser()
+        return PresupuestoConsultasMiddleware(vista)(request)
+
+    def test_registra_consultas_duplicadas_y_tiempos_solo_para_el_staff(self):
+        with self.assertLogs('erp_app.rendimiento', 'INFO') as registros:
+            response = self.pedir(self.vista)
+        [registro] = registros.records
+        self.assertEqual(registro.levelname, 'INFO')
+        self.assertEqual(
+            {clave: registro.informe[clave] for clave in ('ruta', 'estado', 'consultas', 'consultas_duplicadas')},
+            {'ruta': '/reporte/', 'estado': 200, 'consultas': 2, 'consultas_duplicadas': 1},
+        )
+        self.assertEqual(json.loads(registro.getMessage()), registro.informe)
+        self.assertNotIn('Server-Timing', response)
+        staff = get_user_model().objects.create_user('staff', is_staff=True)
+        with self.assertLogs('erp_app.rendimiento', 'INFO'):
+            self.assertIn('db;dur=', self.pedir(self.vista, staff)['Server-Timing'])
+        with override_settings(DEBUG=True), self.assertLogs('erp_app.rendimiento', 'INFO'):
+            self.assertIn('Server-Timing', self.pedir(self.vista))
+
+    def test_cuenta_las_consultas_del_streaming(self):
+        with self.assertNoLogs('erp_app.rendimiento', 'INFO'):
+            response = self.pedir(self.vista_streaming)
+        with self.assertLogs('erp_app.rendimiento', 'WARNING') as registros:
+            self.assertEqual(b''.join(response.streaming_content), b'0\n0\n0\n')
+        [registro] = registros.records
+        self.assertEqual((registro.informe['consultas'], registro.informe['streaming_sin_contar']), (3, False))
+        self.assertTrue(registro.informe['excede_presupuesto'])
+
+# Las versiones en caché se leen una sola vez: las lecturas periódicas dependen del reloj y no de las filas
+@override_settings(CATALOGOS_REVISION_SEGUNDOS=3600, VERSIONES_REVISION_SEGUNDOS=3600)
+class ConsultasAcotadasAdminTests(PresupuestoAdminMixin, TestCase):
+    maxDiff = None
+
+    def test_consultas_no_crecen_con_las_filas(self):
+        # Con los lotes de auditoría volcados, el historial también tiene filas en ambas mediciones
+        with self.captureOnCommitCallbacks(execute=True):
+            crear_datos(2)
+        self.contar_consultas_admin()  # calienta las cachés de ContentType y permisos
+        pocas = self.contar_consultas_admin()
+
+        with self.captureOnCommitCallbacks(execute=True):
+            crear_datos(30)
+        orden = OrdenVenta.objects.order_by('pk').first()
+        pt = ProductoTerminado.objects.get()
+        ItemOrdenVenta.objects.bulk_create(
+            ItemOrdenVenta(orden=orden, producto=pt, cantidad_kg=5, precio_por_kg=Decimal('6.00')) for _ in range(60)
+        )
+        embarque = Embarque.objects.order_by('pk').first()
+        naviera = ProveedorServicio.objects.get()
+        ServicioLogistico.objects.bulk_create(
+            ServicioLogistico(
+                embarque=embarque, proveedor=naviera, documento_referencia=f'F-{i}', monto=10, fecha_vencimiento=date.today()
+            ) for i in range(30)
+        )
+        self.contar_consultas_admin()  # recarga los catálogos invalidados al crear los datos
+        self.assertEqual(self.contar_consultas_admin(), pocas)
+
+
+class DashboardTests(TestCase):
+    def test_requiere_usuario_del_staff(self):
+        for nombre in ('dashboard', 'dashboard_metricas', 'dashboard_eventos'):
+            with self.subTest(nombre=nombre):
+                response = self.client.get(reverse(f'erp_app:{nombre}'))
+                self.assertEqual(response.status_code, 302)
+                self.assertTrue(response['Location'].startswith(reverse('admin:login')))
+
+    def test_invalida_el_snapshot_al_confirmar(self):
+        crear_datos(1)
+        self.assertEqual(metricas.obtener_snapshot()['ordenes_pendientes'], 1)
+        with self.captureOnCommitCallbacks(execute=True):
+            OrdenVenta.objects.update(estado='confirmada')
+            OrdenVenta.objects.get().save()
+            self.assertEqual(metricas.obtener_snapshot()['ordenes_pendientes'], 1)
+        self.assertEqual(metricas.obtener_snapshot()['ordenes_pendientes'], 0)
+
+    def test_bajo_wsgi_consulta_metricas_en_vez_de_abrir_sse(self):
+        self.client.force_login(get_user_model().objects.create_superuser('admin', 'admin@example.com', None))
+        pagina = self.client.get(reverse('erp_app:dashboard'))
+        self.assertNotContains(pagina, 'EventSource(')
+        self.assertContains(pagina, reverse('erp_app:dashboard_metricas'))
+        self.assertEqual(self.client.get(reverse('erp_app:dashboard_eventos')).status_code, 204)
+
+    def test_un_difusor_por_proceso(self):
+        async def escuchar():
+            actual = difusion.difusor()
+            actual.suscriptores += 1
+            try:
+                return actual, await actual.esperar(0, timeout=5)
+            finally:
+                actual.suscriptores -= 1
+
+        # Cada async_to_sync corre en un event loop nuevo
+        with mock.patch.object(difusion, '_difusor', None):
+            primero, (version, snapshot) = async_to_sync(escuchar)()
+            segundo, cambio = async_to_sync(escuchar)()
+        self.assertIs(primero, segundo)
+        self.assertEqual(cambio, (version, snapshot))
+        self.assertEqual(snapshot['ordenes_pendientes'], 0)
+
+
+class TrabajosTests(TestCase):
+    def setUp(self):
+        self.intentos = 0
+
+        def inestable(progreso, fallas):
+            self.intentos += 1
+            if self.intentos <= fallas:
+                raise RuntimeError("falla transitoria")
+            return {'intentos': self.intentos}
+
+        trabajos.TAREAS['inestable'] = inestable
+        self.addCleanup(trabajos.TAREAS.pop, 'inestable')
+
+    def test_deduplica_trabajos_activos(self):
+        primero = trabajos.encolar('inestable', {'fallas': 0})
+        self.assertEqual(trabajos.encolar('inestable', {'fallas': 0}), primero)
+        self.assertEqual(trabajos.procesar(), 1)
+        self.assertNotEqual(trabajos.encolar('inestable', {'fallas': 0}), primero)
+
+    @override_settings(TRABAJOS_ESPERA_REINTENTO=0)
+    def test_reintenta_hasta_agotar_intentos(self):
+        exitoso = trabajos.encolar('inestable', {'fallas': 1})
+        trabajos.procesar()
+        exitoso.refresh_from_db()
+        self.assertEqual((exitoso.estado, exitoso.intentos, exitoso.resultado), ('terminado', 2, {'intentos': 2}))
+
+        self.intentos = 0
+        fallido = trabajos.encolar('inestable', {'fallas': 5}, max_intentos=2)
+        trabajos.procesar()
+        fallido.refresh_from_db()
+        self.assertEqual((fallido.estado, fallido.intentos), ('fallido', 2))
+        self.assertIn("falla transitoria", fallido.error)
+
+    def test_no_ejecuta_trabajos_programados_a_futuro(self):
+        programado = trabajos.encolar('inestable', {'fallas': 0}, ejecutar_desde=timezone.now() + timedelta(hours=1))
+        self.assertEqual(trabajos.procesar(), 0)
+        programado.refresh_from_db()
+        self.assertEqual(programado.estado, 'pendiente')
+
+    def test_importar_rechaza_archivos_fuera_del_directorio(self):
+        for archivo in ('/etc/passwd', '../settings.py'):
+            trabajo = trabajos.encolar('importar', {'tipo': 'compras', 'archivo': archivo}, max_intentos=1)
+            trabajos.procesar()
+            trabajo.refresh_from_db()
+            self.assertEqual(trabajo.estado, 'fallido')
+            self.assertIn("fuera del directorio de trabajos", trabajo.error)
+
+    def test_solo_recupera_trabajos_sin_latido(self):
+        trabajos.encolar('inestable', {'fallas': 0})
+        primero = trabajos.reservar('a')
+        antiguo = timezone.now() - timedelta(hours=2)
+        # Un trabajo largo que sigue latiendo no se recupera aunque haya empezado hace horas
+        Trabajo.objects.filter(pk=primero.pk).update(iniciado=antiguo)
+        trabajos.Progreso(primero.pk, 'a')(5, mensaje="5 filas")
+        self.assertEqual(trabajos.recuperar_abandonados(), 0)
+        self.assertEqual(Trabajo.objects.values_list('progreso', 'mensaje').get(), (0, "5 filas"))
+
+        Trabajo.objects.filter(pk=primero.pk).update(latido=antiguo)
+        with override_settings(TRABAJOS_ESPERA_REINTENTO=0):
+            self.assertEqual(trabajos.recuperar_abandonados(), 1)
+        segundo = trabajos.reservar('b')
+        self.assertEqual(segundo.pk, primero.pk)
+        # La primera ejecución termina tarde: no cierra ni reprograma la del trabajador b
+        self.assertTrue(trabajos.ejecutar(primero))
+        trabajos.registrar_fallo(primero.pk, "error tardío", 'a')
+        segundo.refresh_from_db()
+        self.assertEqual((segundo.estado, segundo.trabajador), ('ejecutando', 'b'))
+        self.assertNotIn("error tardío", segundo.error)
+        self.assertTrue(trabajos.ejecutar(segundo))
+        segundo.refresh_from_db()
+        self.assertEqual((segundo.estado, segundo.intentos), ('terminado', 2))
+
+    def test_sigterm_devuelve_los_trabajos_a_la_cola(self):
+        def detenida(progreso):
+            os.kill(os.getpid(), signal.SIGTERM)
+
+        trabajos.TAREAS['detenida'] = detenida
+        self.addCleanup(trabajos.TAREAS.pop, 'detenida')
+        trabajo = trabajos.encolar('detenida')
+        anterior = signal.getsignal(signal.SIGTERM)
+        salida = io.StringIO()
+        call_command('trabajador', en_proceso=True, una_vez=True, stdout=salida)
+        self.assertIn("1 trabajos devueltos a la cola", salida.getvalue())
+        self.assertIs(signal.getsignal(signal.SIGTERM), anterior)
+        trabajo.refresh_from_db()
+        self.assertEqual((trabajo.estado, trabajo.intentos, trabajo.trabajador), ('pendiente', 0, ''))
+
+
+class InventarioTests(TestCase):
+    def setUp(self):
+        self.mp = MateriaPrima.objects.create(nombre='Mejillón en concha')
+        self.proveedor = Proveedor.objects.create(nombre='Pesquera Sur')
+
+    def stock(self):
+        return InventarioMateriaPrima.objects.get(materia_prima=self.mp).stock_kg
+
+    def libro(self):
+        return list(MovimientoInventario.objects.order_by('pk').values_list('tipo', 'cantidad_kg'))
+
+    def test_libro_sigue_las_compras(self):
+        compra = CompraMateriaPrima.objects.create(
+            proveedor=self.proveedor, materia_prima=self.mp, cantidad_kg=1000, precio_por_kg=Decimal('0.80'), abastecida=True
+        )
+        self.assertEqual((self.stock(), self.libro()), (Decimal(1000), [('compra', Decimal(1000))]))
+        compra.cantidad_kg = Decimal(800)
+        compra.save()
+        # Volver a grabar sin cambios no agrega movimientos
+        compra.save()
+        self.assertEqual(self.stock(), Decimal(800))
+        self.assertEqual(self.libro(), [('compra', Decimal(1000)), ('compra', Decimal(-200))])
+        compra.delete()
+        self.assertEqual(self.stock(), Decimal(0))
+        self.assertEqual(self.libro()[-1], ('compra', Decimal(-800)))
+        # Los movimientos de la compra borrada quedan en el libro
+        self.assertEqual(MovimientoInventario.objects.aggregate(total=Sum('cantidad_kg'))['total'], Decimal(0))
+
+    def test_abastecer_es_idempotente(self):
+        compras = [
+            CompraMateriaPrima.objects.create(
+                proveedor=self.proveedor, materia_prima=self.mp, cantidad_kg=kg, precio_por_kg=Decimal('0.80')
+            )
+            for kg in (100, 200, 300)
+        ]
+        self.assertEqual(self.libro(), [])
+        # Marcada sin pasar por save(): le faltan los movimientos
+        CompraMateriaPrima.objects.filter(pk=compras[2].pk).update(abastecida=True)
+        queryset = CompraMateriaPrima.objects.filter(pk__in=[compra.pk for compra in compras[1:]])
+        self.assertEqual(
+            inventario.abastecer_compras(queryset), {compras[1].pk: 'abastecida', compras[2].pk: 'regularizada'},
+        )
+        self.assertEqual(self.stock(), Decimal(500))
+        libro = self.libro()
+        self.assertEqual(
+            inventario.abastecer_compras(CompraMateriaPrima.objects.all()),
+            {compras[0].pk: 'abastecida', compras[1].pk: 'sin_cambios', compras[2].pk: 'sin_cambios'},
+        )
+        self.assertEqual(self.libro(), [*libro, ('compra', Decimal(100))])
+        self.assertEqual(inventario.abastecer_compras(CompraMateriaPrima.objects.all()), dict.fromkeys(
+            [compra.pk for compra in compras], 'sin_cambios',
+        ))
+        self.assertEqual((self.stock(), len(self.libro())), (Decimal(600), 3))
+
+    def test_rebuild_stock_reproduce_el_libro(self):
+        crear_datos(2)
+        esperado = {
+            modelo: dict(modelo.objects.values_list('pk', 'stock_kg'))
+            for modelo in (InventarioMateriaPrima, InventarioProductoFinal)
+        }
+        InventarioMateriaPrima.objects.update(stock_kg=0)
+        InventarioProductoFinal.objects.update(stock_kg=12345)
+        call_command('rebuild_stock', dry_run=True, stdout=io.StringIO())
+        self.assertEqual(InventarioMateriaPrima.objects.get().stock_kg, Decimal(0))
+        salida = io.StringIO()
+        call_command('rebuild_stock', stdout=salida)
+        self.assertIn("1 filas con diferencias", salida.getvalue())
+        for modelo, stocks in esperado.items():
+            self.assertEqual(dict(modelo.objects.values_list('pk', 'stock_kg')), stocks)
+        # 2 compras de 1000 kg menos 2 consumos de 500 kg; 2 salidas de 300 kg menos 2 despachos de 10 kg
+        self.assertEqual(list(esperado[InventarioMateriaPrima].values()), [Decimal(1000)])
+        self.assertEqual(list(esperado[InventarioProductoFinal].values()), [Decimal(580)])
+
+
+class CostosTests(TestCase):
+    def setUp(self):
+        crear_datos(2)
+        self.producto = ProductoTerminado.objects.get()
+
+    def test_margenes_por_orden_y_cliente(self):
+        # 1000 kg de materia prima a 0,80 y 200 USD de maquila por 600 kg producidos
+        costo_kg = (1000 * Decimal('0.80') + 200) / 600
+        self.assertEqual(costos.costo_unitario_productos(), {self.producto.pk: costo_kg})
+        reporte = costos.calcular_margenes()
+        for orden in OrdenVenta.objects.all():
+            margen = reporte['ordenes'][orden.pk]
+            self.assertEqual((margen.kg, margen.ingreso, margen.logistica), (10, 60, 200))
+            self.assertEqual(margen.margen, 60 - 10 * costo_kg - 200)
+            self.assertEqual(reporte['clientes'][orden.cliente_id].margen, margen.margen)
+        self.assertEqual(reporte['productos'][self.producto.pk].kg, 20)
+
+    def test_producto_sin_procesamiento_queda_sin_costo(self):
+        nuevo = ProductoTerminado.objects.create(tipo='conserva', presentacion='Lata 250 g', precio_kg_usd=Decimal('9.00'))
+        orden = OrdenVenta.objects.order_by('pk').first()
+        ItemOrdenVenta.objects.create(orden=orden, producto=nuevo, cantidad_kg=5, precio_por_kg=Decimal('9.00'))
+        reporte = costos.calcular_margenes()
+        self.assertNotIn(nuevo.pk, costos.costo_unitario_productos())
+        for margen in (reporte['productos'][nuevo.pk], reporte['ordenes'][orden.pk]):
+            self.assertEqual((margen.sin_costo, margen.margen, margen.margen_pct), (True, None, None))
+        self.assertFalse(reporte['productos'][self.producto.pk].sin_costo)
+
+        _, filas = exportacion.reporte_margenes(por='productos')
+        self.assertEqual({fila[0]: fila[-1] for fila in filas}[nuevo.pk], 'sin costo')
+        salida = io.StringIO()
+        call_command('calcular_margenes', por='ordenes', stdout=salida)
+        self.assertTrue(salida.getvalue().splitlines()[-1].startswith(str(orden)))
+        self.assertIn('sin costo', salida.getvalue().splitlines()[-1])
+
+
+class OrdenesTests(TestCase):
+    def test_totales_en_sql_igualan_las_sumas_en_python(self):
+        cliente = Cliente.objects.create(nombre='Cliente', pais='España')
+        pt = ProductoTerminado.objects.create(tipo='congelado', presentacion='IQF 1 kg', precio_kg_usd=Decimal('5.50'))
+        lineas = {0: [], 1: [('12.345', '6.75')], 2: [('10', '6.00'), ('0.125', '7.99'), ('999.999', '0.01')]}
+        ordenes = {}
+        for n, items in lineas.items():
+            ordenes[n] = OrdenVenta.objects.create(
+                cliente=cliente, porcentaje_adelanto=30, condicion_saldo='contra_copia', fecha_estimada_pago_saldo=date.today()
+            )
+            for kg, precio in items:
+                ItemOrdenVenta.objects.create(orden=ordenes[n], producto=pt, cantidad_kg=Decimal(kg), precio_por_kg=Decimal(precio))
+        totales = OrdenVenta.objects.with_totals().in_bulk()
+        for n, orden in ordenes.items():
+            with self.subTest(orden=n):
+                items = list(orden.items.all())
+                kg = sum((item.cantidad_kg for item in items), Decimal(0))
+                total = totales[orden.pk]
+                self.assertEqual(total.total_kg, kg)
+                self.assertAlmostEqual(total.total_lb, kg * LB_POR_KG, places=3)
+                # El admin redondea al mostrar; la suma en SQL no redondea ítem por ítem
+                usd = sum((item.cantidad_kg * item.precio_por_kg for item in items), Decimal(0))
+                self.assertEqual(total.total_usd.quantize(Decimal('0.01')), usd.quantize(Decimal('0.01')))
+
+
+class TipoCambioTests(TestCase):
+    def setUp(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            # Viernes, lunes y el domingo siguiente
+            for dia, tasa in ((1, 900), (4, 910), (10, 920)):
+                TipoCambio.objects.create(fecha=date(2024, 3, dia), clp_por_usd=tasa)
+
+    def test_usa_la_ultima_tasa_publicada(self):
+        casos = {
+            date(2024, 2, 28): 900,  # antes de la primera tasa se usa la primera
+            date(2024, 3, 1): 900,
+            date(2024, 3, 2): 900,
+            date(2024, 3, 3): 900,
+            date(2024, 3, 4): 910,
+            date(2024, 3, 9): 910,
+            date(2024, 12, 31): 920,
+            None: 920,
+        }
+        for fecha, esperada in casos.items():
+            with self.subTest(fecha=fecha):
+                self.assertEqual(tipo_cambio.tasa(fecha), esperada)
+
+    def test_convierte_clp_a_usd(self):
+        self.assertEqual(tipo_cambio.a_usd(Decimal(9100), 'CLP', date(2024, 3, 5)), 10)
+        self.assertEqual(tipo_cambio.a_usd(Decimal(25), 'USD', date(2024, 3, 5)), 25)
+        self.assertEqual(
+            tipo_cambio.convertir_a_usd(
+                [Decimal(9000), Decimal(9100), Decimal(12)], ['CLP', 'CLP', 'USD'],
+                [date(2024, 3, 3), date(2024, 3, 4), date(2024, 3, 4)],
+            ),
+            [10, 10, 12],
+        )
+        self.assertEqual(tipo_cambio.convertir_a_usd([Decimal(9200), Decimal(1840)], 'CLP'), [10, 2])
+        with self.captureOnCommitCallbacks(execute=True):
+            TipoCambio.objects.all().delete()
+        with override_settings(TIPO_CAMBIO_CLP_USD=1000):
+            self.assertEqual(tipo_cambio.a_usd(Decimal(5000), 'CLP', date(2024, 3, 5)), 5)
+
+    def test_importar_tipo_cambio(self):
+        with tempfile.TemporaryDirectory() as directorio:
+            archivo = os.path.join(directorio, 'tasas.csv')
+            with open(archivo, 'w', encoding='utf-8') as f:
+                f.write('fecha,clp_por_usd\n2024-03-04,"915,50"\n2024-03-05,930\n2024-03-06,abc\n\n')
+            salida, errores = io.StringIO(), io.StringIO()
+            call_command('importar_tipo_cambio', archivo, batch_size=1, stdout=salida, stderr=errores)
+            self.assertIn('2 tasas importadas, 1 filas con errores.', salida.getvalue())
+            self.assertIn('Línea 4', errores.getvalue())
+            self.assertEqual(TipoCambio.objects.count(), 4)
+            self.assertEqual(tipo_cambio.tasa(date(2024, 3, 4)), Decimal('915.50'))
+            self.assertEqual(tipo_cambio.tasa(date(2024, 3, 8)), 930)
+
+            with open(archivo, 'w', encoding='utf-8') as f:
+                f.write('2024-03-07;x\n')
+            with self.assertRaises(CommandError):
+                call_command('importar_tipo_cambio', archivo, delimitador=';', stdout=salida, stderr=errores)
+
+class FlujoCajaTests(TestCase):
+    def test_totales_siguen_a_los_documentos(self):
+        crear_datos(2)
+        self.assertEqual(flujo_caja.diferencias(), {})
+        servicio, pagado = ServicioLogistico.objects.order_by('pk')
+        servicio.monto, servicio.moneda = Decimal(350000), 'CLP'
+        servicio.fecha_vencimiento = date.today() - timedelta(days=45)
+        servicio.save()
+        pagado.estado_pago = 'pagada'
+        pagado.full_clean()
+        pagado.save()
+        self.assertFalse(pagado.partidas_flujo.exists())
+        item = ItemOrdenVenta.objects.order_by('pk').first()
+        item.precio_por_kg = Decimal('7.25')
+        item.save()
+        orden = OrdenVenta.objects.exclude(pk=item.orden_id).get()
+        orden.fecha_estimada_pago_saldo = date.today() + timedelta(days=40)
+        orden.save()
+        ItemOrdenVenta.objects.create(orden=orden, producto=item.producto, cantidad_kg=5, precio_por_kg=Decimal('6.10'))
+        self.assertEqual(flujo_caja.diferencias(), {})
+        item.delete()
+        self.assertEqual(flujo_caja.diferencias(), {})
+
+        self.assertEqual(
+            [(fila['tramo'], fila['usd'], fila['clp']) for fila in flujo_caja.antiguedad_por_pagar()],
+            [('1-30', 0, 0), ('31-60', 0, Decimal(350000)), ('61-90', 0, 0), ('+91', 0, 0)],
+        )
+        # 30% de adelanto de 10 kg a 6,00 y 5 kg a 6,10
+        cobros = PartidaFlujoCaja.objects.filter(orden=orden).order_by('concepto').values_list('concepto', 'monto')
+        self.assertEqual(list(cobros), [('adelanto', Decimal('27.15')), ('saldo', Decimal('63.35'))])
+        OrdenVenta.objects.filter(pk=orden.pk).delete()
+        servicio.delete()
+        self.assertEqual(flujo_caja.diferencias(), {})
+        self.assertFalse(PartidaFlujoCaja.objects.exists())
+        self.assertEqual(set(FlujoCaja.objects.values_list('monto', flat=True)), {0})
+
+
+class RendimientoTests(TestCase):
+    def test_resumen_igual_a_media_y_varianza_directas(self):
+        mp = MateriaPrima.objects.create(nombre='Mejillón en concha')
+        pt = ProductoTerminado.objects.create(tipo='congelado', presentacion='IQF 1 kg', precio_kg_usd=Decimal('5.50'))
+        hoy = date.today()
+        operaciones = [
+            OperacionProcesamiento.objects.create(
+                materia_prima=mp, producto_terminado=pt, kg_entrada=1000, kg_salida_real=salida,
+                rendimiento_esperado_pct=30, fecha=hoy - timedelta(days=dias),
+            )
+            for dias, salida in [(0, 300), (0, 320), (1, 280), (1, 310), (9, 355), (9, 290)]
+        ]
+        operaciones[1].kg_salida_real = 250
+        operaciones[1].save()
+        operaciones[2].delete()
+        operaciones[4].fecha = hoy - timedelta(days=2)
+        operaciones[4].save()
+        OperacionProcesamiento.objects.create(materia_prima=mp, producto_terminado=pt, kg_entrada=800, kg_salida_real=260)
+
+        def comprobar():
+            rendimientos, desvios = [], []
+            for op in OperacionProcesamiento.objects.all():
+                rendimientos.append(float(op.kg_salida_real / op.kg_entrada * 100))
+                if op.rendimiento_esperado_pct is not None:
+                    desvios.append(rendimientos[-1] - float(op.rendimiento_esperado_pct))
+            total = rendimiento.resumen(mp, pt)
+            self.assertEqual(total.rendimiento.n, len(rendimientos))
+            self.assertAlmostEqual(total.rendimiento.media, statistics.mean(rendimientos))
+            self.assertAlmostEqual(total.rendimiento.varianza, statistics.variance(rendimientos))
+            self.assertAlmostEqual(total.desvio.media, statistics.mean(desvios))
+            self.assertEqual(sum(total.histograma.values()), len(rendimientos))
+            reciente = rendimiento.resumen(mp, pt, desde=hoy - timedelta(days=2))
+            self.assertEqual(reciente.rendimiento.n, len(rendimientos) - 1)
+
+        comprobar()
+        rendimiento.recalcular()
+        comprobar()
+
+
+class DisponibilidadTests(TestCase):
+    def setUp(self):
+        self.cliente = Cliente.objects.create(nombre='Cliente', pais='España')
+        mp = MateriaPrima.objects.create(nombre='Mejillón en concha')
+        self.pt = ProductoTerminado.objects.create(tipo='congelado', presentacion='IQF 1 kg', precio_kg_usd=Decimal('5.50'))
+        OperacionProcesamiento.objects.create(
+            materia_prima=mp, kg_entrada=2000, producto_terminado=self.pt, kg_salida_real=500, abastecido_a_inventario=True
+        )
+
+    def orden(self, kg):
+        orden = OrdenVenta.objects.create(
+            cliente=self.cliente, porcentaje_adelanto=30, condicion_saldo='contra_copia', fecha_estimada_pago_saldo=date.today()
+        )
+        ItemOrdenVenta.objects.create(orden=orden, producto=self.pt, cantidad_kg=kg, precio_por_kg=Decimal('6.00'))
+        return orden
+
+    def test_reserva_al_confirmar_y_libera_al_embarcar(self):
+        primera = self.orden(300)
+        disponibilidad.confirmar(primera)
+        self.assertEqual(disponibilidad.disponible(), {self.pt.pk: Decimal(200)})
+
+        segunda = self.orden(250)
+        with self.assertRaises(disponibilidad.StockInsuficiente) as error:
+            disponibilidad.confirmar(segunda)
+        self.assertEqual(error.exception.faltantes, {self.pt.pk: (Decimal(250), Decimal(200))})
+        segunda.refresh_from_db()
+        self.assertEqual(segunda.estado, 'pendiente')
+
+        Embarque.objects.create(orden_venta=primera, fecha_embarque=date.today())
+        inventario = InventarioProductoFinal.objects.get(producto=self.pt)
+        self.assertEqual((inventario.stock_kg, inventario.reservado_kg), (Decimal(200), Decimal(0)))
+        disponibilidad.confirmar(self.orden(200))
+        self.assertEqual(disponibilidad.disponible(), {self.pt.pk: Decimal(0)})
+        self.assertEqual(disponibilidad.diferencias(), {})
+
+
+class DocumentacionTests(TestCase):
+    def setUp(self):
+        self.hoy = date(2024, 6, 10)
+        cliente = Cliente.objects.create(nombre='Cliente', pais='España')
+
+        def crear(dias, **campos):
+            orden = OrdenVenta.objects.create(
+                cliente=cliente, porcentaje_adelanto=30, condicion_saldo='contra_copia', fecha_estimada_pago_saldo=self.hoy
+            )
+            return DocumentacionExportacion.objects.create(
+                embarque=Embarque.objects.create(orden_venta=orden, fecha_embarque=self.hoy),
+                fecha_arribo_estimada=self.hoy, plazo_envio_courier=self.hoy + timedelta(days=dias), **campos,
+            )
+
+        self.docs = {dias: crear(dias, dus=True) for dias in (-1, 0, 2, 3, 7, 8)}
+        self.completa = crear(0, dus=True, guia_despacho=True, packing_list=True, certificado_origen=True)
+        self.enviada = crear(0, estado_envio='enviada')
+
+    def test_cola_de_riesgo_por_tramo(self):
+        self.assertEqual((self.docs[0].documentos, self.docs[0].completitud), (1, 25))
+        self.assertEqual((self.completa.documentos, self.completa.completitud), (15, 100))
+        cola = documentacion.en_riesgo(self.hoy)
+        self.assertEqual(
+            [(doc.pk, doc.tramo_plazo) for doc in cola],
+            [(self.docs[dias].pk, tramo) for dias, tramo in
+             [(-1, 'vencido'), (0, 'critico'), (2, 'critico'), (3, 'proximo'), (7, 'proximo')]],
+        )
+        self.assertEqual(documentacion.faltantes(cola[0]), ['guia despacho', 'packing list', 'certificado origen'])
+
+    def test_mascara_al_dia_con_update_y_bulk_update(self):
+        DocumentacionExportacion.objects.filter(pk=self.docs[-1].pk).update(
+            guia_despacho=True, packing_list=True, certificado_origen=True,
+        )
+        doc = self.docs[0]
+        doc.dus, doc.packing_list = False, True
+        DocumentacionExportacion.objects.bulk_update([doc], ['dus', 'packing_list'])
+        doc.refresh_from_db()
+        self.assertEqual((doc.documentos, doc.completitud), (4, 25))
+        self.assertEqual(
+            [d.pk for d in documentacion.en_riesgo(self.hoy)], [self.docs[dias].pk for dias in (0, 2, 3, 7)],
+        )
+
+
+class IndicesTests(TestCase):
+    PLANES = {
+        'dashboard.ordenes_pendientes': 'ordenventa_estado_fecha_idx',
+        'dashboard.operaciones_pendientes': 'operacion_pendiente_idx',
+        'dashboard.embarques_proximos': 'embarque_fecha_idx',
+        'dashboard.inventario_bajo': 'invpf_stock_idx',
+        'admin.servicios_por_vencer': 'servicio_pago_venc_idx',
+        'admin.docs_pendientes_por_plazo': 'doc_envio_plazo_idx',
+    }
+
+    def test_benchmark_usa_los_indices_y_los_restaura(self):
+        salida = io.StringIO()
+        call_command('benchmark_indices', escala=30, repeticiones=1, stdout=salida)
+        tabla, *secciones = salida.getvalue().split('\n== ')
+        self.assertIn('admin.compras_pendientes_proveedor', tabla)
+        planes = {}
+        for seccion in secciones:
+            nombre, resto = seccion.split('\n', 1)
+            planes[nombre] = resto.split('-- con índices\n')
+        self.assertEqual(set(planes), set(self.PLANES))
+        for nombre, indice in self.PLANES.items():
+            with self.subTest(consulta=nombre):
+                sin_indices, con_indices = planes[nombre]
+                self.assertIn(f'USING INDEX {indice}', con_indices)
+                self.assertNotIn('USING INDEX', sin_indices)
+        # El DROP INDEX del benchmark se deshace con el resto de la transacción
+        with connection.cursor() as cursor:
+            self.assertIn('ordenventa_estado_fecha_idx', connection.introspection.get_constraints(cursor, 'erp_app_ordenventa'))
+        self.assertFalse(OrdenVenta.objects.exists())
+
+class BaseDatosTests(SimpleTestCase):
+    # Sin la transacción que abre TestCase, para que atomic_con_reintentos reintente
+    databases = {'default'}
+
+    def test_perfil_segun_el_entorno(self):
+        base = settings.BASE_DIR
+        self.assertEqual(configurar_bd(base, {})['default']['OPTIONS']['transaction_mode'], 'IMMEDIATE')
+        self.assertNotIn('OPTIONS', configurar_bd(base, {'ERP_DB_PERFIL': 'sqlite-basico'})['default'])
+        postgres = configurar_bd(base, {'ERP_DB_PERFIL': 'postgres', 'ERP_DB_NOMBRE': 'erp', 'ERP_DB_POOL_MAX': '4'})['default']
+        self.assertEqual(postgres['ENGINE'], 'django.db.backends.postgresql')
+        self.assertEqual((postgres['NAME'], postgres['OPTIONS']['pool']['max_size']), ('erp', 4))
+        with self.assertRaises(ValueError):
+            configurar_bd(base, {'ERP_DB_PERFIL': 'mysql'})
+        self.assertEqual(configurar_cache({})['default']['LOCATION'], 'erp_cache')
+        self.assertIn('Redis', configurar_cache({'ERP_CACHE_URL': 'redis://localhost:6379/0'})['default']['BACKEND'])
+
+    def test_reintenta_mientras_la_base_esta_bloqueada(self):
+        bloqueo = OperationalError('database is locked')
+        for efectos, llamadas in (([bloqueo, bloqueo, 'ok'], 3), ([bloqueo] * 5, 3), ([OperationalError('no such table: x')], 1)):
+            with self.subTest(efectos=efectos), mock.patch('erp_app.transacciones.time.sleep') as dormir:
+                func = mock.Mock(side_effect=efectos)
+                envuelta = atomic_con_reintentos(intentos=3)(func)
+                if efectos[-1] == 'ok':
+                    self.assertEqual(envuelta(), 'ok')
+                else:
+                    with self.assertRaises(OperationalError):
+                        envuelta()
+                self.assertEqual(func.call_count, llamadas)
+                self.assertEqual(dormir.call_count, llamadas - 1)
+
+    def test_no_reintenta_dentro_de_una_transaccion(self):
+        func = mock.Mock(side_effect=OperationalError('database is locked'))
+        with mock.patch('erp_app.transacciones.time.sleep') as dormir, transaction.atomic():
+            with self.assertRaises(OperationalError):
+                atomic_con_reintentos()(func)()
+        self.assertEqual((func.call_count, dormir.call_count), (1, 0))
+
+    def test_check_de_la_tabla_de_cache(self):
+        self.assertEqual(versiones.revisar_tabla_cache(), [])
+        with override_settings(CACHES={'default': {'BACKEND': 'django.core.cache.backends.db.DatabaseCache', 'LOCATION': 'sin_tabla'}}):
+            self.assertEqual([mensaje.id for mensaje in versiones.revisar_tabla_cache()], ['erp_app.W005'])
+
+class PreciosTests(TestCase):
+    def setUp(self):
+        # Las señales invalidan los modelos de costo al confirmar
+        with self.captureOnCommitCallbacks(execute=True):
+            crear_datos(2)
+        self.producto = ProductoTerminado.objects.get()
+        # 1000 kg de materia prima a 0,80 y 200 USD de maquila por 600 kg producidos; logística 400 USD por 20 kg despachados
+        self.costo_kg = Decimal(1000) * Decimal('0.80') / 600 + Decimal(200) / 600 + Decimal(400) / 20
+
+    def test_cotizar_aplica_costo_y_margen(self):
+        for margen, esperado in ((Decimal(20), self.costo_kg / Decimal('0.8')), (Decimal(0), self.costo_kg)):
+            with self.subTest(margen=margen):
+                cotizacion = precios.cotizar(Cotizacion(producto=self.producto, cantidad_kg=100, margen_pct=margen))
+                self.assertEqual(cotizacion.margen_pct, margen)
+                self.assertEqual(cotizacion.costo_estimado_total, (self.costo_kg * 100).quantize(Decimal('0.01')))
+                self.assertEqual(cotizacion.precio_sugerido_kg, esperado.quantize(Decimal('0.01')))
+        sin_margen = precios.cotizar(Cotizacion(producto=self.producto, cantidad_kg=100, margen_pct=None))
+        self.assertEqual(sin_margen.margen_pct, precios.margen_por_defecto())
+        with self.assertRaises(ValueError):
+            precios.cotizar(Cotizacion(producto=self.producto, cantidad_kg=100, margen_pct=100))
+
+    @override_settings(VERSIONES_REVISION_SEGUNDOS=3600)
+    def test_cotizar_lote_guarda_en_bloque(self):
+        Cotizacion.objects.update(precio_sugerido_kg=0)
+        precios.VERSION.actual()
+        precios.VERSION_LOGISTICA.actual()
+        with self.assertNumQueries(7):
+            cotizaciones = precios.cotizar_lote(Cotizacion.objects.all())
+        self.assertEqual(len(cotizaciones), 2)
+        esperado = (self.costo_kg / Decimal('0.8')).quantize(Decimal('0.01'))
+        self.assertEqual(set(Cotizacion.objects.values_list('precio_sugerido_kg', flat=True)), {esperado})
+
+    def test_invalida_los_modelos_al_confirmar(self):
+        anterior = precios.VERSION.actual()
+        with self.captureOnCommitCallbacks() as al_confirmar:
+            CompraMateriaPrima.objects.update(precio_por_kg=Decimal('1.60'))
+            CompraMateriaPrima.objects.first().save()
+            self.assertEqual(precios.VERSION.actual(), anterior)
+        for callback in al_confirmar:
+            callback()
+        self.assertNotEqual(precios.VERSION.actual(), anterior)
+        cotizacion = precios.cotizar(Cotizacion(producto=self.producto, cantidad_kg=100, margen_pct=0))
+        self.assertEqual(cotizacion.precio_sugerido_kg, (self.costo_kg + Decimal(1000) * Decimal('0.80') / 600).quantize(Decimal('0.01')))
+
+    def test_items_solo_invalidan_la_logistica(self):
+        modelos, logistica = precios.VERSION.actual(), precios.VERSION_LOGISTICA.actual()
+        with self.captureOnCommitCallbacks(execute=True):
+            ItemOrdenVenta.objects.order_by('pk').first().save()
+        self.assertEqual(precios.VERSION.actual(), modelos)
+        self.assertNotEqual(precios.VERSION_LOGISTICA.actual(), logistica)
+
+    def test_no_cotiza_productos_sin_costo(self):
+        sin_procesar = ProductoTerminado.objects.create(tipo='conserva', presentacion='Lata 250 g', precio_kg_usd=Decimal('9.00'))
+        sin_compras = ProductoTerminado.objects.create(tipo='congelado', presentacion='Almeja 1 kg', precio_kg_usd=Decimal('7.00'))
+        with self.captureOnCommitCallbacks(execute=True):
+            OperacionProcesamiento.objects.create(
+                materia_prima=MateriaPrima.objects.create(nombre='Almeja'), producto_terminado=sin_compras,
+                kg_entrada=100, kg_salida_real=40,
+            )
+        for producto in (sin_procesar, sin_compras):
+            with self.subTest(producto=producto):
+                self.assertTrue(precios.modelos_costo({producto.pk})[producto.pk].sin_costo)
+                with self.assertRaises(precios.SinCosto):
+                    precios.cotizar(Cotizacion(producto=producto, cantidad_kg=100, margen_pct=20))
+        self.assertEqual([c.producto for c in precios.lista_precios()], [self.producto])
+
+        self.client.force_login(get_user_model().objects.create_superuser('admin', 'admin@example.com', None))
+        datos = {'producto': sin_compras.pk, 'cantidad_kg': '100', 'margen_pct': '20'}
+        response = self.client.post(reverse('admin:erp_app_cotizacion_add'), datos)
+        self.assertFormError(
+            response.context['adminform'].form, 'producto',
+            "El producto no tiene costo conocido: faltan operaciones de procesamiento o compras de su materia prima.",
+        )
+
+    def test_admin_rechaza_margen_de_100_o_mas(self):
+        self.client.force_login(get_user_model().objects.create_superuser('admin', 'admin@example.com', None))
+        datos = {'producto': self.producto.pk, 'cantidad_kg': '100', 'margen_pct': '100'}
+        response = self.client.post(reverse('admin:erp_app_cotizacion_add'), datos)
+        self.assertEqual(response.status_code, 200)
+        self.assertFormError(response.context['adminform'].form, 'margen_pct', "El margen debe estar entre 0% y menos de 100%.")
+        datos['margen_pct'] = ''
+        self.assertEqual(self.client.post(reverse('admin:erp_app_cotizacion_add'), datos).status_code, 302)
+        self.assertEqual(Cotizacion.objects.latest('pk').margen_pct, precios.margen_por_defecto())
+
+
+class ExportacionTests(TestCase):
+    def setUp(self):
+        crear_datos(3)
+        self.client.force_login(get_user_model().objects.create_superuser('admin', 'admin@example.com', None))
+
+    def sin_openpyxl(self):
+        exportacion.formatos.cache_clear()
+        self.addCleanup(exportacion.formatos.cache_clear)
+        return mock.patch.object(exportacion, 'find_spec', return_value=None)
+
+    def leer(self, response):
+        self.assertTrue(response.streaming)
+        return list(csv.reader(io.StringIO(b''.join(response.streaming_content).decode())))
+
+    def test_reporte_en_streaming(self):
+        response = self.client.get(
+            reverse('erp_app:exportar_reporte', args=['items_orden', 'csv']), {'desde': date.today().isoformat()},
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['Content-Type'], 'text/csv; charset=utf-8')
+        self.assertEqual(response['Content-Disposition'], 'attachment; filename="items_orden.csv"')
+        encabezados, *filas = self.leer(response)
+        self.assertEqual(encabezados[:2], ['orden', 'orden__fecha'])
+        esperadas = ItemOrdenVenta.objects.order_by('orden', 'pk').values_list('orden', 'cantidad_kg')
+        self.assertEqual([(int(fila[0]), Decimal(fila[7])) for fila in filas], list(esperadas))
+        url = reverse('erp_app:exportar_reporte', args=['items_orden', 'csv'])
+        self.assertEqual(self.client.get(url, {'desde': 'ayer'}).status_code, 400)
+        self.assertEqual(self.client.get(reverse('erp_app:exportar_reporte', args=['nada', 'csv'])).status_code, 404)
+
+    def test_bloques_de_filas(self):
+        self.assertEqual(list(exportacion.bloques_csv(['a'], [[1], [2], [3]], filas_por_bloque=2)), ['a\r\n1\r\n2\r\n', '3\r\n'])
+
+    def test_sin_openpyxl_no_ofrece_xlsx(self):
+        with self.sin_openpyxl():
+            self.assertEqual(exportacion.formatos(), ['csv'])
+            with self.assertRaises(RuntimeError):
+                exportacion.escribir_xlsx(io.BytesIO(), ['a'], [[1]])
+            url = reverse('erp_app:exportar_reporte', args=['items_orden', 'xlsx'])
+            self.assertEqual(self.client.get(url).status_code, 404)
+            self.assertEqual(self.client.get(reverse('admin:erp_app_cliente_exportar', args=['xlsx'])).status_code, 404)
+            response = self.client.get(reverse('admin:erp_app_cliente_changelist'))
+        self.assertContains(response, 'Exportar CSV')
+        self.assertNotContains(response, 'Exportar XLSX')
+
+    def test_changelist_exporta_lo_filtrado(self):
+        compra = CompraMateriaPrima.objects.order_by('pk').last()
+        response = self.client.get(
+            reverse('admin:erp_app_compramateriaprima_exportar', args=['csv']), {'proveedor__id__exact': compra.proveedor_id},
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['Content-Disposition'], 'attachment; filename="compramateriaprima.csv"')
+        encabezados, *filas = self.leer(response)
+        self.assertEqual(encabezados, list(CompraMateriaPrimaAdmin.campos_exportacion))
+        self.assertEqual(filas, [[str(compra.pk), str(compra.fecha), compra.proveedor.nombre, 'Mejillón en concha', '1000.000', '0.80', 'USD', 'True']])
+
+class CatalogosTests(TestCase):
+    def test_invalida_al_confirmar_y_relee_sin_consultas(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            materia = MateriaPrima.objects.create(nombre='Jurel')
+        self.assertEqual(catalogos.etiqueta(MateriaPrima, materia.pk), 'Jurel')
+        with self.assertNumQueries(0):
+            self.assertEqual(catalogos.opciones(MateriaPrima), [(materia.pk, 'Jurel')])
+        # Vencida la revisión, una versión sin cambios se lee de la caché y no recarga el catálogo
+        with override_settings(CATALOGOS_REVISION_SEGUNDOS=0), self.assertNumQueries(1):
+            catalogos.etiquetas(MateriaPrima)
+
+        with self.captureOnCommitCallbacks() as callbacks:
+            materia.nombre = 'Jurel entero'
+            materia.save()
+        # Hasta confirmar la transacción se sigue viendo el nombre anterior
+        self.assertEqual(catalogos.etiqueta(MateriaPrima, materia.pk), 'Jurel')
+        for callback in callbacks:
+            callback()
+        self.assertEqual(catalogos.etiqueta(MateriaPrima, materia.pk), 'Jurel entero')
+        with self.assertNumQueries(0):
+            self.assertEqual(catalogos.etiqueta(MateriaPrima, materia.pk), 'Jurel entero')
+
+class SinteticoTests(TestCase):
+    MODELOS = [
+        Cliente, MateriaPrima, ProductoTerminado, Proveedor,
+        CompraMateriaPrima, InventarioMateriaPrima, InventarioProductoFinal,
+        OperacionProcesamiento, CostoMaquila, OrdenVenta, ItemOrdenVenta,
+        ProveedorServicio, Embarque, ServicioLogistico,
+        DocumentacionExportacion, Cotizacion,
+    ]
+
+    def test_genera_los_dieciseis_modelos(self):
+        conteo = sintetico.generar(40, semilla=1)
+        for modelo in self.MODELOS:
+            with self.subTest(modelo=modelo.__name__):
+                self.assertGreater(modelo.objects.count(), 0)
+                self.assertEqual(conteo[modelo.__name__], modelo.objects.count())
+
+    def test_benchmark_emite_json_y_deshace_los_cambios(self):
+        salida = io.StringIO()
+        call_command(
+            'benchmark', escala=20, repeticiones=2, calentamiento=0,
+            solo=['dashboard.metricas', 'admin.ordenventa', 'reportes.margenes'],
+            stdout=salida, stderr=io.StringIO(),
+        )
+        informe = json.loads(salida.getvalue())
+        self.assertEqual(informe['meta']['filas']['OrdenVenta'], 20)
+        self.assertEqual(
+            sorted(informe['resultados']),
+            ['admin.ordenventa.formulario', 'admin.ordenventa.listado', 'dashboard.metricas',
+             'reportes.margenes', 'reportes.margenes.vista'],
+        )
+        self.assertLessEqual(informe['resultados']['dashboard.metricas']['consultas'], 1)
+        self.assertFalse(OrdenVenta.objects.exists())
+        self.assertFalse(get_user_model().objects.exists())
+
+
+class ImportacionTests(TestCase):
+    def importar(self, *filas, crear_catalogos=True):
+        importador = importacion.ImportadorCompras(crear_catalogos=crear_catalogos)
+        columnas = 'fecha,proveedor,materia_prima,cantidad_kg,precio_por_kg,moneda,abastecida'
+        return importador.importar(importacion.leer_csv([columnas, *filas]))
+
+    def test_conserva_las_fechas_historicas(self):
+        resultado = self.importar('2020-01-15,Pesquera Sur,Mejillón,100,0.80,USD,no', ',Pesquera Sur,Mejillón,50,0.80,USD,no')
+        self.assertEqual(resultado.errores, [])
+        self.assertEqual(
+            list(CompraMateriaPrima.objects.order_by('pk').values_list('fecha', flat=True)),
+            [date(2020, 1, 15), date.today()],
+        )
+
+    def test_catalogos_nuevos_solo_con_lotes_guardados(self):
+        resultado = self.importar('2024-01-15,Pesquera Sur,Mejillón,abc,0.80,USD,no')
+        self.assertEqual(len(resultado.errores), 1)
+        with mock.patch.object(importacion.ImportadorCompras, 'guardar', side_effect=DatabaseError('falla')):
+            resultado = self.importar('2024-01-15,Pesquera Sur,Mejillón,100,0.80,USD,no')
+        self.assertIn('Lote descartado', resultado.errores[0][1])
+        self.assertFalse(Proveedor.objects.exists() or MateriaPrima.objects.exists())
+        resultado = self.importar('2024-01-15,Pesquera Sur,Mejillón,100,0.80,USD,no', ',pesquera  sur,Mejillón,50,0.80,USD,no')
+        self.assertEqual(resultado.creados, {'proveedor': 1, 'materiaprima': 1, 'compramateriaprima': 2})
+        self.assertEqual(CompraMateriaPrima.objects.filter(proveedor__nombre='Pesquera Sur').count(), 2)
+
+    def test_bytes_que_no_son_utf8_se_informan_por_fila(self):
+        usuario = get_user_model().objects.create_superuser('admin', 'admin@example.com', None)
+        self.client.force_login(usuario)
+        contenido = (
+            'fecha,proveedor,materia_prima,cantidad_kg,precio_por_kg,moneda,abastecida\n'
+            '2024-01-15,Pesquera Sur,Mejillón,100,0.80,USD,no\n'
+            '2024-01-16,Pesquera Ñandú,Mejillón,50,0.80,USD,no\n'
+        ).encode('utf-8').replace('Ñ'.encode('utf-8'), 'Ñ'.encode('latin-1'))
+        archivo = SimpleUploadedFile('compras.csv', contenido, content_type='text/csv')
+        response = self.client.post(
+            reverse('admin:erp_app_compramateriaprima_importar'),
+            {'archivo': archivo, 'delimitador': ',', 'crear_catalogos': 'on'},
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.context['resultado'].creados['compramateriaprima'], 1)
+        [(linea, mensaje)] = response.context['resultado'].errores
+        self.assertEqual(linea, 3)
+        self.assertIn('UTF-8', mensaje)
+
+
+class BusquedaTests(TestCase):
+    def setUp(self):
+        self.cliente = Cliente.objects.create(nombre='Pesquera Ñandú', pais='Perú', email='ventas@nandu.pe')
+        Cliente.objects.create(nombre='Conservas del Sur', pais='Chile')
+
+    def test_prefijos_sin_acentos_y_retiro_al_borrar(self):
+        self.assertEqual([r.objeto for r in busqueda.buscar('nand per')], [self.cliente])
+        self.assertEqual(busqueda.buscar('PESQ')[0].url, reverse('admin:erp_app_cliente_change', args=[self.cliente.pk]))
+        self.cliente.delete()
+        self.assertEqual(busqueda.buscar('nandu'), [])
+
+    def test_busqueda_del_admin_usa_el_indice(self):
+        usuario = get_user_model().objects.create_superuser('admin', 'admin@example.com', None)
+        self.client.force_login(usuario)
+        response = self.client.get(reverse('admin:erp_app_cliente_changelist'), {'q': 'conserv'})
+        self.assertEqual([c.nombre for c in response.context['cl'].result_list], ['Conservas del Sur'])
+        response = self.client.get(reverse('erp_app:busqueda'), {'q': 'ñandu'})
+        self.assertContains(response, 'Pesquera Ñandú')
+
+
+class AuditoriaTests(TestCase):
+    def setUp(self):
+        # Las pruebas corren en una transacción que nunca confirma: los lotes se vuelcan a mano
+        with self.captureOnCommitCallbacks(execute=True):
+            self.producto = ProductoTerminado.objects.create(
+                tipo='congelado', presentacion='IQF 1 kg', precio_kg_usd=Decimal('5.00'),
+            )
+            self.orden = OrdenVenta.objects.create(
+                cliente=Cliente.objects.create(nombre='Cliente', pais='España'),
+                porcentaje_adelanto=30, condicion_saldo='contra_copia', fecha_estimada_pago_saldo=date.today(),
+            )
+
+    def test_anota_al_confirmar_y_descarta_al_deshacer(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            self.producto.precio_kg_usd = Decimal('6.25')
+            self.producto.save()
+            item = ItemOrdenVenta.objects.create(orden=self.orden, producto=self.producto, cantidad_kg=10, precio_por_kg=7)
+            item.precio_por_kg = Decimal('7.50')
+            item.save(update_fields=['precio_por_kg'])
+            # Nada se escribe antes de confirmar
+            self.assertFalse(RegistroAuditoria.objects.filter(accion='cambio').exists())
+        self.assertEqual(auditoria.historial(self.producto).first().cambios, {'precio_kg_usd': ['5.00', '6.25']})
+        self.assertEqual(
+            [(r.accion, r.cambios.get('precio_por_kg')) for r in auditoria.historial(self.orden)][:2],
+            [('cambio', ['7.00', '7.50']), ('alta', [None, '7'])],
+        )
+        with self.captureOnCommitCallbacks(execute=True) as callbacks:
+            try:
+                with transaction.atomic():
+                    self.producto.precio_kg_usd = Decimal('9.00')
+                    self.producto.save()
+                    raise ValueError
+            except ValueError:
+                pass
+        self.assertEqual(callbacks, [])
+        self.assertEqual(auditoria.historial(self.producto).count(), 2)
+
+    def test_un_insert_por_transaccion_sin_los_puntos_deshechos(self):
+        self.assertNotIn(auditoria.ATRIBUTO, ProductoTerminado.objects.get().__dict__)
+        with CaptureQueriesContext(connection) as consultas, self.captureOnCommitCallbacks(execute=True):
+            with transaction.atomic():
+                self.producto.precio_kg_usd = Decimal('6.00')
+                self.producto.save()
+            try:
+                with transaction.atomic():
+                    self.producto.precio_kg_usd = Decimal('7.00')
+                    self.producto.save()
+                    raise ValueError
+            except ValueError:
+                pass
+            self.orden.porcentaje_adelanto = 40
+            self.orden.save()
+        inserciones = [c for c in consultas if c['sql'].startswith(f'INSERT INTO "{RegistroAuditoria._meta.db_table}"')]
+        self.assertEqual(len(inserciones), 1)
+        self.assertEqual(auditoria.historial(self.producto).first().cambios, {'precio_kg_usd': ['5.00', '6.00']})
+        self.assertEqual(auditoria.historial(self.orden).first().cambios, {'porcentaje_adelanto': ['30.00', '40']})
+
+    def test_historial_del_admin_y_retencion(self):
+        usuario = get_user_model().objects.create_superuser('admin', 'admin@example.com', None)
+        self.client.force_login(usuario)
+        url = reverse('admin:erp_app_productoterminado_change', args=[self.producto.pk])
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.post(url, {'nombre': 'Mejillón', 'tipo': 'congelado', 'presentacion': 'IQF 1 kg', 'precio_kg_usd': '6.40'})
+        registro = auditoria.historial(self.producto).first()
+        self.assertEqual((registro.usuario, registro.cambios), (usuario, {'precio_kg_usd': ['5.00', '6.40']}))
+        response = self.client.get(reverse('admin:erp_app_productoterminado_history', args=[self.producto.pk]))
+        self.assertContains(response, '5.00 → 6.40')
+        RegistroAuditoria.objects.filter(pk=registro.pk).update(periodo=date(2000, 1, 1))
+        self.assertEqual(auditoria.purgar(meses=12), {'2000-01-01': 1})
+        self.assertFalse(RegistroAuditoria.objects.filter(pk=registro.pk).exists())
+
+
+class CierreTests(TestCase):
+    def setUp(self):
+        crear_datos(2)
+        # Todo queda en el mes anterior, que ya se puede cerrar
+        self.mes = cierre.mes(cierre.mes(date.today()) - timedelta(days=1))
+        OrdenVenta.objects.update(fecha=self.mes)
+        CompraMateriaPrima.objects.update(fecha=self.mes)
+        CostoMaquila.objects.update(fecha=self.mes)
+        Embarque.objects.update(fecha_embarque=self.mes)
+
+    def test_cierre_congela_el_mes_y_los_reportes_lo_leen(self):
+        vivas = list(cierre.filas())
+        resultado = cierre.cerrar(self.mes)
+        self.assertEqual(resultado.filas, CuboMensual.objects.filter(periodo=self.mes).count())
+        self.assertEqual(set(resultado.total_usd), {'venta', 'compra', 'maquila', 'logistica'})
+        cerradas = list(cierre.filas())
+        self.assertTrue(all(fila[-1] for fila in cerradas))
+        self.assertEqual([fila[:-1] for fila in cerradas], [fila[:-1] for fila in vivas])
+
+        item = ItemOrdenVenta.objects.first()
+        item.precio_por_kg += 1
+        item.save()
+        self.assertEqual(list(cierre.diferencias(self.mes)), ['venta'])
+        cierre.cerrar(self.mes, rehacer=True)
+        self.assertEqual(cierre.diferencias(self.mes), {})
+        with self.assertRaises(ValueError):
+            cierre.cerrar(date.today())
+
+
+class ArranqueTests(TestCase):
+    @override_settings(ARRANQUE_MAX_SEGUNDOS=None, ARRANQUE_MAX_RSS_MB=1)
+    def test_check_de_despliegue_informa_el_arranque_en_frio(self):
+        ids = [mensaje.id for mensaje in arranque.revisar_arranque()]
+        self.assertEqual(ids, ['erp_app.I001', 'erp_app.W002'])
+        # Los workers no cargan los módulos de reportes e importación hasta usarlos
+        self.assertFalse({'erp_app.exportacion', 'erp_app.importacion'} & {nombre for nombre, *_ in arranque.importaciones()})
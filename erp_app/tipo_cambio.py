@@ -0,0 +1,104 @@
+"""
+Conversión USD/CLP con tasas fechadas.
+
+Las tasas se cargan una vez por proceso en dos listas ordenadas y se buscan
+con ``bisect``: para cada fecha se usa la última tasa publicada en o antes de
+ella. Las escrituras confirmadas incrementan una ``erp_app.versiones.Version``
+y cada proceso recarga sus listas al notarlo. Sin tasas registradas se usa
+``settings.TIPO_CAMBIO_CLP_USD``.
+"""
+import threading
+from bisect import bisect_right
+from decimal import Decimal
+
+from django.conf import settings
+from django.db.models import Case, F, Sum, When
+
+from .models import TipoCambio
+from .versiones import Version
+
+VERSION = Version('erp:tipo_cambio:version')
+
+_lock = threading.Lock()
+_fechas = []
+_tasas = []
+_version = None
+
+
+def _tasa_por_defecto():
+    return Decimal(getattr(settings, 'TIPO_CAMBIO_CLP_USD', 950))
+
+
+def _vigentes():
+    global _fechas, _tasas, _version
+    version = VERSION.actual()
+    if version != _version:
+        with _lock:
+            if version != _version:
+                filas = list(TipoCambio.objects.order_by('fecha').values_list('fecha', 'clp_por_usd'))
+                _fechas = [fecha for fecha, _ in filas]
+                _tasas = [tasa for _, tasa in filas]
+                _version = version
+    return _fechas, _tasas
+
+
+def invalidar():
+    VERSION.invalidar()
+
+
+def _buscar(fechas, tasas, fecha):
+    if fecha is None or not fechas:
+        return tasas[-1] if tasas else _tasa_por_defecto()
+    i = bisect_right(fechas, fecha) - 1
+    return tasas[max(i, 0)]
+
+
+def tasa(fecha=None):
+    """CLP por USD vigente en ``fecha`` (la más reciente si no se indica)."""
+    return _buscar(*_vigentes(), fecha)
+
+
+def a_usd(monto, moneda, fecha=None):
+    if moneda == 'USD':
+        return monto
+    return monto / tasa(fecha)
+
+
+def convertir_a_usd(montos, monedas, fechas=None):
+    """
+    Convierte una columna de montos a USD. ``monedas`` y ``fechas`` pueden ser
+    secuencias paralelas a ``montos`` o un único valor aplicado a todos.
+    """
+    fechas_tc, tasas_tc = _vigentes()
+    montos = list(montos)
+    if isinstance(monedas, str):
+        monedas = [monedas] * len(montos)
+    if fechas is None or not isinstance(fechas, (list, tuple)):
+        fechas = [fechas] * len(montos)
+    return [
+        monto if moneda == 'USD' else monto / _buscar(fechas_tc, tasas_tc, fecha)
+        for monto, moneda, fecha in zip(montos, monedas, fechas)
+    ]
+
+
+def fecha_de_conversion(campo_fecha, campo_moneda='moneda'):
+    """
+    Expresión para agrupar montos antes de convertir: la fecha solo importa en
+    filas CLP, así que las filas USD se agrupan todas bajo NULL.
+    """
+    return Case(When(**{campo_moneda: 'CLP'}, then=F(campo_fecha)))
+
+
+def total_usd(queryset, campo_monto='monto', campo_moneda='moneda', campo_fecha='fecha'):
+    """Suma un queryset en USD agrupando en SQL por moneda y fecha de conversión."""
+    filas = (
+        queryset.values_list(campo_moneda, fecha_de_conversion(campo_fecha, campo_moneda))
+        .annotate(total=Sum(campo_monto))
+        .order_by()
+    )
+    monedas, fechas, montos = [], [], []
+    for moneda, fecha, total in filas:
+        monedas.append(moneda)
+        fechas.append(fecha)
+        montos.append(total)
+    return sum(convertir_a_usd(montos, monedas, fechas), Decimal(0))
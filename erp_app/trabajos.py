@@ -0,0 +1,321 @@
+"""
+Cola de trabajos en segundo plano respaldada por la tabla ``Trabajo``.
+
+``encolar`` registra un trabajo pendiente para una tarea de ``TAREAS``; si ya
+hay uno pendiente o en ejecución con la misma clave (por defecto, la tarea y
+sus parámetros) devuelve ese en vez de duplicarlo. ``manage.py trabajador``
+reserva trabajos con un UPDATE condicional sobre el estado, de modo que dos
+trabajadores nunca toman el mismo, y los ejecuta en un pool de procesos.
+
+Una tarea recibe un ``Progreso`` y los parámetros del trabajo, y devuelve un
+resultado serializable a JSON. Si falla se reintenta con espera exponencial
+hasta ``max_intentos``. Mientras un trabajo se ejecuta, su trabajador renueva
+``latido`` cada ``TRABAJOS_LATIDO`` segundos; los que pasan más de
+``TRABAJOS_SIN_LATIDO`` sin latido (trabajador caído) se tratan como fallidos.
+Cerrar o reprogramar un trabajo solo afecta al del trabajador que lo reservó.
+
+``procesar`` ejecuta los pendientes en el proceso actual, para pruebas y
+desarrollo local sin levantar el trabajador.
+"""
+import hashlib
+import io
+import json
+import os
+import socket
+import threading
+import time
+import traceback
+from contextlib import contextmanager
+from datetime import date, timedelta
+from pathlib import Path
+
+from django.conf import settings
+from django.core.management import call_command
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import IntegrityError, connection, transaction
+from django.db.models import F
+from django.utils import timezone
+
+from .models import Trabajo
+from .transacciones import atomic_con_reintentos
+
+ACTIVOS = ('pendiente', 'ejecutando')
+ERRORES_VISIBLES = 200
+
+TAREAS = {}
+
+
+def tarea(nombre):
+    def registrar(funcion):
+        TAREAS[nombre] = funcion
+        return funcion
+    return registrar
+
+
+def directorio():
+    ruta = Path(getattr(settings, 'TRABAJOS_DIRECTORIO', settings.BASE_DIR / 'trabajos'))
+    ruta.mkdir(parents=True, exist_ok=True)
+    return ruta
+
+
+def ruta_archivo(nombre):
+    """Ruta de ``nombre`` en el directorio de trabajos; rechaza rutas absolutas y las que salen de él."""
+    base = directorio().resolve()
+    ruta = (base / (nombre or '')).resolve()
+    if not nombre or ruta.parent != base:
+        raise ValueError(f"Archivo fuera del directorio de trabajos: {nombre!r}.")
+    return ruta
+
+
+def nombre_trabajador():
+    return f'{socket.gethostname()}:{os.getpid()}'
+
+
+class Progreso:
+    """Registra el avance y el latido del trabajo, como mucho una vez por ``intervalo`` segundos."""
+
+    def __init__(self, trabajo_id, trabajador='', intervalo=1.0):
+        self.trabajo_id = trabajo_id
+        self.trabajador = trabajador
+        self.intervalo = intervalo
+        self._ultimo = 0
+
+    def __call__(self, hechos, total=None, mensaje=''):
+        ahora = time.monotonic()
+        if ahora - self._ultimo < self.intervalo:
+            return
+        self._ultimo = ahora
+        cambios = {'mensaje': mensaje[:200]}
+        if total:
+            # El 100% lo marca solo el cierre del trabajo; sin total solo se informa el mensaje
+            cambios['progreso'] = min(99, int(hechos * 100 / total))
+        self.latir(**cambios)
+
+    def latir(self, **cambios):
+        Trabajo.objects.filter(pk=self.trabajo_id, estado='ejecutando', trabajador=self.trabajador).update(
+            latido=timezone.now(), **cambios,
+        )
+
+
+@contextmanager
+def latiendo(progreso):
+    """Renueva el latido cada ``TRABAJOS_LATIDO`` segundos, aunque la tarea no informe su avance."""
+    fin = threading.Event()
+
+    def latir():
+        while not fin.wait(getattr(settings, 'TRABAJOS_LATIDO', 60)):
+            progreso.latir()
+        connection.close()
+
+    hilo = threading.Thread(target=latir, daemon=True)
+    hilo.start()
+    try:
+        yield
+    finally:
+        fin.set()
+        hilo.join()
+
+
+def clave(nombre, parametros):
+    datos = json.dumps([nombre, parametros], sort_keys=True, cls=DjangoJSONEncoder)
+    return hashlib.sha256(datos.encode()).hexdigest()
+
+
+def encolar(nombre, parametros=None, clave_dedup=None, max_intentos=3, ejecutar_desde=None):
+    """Encola ``nombre`` con ``parametros``, o devuelve el trabajo activo con la misma clave."""
+    if nombre not in TAREAS:
+        raise ValueError(f"Tarea desconocida: {nombre}.")
+    parametros = json.loads(json.dumps(parametros or {}, cls=DjangoJSONEncoder))
+    clave_dedup = clave_dedup or clave(nombre, parametros)
+    existente = Trabajo.objects.filter(clave=clave_dedup, estado__in=ACTIVOS).first()
+    if existente:
+        return existente
+    try:
+        with transaction.atomic():
+            return Trabajo.objects.create(
+                tarea=nombre, parametros=parametros, clave=clave_dedup, max_intentos=max_intentos,
+                ejecutar_desde=ejecutar_desde or timezone.now(),
+            )
+    except IntegrityError:
+        # Otro proceso lo encoló entre la consulta y el INSERT
+        return Trabajo.objects.get(clave=clave_dedup, estado__in=ACTIVOS)
+
+
+@atomic_con_reintentos()
+def reservar(trabajador):
+    """Marca como en ejecución el siguiente trabajo vencido y lo devuelve, o ``None``."""
+    ahora = timezone.now()
+    candidatos = (
+        Trabajo.objects.filter(estado='pendiente', ejecutar_desde__lte=ahora)
+        .order_by('ejecutar_desde', 'pk').values_list('pk', flat=True)[:10]
+    )
+    for pk in candidatos:
+        tomado = Trabajo.objects.filter(pk=pk, estado='pendiente').update(
+            estado='ejecutando', trabajador=trabajador, iniciado=ahora, latido=ahora, intentos=F('intentos') + 1,
+            progreso=0, mensaje='',
+        )
+        if tomado:
+            return Trabajo.objects.get(pk=pk)
+    return None
+
+
+def registrar_fallo(trabajo_id, error, trabajador, **condiciones):
+    """Reprograma el trabajo de ``trabajador`` con espera exponencial o lo da por fallido si agotó los intentos."""
+    trabajo = Trabajo.objects.get(pk=trabajo_id)
+    ahora = timezone.now()
+    cambios = {'error': error, 'trabajador': ''}
+    if trabajo.intentos < trabajo.max_intentos:
+        espera = getattr(settings, 'TRABAJOS_ESPERA_REINTENTO', 30) * 2 ** (trabajo.intentos - 1)
+        cambios.update(estado='pendiente', ejecutar_desde=ahora + timedelta(seconds=espera))
+    else:
+        cambios.update(estado='fallido', terminado=ahora)
+    return Trabajo.objects.filter(
+        pk=trabajo_id, estado='ejecutando', trabajador=trabajador, **condiciones,
+    ).update(**cambios)
+
+
+def ejecutar(trabajo):
+    progreso = Progreso(trabajo.pk, trabajo.trabajador)
+    try:
+        with latiendo(progreso):
+            resultado = TAREAS[trabajo.tarea](progreso, **trabajo.parametros)
+    except Exception:
+        registrar_fallo(trabajo.pk, traceback.format_exc(), trabajo.trabajador)
+        return False
+    # Si otro trabajador lo recuperó por falta de latido, el resultado de esta ejecución se descarta
+    Trabajo.objects.filter(pk=trabajo.pk, estado='ejecutando', trabajador=trabajo.trabajador).update(
+        estado='terminado', progreso=100, mensaje='', resultado=resultado, error='', terminado=timezone.now(),
+    )
+    return True
+
+
+def ejecutar_por_id(trabajo_id):
+    """Punto de entrada en los procesos del pool."""
+    return ejecutar(Trabajo.objects.get(pk=trabajo_id))
+
+
+def recuperar_abandonados():
+    """Trata como fallidos los trabajos en ejecución cuyo trabajador dejó de renovar el latido."""
+    limite = timezone.now() - timedelta(seconds=getattr(settings, 'TRABAJOS_SIN_LATIDO', 300))
+    abandonados = Trabajo.objects.filter(estado='ejecutando', latido__lt=limite).values_list('pk', 'trabajador')
+    return sum(
+        registrar_fallo(pk, "El trabajador dejó de dar señales de vida.", trabajador, latido__lt=limite)
+        for pk, trabajador in list(abandonados)
+    )
+
+
+def liberar(trabajador):
+    """Devuelve a la cola, sin consumir el intento, los trabajos de un trabajador que se detiene."""
+    return Trabajo.objects.filter(estado='ejecutando', trabajador=trabajador).update(
+        estado='pendiente', intentos=F('intentos') - 1, trabajador='', ejecutar_desde=timezone.now(),
+    )
+
+
+def procesar(limite=None, trabajador=None):
+    """Ejecuta en este proceso los trabajos vencidos, hasta vaciar la cola o llegar a ``limite``."""
+    trabajador = trabajador or nombre_trabajador()
+    ejecutados = 0
+    while limite is None or ejecutados < limite:
+        trabajo = reservar(trabajador)
+        if trabajo is None:
+            break
+        ejecutar(trabajo)
+        ejecutados += 1
+    return ejecutados
+
+
+def _fecha(valor):
+    return date.fromisoformat(valor) if isinstance(valor, str) else valor
+
+
+def _salida_comando(nombre, **opciones):
+    salida = io.StringIO()
+    call_command(nombre, stdout=salida, **opciones)
+    return {'salida': salida.getvalue()[-10000:]}
+
+
+@tarea('rebuild_stock')
+def tarea_rebuild_stock(progreso, sincronizar_documentos=False):
+    return _salida_comando('rebuild_stock', sincronizar_documentos=sincronizar_documentos)
+
+
+@tarea('rebuild_flujo_caja')
+def tarea_rebuild_flujo_caja(progreso):
+    return _salida_comando('rebuild_flujo_caja')
+
+
+@tarea('rebuild_rendimiento')
+def tarea_rebuild_rendimiento(progreso):
+    return _salida_comando('rebuild_rendimiento')
+
+
+@tarea('rebuild_reservas')
+def tarea_rebuild_reservas(progreso):
+    return _salida_comando('rebuild_reservas')
+
+
+@tarea('cerrar_periodo')
+def tarea_cerrar_periodo(progreso, mes=None, rehacer=False):
+    """``mes`` en formato AAAA-MM; sin él cierra todos los meses abiertos hasta el anterior."""
+    opciones = {'mes': date.fromisoformat(f'{mes}-01')} if mes else {}
+    return _salida_comando('cerrar_periodo', rehacer=rehacer, **opciones)
+
+
+@tarea('purgar_auditoria')
+def tarea_purgar_auditoria(progreso):
+    return _salida_comando('purgar_auditoria')
+
+
+@tarea('exportar')
+def tarea_exportar(progreso, reporte, formato='csv', **parametros):
+    """Escribe un reporte de ``exportacion.REPORTES`` en el directorio de trabajos."""
+    from . import exportacion
+
+    if reporte not in exportacion.REPORTES:
+        raise ValueError(f"Reporte desconocido: {reporte}.")
+    if formato not in exportacion.formatos():
+        raise ValueError(f"Formato no disponible: {formato}.")
+    for campo in ('desde', 'hasta'):
+        if parametros.get(campo):
+            parametros[campo] = _fecha(parametros[campo])
+    encabezados, filas = exportacion.REPORTES[reporte](**parametros)
+    archivo = directorio() / f'trabajo-{progreso.trabajo_id}-{reporte}.{formato}'
+    contadas = 0
+
+    def contar(filas):
+        nonlocal contadas
+        for contadas, fila in enumerate(filas, 1):
+            if contadas % exportacion.FILAS_POR_BLOQUE == 0:
+                # El total de filas no se conoce de antemano
+                progreso(contadas, mensaje=f"{contadas} filas")
+            yield fila
+
+    if formato == 'xlsx':
+        exportacion.escribir_xlsx(archivo, encabezados, contar(filas))
+    else:
+        with open(archivo, 'w', newline='', encoding='utf-8') as f:
+            for bloque in exportacion.bloques_csv(encabezados, contar(filas)):
+                f.write(bloque)
+    return {'archivo': archivo.name, 'filas': contadas}
+
+
+@tarea('importar')
+def tarea_importar(progreso, tipo, archivo, delimitador=',', crear_catalogos=False, lote=5000):
+    """Importa un CSV ya guardado en el directorio de trabajos."""
+    from .importacion import IMPORTADORES, leer_csv
+
+    ruta = ruta_archivo(archivo)
+    with open(ruta, 'rb') as f:
+        total = max(sum(bloque.count(b'\n') for bloque in iter(lambda: f.read(1 << 20), b'')) - 1, 1)
+    importador = IMPORTADORES[tipo](lote=lote, crear_catalogos=crear_catalogos)
+    with open(ruta, newline='', encoding='utf-8-sig', errors='replace') as f:
+        resultado = importador.importar(
+            leer_csv(f, delimitador),
+            progreso=lambda r: progreso(r.filas, total, f"{r.filas} de {total} filas"),
+        )
+    return {
+        'filas': resultado.filas,
+        'creados': dict(resultado.creados),
+        'errores': resultado.errores[:ERRORES_VISIBLES],
+        'total_errores': len(resultado.errores),
+    }
@@ -0,0 +1,32 @@
+import random
+import time
+from functools import wraps
+
+from django.db import DEFAULT_DB_ALIAS, OperationalError, connections, transaction
+
+
+def es_bloqueo(exc):
+    return 'database is locked' in str(exc) or 'database table is locked' in str(exc)
+
+
+def atomic_con_reintentos(intentos=5, espera=0.05, using=DEFAULT_DB_ALIAS):
+    """
+    Ejecuta la función en una transacción y la reintenta con espera exponencial
+    si SQLite informa que la base está bloqueada. Dentro de una transacción ya
+    abierta no se reintenta: el error debe llegar a quien la abrió.
+    """
+    def decorador(func):
+        @wraps(func)
+        def envoltura(*args, **kwargs):
+            if connections[using].in_atomic_block:
+                return func(*args, **kwargs)
+            for intento in range(intentos):
+                try:
+                    with transaction.atomic(using=using):
+                        return func(*args, **kwargs)
+                except OperationalError as exc:
+                    if not es_bloqueo(exc) or intento == intentos - 1:
+                        raise
+                    time.sleep(espera * 2 ** intento * (1 + random.random()))
+        return envoltura
+    return decorador
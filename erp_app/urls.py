@@ -0,0 +1,15 @@
+from django.urls import path
+from . import views
+
+app_name = 'erp_app'
+
+urlpatterns = [
+    path('dashboard/', views.dashboard_view, name='dashboard'),
+    path('dashboard/metricas.json', views.dashboard_metricas_json, name='dashboard_metricas'),
+    path('dashboard/eventos/', views.dashboard_eventos, name='dashboard_eventos'),
+    path('flujo-caja/', views.flujo_caja_view, name='flujo_caja'),
+    path('documentacion/riesgo/', views.documentacion_riesgo_view, name='documentacion_riesgo'),
+    path('busqueda/', views.busqueda_view, name='busqueda'),
+    path('catalogos/estadisticas.json', views.catalogos_estadisticas, name='catalogos_estadisticas'),
+    path('reportes/<str:nombre>.<str:formato>', views.exportar_reporte, name='exportar_reporte'),
+]
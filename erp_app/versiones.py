@@ -0,0 +1,78 @@
+"""
+Versiones compartidas de datos que cada proceso memoriza.
+
+Un ``Version`` es un valor en la caché de Django, que ``CACHES`` configura
+compartida por todos los workers (ver ``erp_avellanos/settings.py``): los
+tipos de cambio y los modelos de costo se recargan cuando cambia. ``actual``
+lo lee como mucho una vez cada ``VERSIONES_REVISION_SEGUNDOS``, para no
+consultar la caché en cada conversión; otros procesos ven un cambio con ese
+retraso como máximo y el proceso que lo hizo, de inmediato.
+
+Cada versión es un valor aleatorio y no un contador: con la caché en la base,
+un incremento deshecho junto con su transacción haría que la versión
+siguiente repitiera un número ya memorizado por algún proceso.
+
+Las señales llaman a ``invalidar`` al confirmar la transacción
+(``transaction.on_commit``): si lo hicieran antes, otro proceso podría
+recargar los datos previos bajo la versión nueva y conservarlos.
+"""
+import time
+import uuid
+
+from django.conf import settings
+from django.core import checks
+from django.core.cache import cache, caches
+from django.core.cache.backends.db import DatabaseCache
+from django.db import DatabaseError, connections, router
+
+
+def renovar(clave):
+    """Guarda una versión nueva en ``clave`` y la devuelve."""
+    version = uuid.uuid4().hex
+    cache.set(clave, version, None)
+    return version
+
+
+def leer(clave):
+    return cache.get_or_set(clave, lambda: uuid.uuid4().hex, None)
+
+
+class Version:
+    def __init__(self, clave):
+        self.clave = clave
+        self._valor = None
+        self._revisada = 0.0
+
+    def actual(self):
+        ahora = time.monotonic()
+        if self._valor is None or ahora - self._revisada >= getattr(settings, 'VERSIONES_REVISION_SEGUNDOS', 1.0):
+            self._valor = leer(self.clave)
+            self._revisada = ahora
+        return self._valor
+
+    def invalidar(self):
+        renovar(self.clave)
+        # Este proceso lee la versión nueva en la próxima consulta, sin esperar la revisión
+        self._valor = None
+
+
+@checks.register(checks.Tags.caches, deploy=True)
+def revisar_tabla_cache(app_configs=None, **kwargs):
+    """Advierte si la caché compartida está en la base y su tabla aún no se creó."""
+    mensajes = []
+    for alias in settings.CACHES:
+        backend = caches[alias]
+        if not isinstance(backend, DatabaseCache):
+            continue
+        conexion = connections[router.db_for_read(backend.cache_model_class)]
+        try:
+            existe = backend._table in conexion.introspection.table_names()
+        except DatabaseError:
+            continue
+        if not existe:
+            mensajes.append(checks.Warning(
+                f"La tabla de caché '{backend._table}' no existe.",
+                hint="Ejecute manage.py createcachetable al desplegar.",
+                id='erp_app.W005',
+            ))
+    return mensajes
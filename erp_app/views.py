@@ -1,24 +1,124 @@
-from django.shortcuts import render
-from django.utils import timezone
-from .models import (
-    OrdenVenta, OperacionProcesamiento, Embarque,
-    DocumentacionExportacion, InventarioProductoFinal
-)
-
-def dashboard_view(request):
-    ordenes_pendientes = OrdenVenta.objects.filter(estado='pendiente').count()
-    operaciones_pendientes = OperacionProcesamiento.objects.filter(abastecido_a_inventario=False).count()
-    embarques_proximos = Embarque.objects.filter(
-        fecha_embarque__gte=timezone.now().date()
-    ).count()
-    docs_pendientes = DocumentacionExportacion.objects.filter(estado_envio='pendiente').count()
-    inventario_bajo = InventarioProductoFinal.objects.filter(stock_kg__lt=100).count()
-
-    context = {
-        'ordenes_pendientes': ordenes_pendientes,
-        'operaciones_pendientes': operaciones_pendientes,
-        'embarques_proximos': embarques_proximos,
-        'docs_pendientes': docs_pendientes,
-        'inventario_bajo': inventario_bajo,
-    }
-    return render(request, 'dashboard.html', context)
\ No newline at end of file
+from datetime import date
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.contrib.admin.views.decorators import staff_member_required
+from django.core.handlers.asgi import ASGIRequest
+from django.http import Http404, HttpResponse, HttpResponseBadRequest, JsonResponse, StreamingHttpResponse
+from django.template.response import TemplateResponse
+from . import busqueda, catalogos, difusion, documentacion, flujo_caja
+from .metricas import aobtener_snapshot, obtener_snapshot
+from .models import OrdenVenta
+
+# Las vistas del dashboard y de reportes son asíncronas para que, bajo ASGI, el flujo
+# SSE no ocupe un hilo por conexión. Las consultas del ORM, aun las asíncronas, corren
+# una tras otra en el único hilo de sync_to_async, así que cada vista hace las suyas
+# en una función síncrona y un solo salto a ese hilo en vez de uno por consulta.
+# TemplateResponse se renderiza después en un hilo, porque la plantilla del admin
+# accede a request.user de forma síncrona.
+
+@staff_member_required
+async def dashboard_view(request):
+    snapshot, ordenes_recientes = await sync_to_async(_datos_dashboard)()
+    return TemplateResponse(request, 'admin/dashboard.html', {
+        **snapshot,
+        'ordenes_recientes': ordenes_recientes,
+        # Bajo WSGI la página consulta metricas.json cada intervalo en vez de abrir el flujo SSE
+        'eventos_sse': _bajo_asgi(request),
+        'intervalo_ms': getattr(settings, 'DASHBOARD_SSE_INTERVALO', 5) * 1000,
+    })
+
+@staff_member_required
+async def dashboard_metricas_json(request):
+    return JsonResponse(await aobtener_snapshot())
+
+@staff_member_required
+async def dashboard_eventos(request):
+    if not _bajo_asgi(request):
+        # Bajo WSGI Django consumiría el generador completo (DURACION segundos) antes de
+        # enviar nada, ocupando el worker; 204 le indica al navegador que no reconecte
+        return HttpResponse(status=204)
+    response = StreamingHttpResponse(difusion.difusor().eventos(), content_type='text/event-stream')
+    response['Cache-Control'] = 'no-cache'
+    response['X-Accel-Buffering'] = 'no'
+    return response
+
+def _bajo_asgi(request):
+    return isinstance(request, ASGIRequest)
+
+def _datos_dashboard():
+    return obtener_snapshot(), list(OrdenVenta.objects.select_related('cliente').order_by('-fecha', '-pk')[:10])
+
+@staff_member_required
+def catalogos_estadisticas(request):
+    """Aciertos y fallos de la caché de catálogos en el proceso que atiende la petición."""
+    return JsonResponse(catalogos.estadisticas())
+
+@staff_member_required
+def busqueda_view(request):
+    texto = request.GET.get('q', '').strip()
+    return TemplateResponse(request, 'admin/busqueda.html', {
+        'title': 'Búsqueda',
+        'q': texto,
+        'resultados': busqueda.buscar(texto) if texto else [],
+    })
+
+@staff_member_required
+def exportar_reporte(request, nombre, formato):
+    # Los reportes se cargan al primer uso y no en el arranque de cada worker
+    from . import exportacion
+
+    if nombre not in exportacion.REPORTES or formato not in exportacion.formatos():
+        raise Http404
+    params = {clave: valor for clave, valor in request.GET.items() if valor}
+    try:
+        for clave in ('desde', 'hasta'):
+            if clave in params:
+                params[clave] = date.fromisoformat(params[clave])
+        if params.setdefault('por', 'clientes') not in ('ordenes', 'productos', 'clientes'):
+            raise ValueError(f"Agrupación desconocida: {params['por']}")
+    except ValueError as exc:
+        return HttpResponseBadRequest(str(exc))
+    encabezados, filas = exportacion.REPORTES[nombre](**params)
+    return exportacion.respuesta(nombre, formato, encabezados, filas)
+
+@staff_member_required
+async def flujo_caja_view(request):
+    periodo = request.GET.get('periodo', 'semana')
+    if periodo not in ('semana', 'mes'):
+        periodo = 'semana'
+    try:
+        periodos = min(max(int(request.GET.get('periodos', 12)), 1), 52)
+    except ValueError:
+        periodos = 12
+    filas, antiguedad = await sync_to_async(
+        lambda: (flujo_caja.proyeccion(periodo, periodos), flujo_caja.antiguedad_por_pagar())
+    )()
+    return TemplateResponse(request, 'admin/flujo_caja.html', {
+        'title': 'Proyección de flujo de caja',
+        'periodo': periodo,
+        'filas': filas,
+        'antiguedad': antiguedad,
+    })
+
+@staff_member_required
+async def documentacion_riesgo_view(request):
+    filas, conteos = await sync_to_async(_datos_riesgo)()
+    etiquetas = {tramo: etiqueta for tramo, etiqueta, *_ in documentacion.TRAMOS}
+    for fila in filas:
+        fila.faltantes = documentacion.faltantes(fila)
+        fila.tramo_etiqueta = etiquetas[fila.tramo_plazo]
+    return TemplateResponse(request, 'admin/documentacion_riesgo.html', {
+        'title': 'Documentación en riesgo',
+        'filas': filas,
+        'total': sum(conteos),
+        'tramos': [(etiquetas[tramo], n) for tramo, n in zip(documentacion.TRAMOS_RIESGO, conteos)],
+    })
+
+def _datos_riesgo():
+    filas = list(documentacion.en_riesgo()[:documentacion.FILAS_COLA])
+    conteos = [
+        documentacion.incompletos().filter(documentacion.filtro_tramo(tramo)).count()
+        for tramo in documentacion.TRAMOS_RIESGO
+    ]
+    return filas, conteos
@@ -0,0 +1,76 @@
+"""
+Perfiles de base de datos seleccionables con la variable ``ERP_DB_PERFIL``.
+
+* ``sqlite`` (por defecto): SQLite en modo WAL, con lectores que no bloquean al
+  escritor, ``synchronous=NORMAL``, caché de páginas y ``mmap`` ampliados,
+  conexiones persistentes y transacciones ``IMMEDIATE`` con ``busy_timeout``.
+  Las transacciones de escritura toman el bloqueo al comenzar y esperan en vez
+  de fallar con ``database is locked`` al intentar promoverse.
+* ``sqlite-basico``: la configuración original de Django, útil como referencia
+  en ``benchmark_concurrencia``.
+* ``postgres``: PostgreSQL con el pool de conexiones de psycopg 3
+  (``pip install "psycopg[pool]"``), configurado con las variables
+  ``ERP_DB_NOMBRE``, ``ERP_DB_USUARIO``, ``ERP_DB_CLAVE``, ``ERP_DB_HOST``,
+  ``ERP_DB_PUERTO`` y ``ERP_DB_POOL_MAX``.
+
+``configurar_cache`` arma ``CACHES``, que debe ser compartida por todos los
+workers: las versiones de tipos de cambio, precios y catálogos y la
+instantánea del dashboard se leen ahí. Con ``ERP_CACHE_URL`` (p. ej.
+``redis://localhost:6379/0``, ``pip install redis``) se usa Redis; sin ella,
+la tabla ``erp_cache`` de la misma base, que se crea al desplegar con
+``manage.py createcachetable`` (``manage.py check --deploy`` advierte si falta).
+"""
+import os
+
+PRAGMAS_SQLITE = [
+    'PRAGMA journal_mode=WAL',
+    'PRAGMA synchronous=NORMAL',
+    'PRAGMA cache_size=-65536',      # 64 MiB
+    'PRAGMA mmap_size=268435456',    # 256 MiB
+    'PRAGMA temp_store=MEMORY',
+]
+
+
+def perfil_bd(perfil, base_dir, entorno=os.environ):
+    if perfil == 'sqlite-basico':
+        return {
+            'ENGINE': 'django.db.backends.sqlite3',
+            'NAME': entorno.get('ERP_DB_NOMBRE', base_dir / 'db.sqlite3'),
+        }
+    if perfil == 'sqlite':
+        return {
+            'ENGINE': 'django.db.backends.sqlite3',
+            'NAME': entorno.get('ERP_DB_NOMBRE', base_dir / 'db.sqlite3'),
+            'CONN_MAX_AGE': int(entorno.get('ERP_DB_CONN_MAX_AGE', 600)),
+            'CONN_HEALTH_CHECKS': True,
+            'OPTIONS': {
+                'timeout': float(entorno.get('ERP_DB_TIMEOUT', 20)),
+                'transaction_mode': 'IMMEDIATE',
+                'init_command': ';'.join(PRAGMAS_SQLITE),
+            },
+        }
+    if perfil == 'postgres':
+        return {
+            'ENGINE': 'django.db.backends.postgresql',
+            'NAME': entorno.get('ERP_DB_NOMBRE', 'erp_avellanos'),
+            'USER': entorno.get('ERP_DB_USUARIO', 'erp'),
+            'PASSWORD': entorno.get('ERP_DB_CLAVE', ''),
+            'HOST': entorno.get('ERP_DB_HOST', 'localhost'),
+            'PORT': entorno.get('ERP_DB_PUERTO', '5432'),
+            # Con pool las conexiones se devuelven al pool al final de cada petición
+            'CONN_MAX_AGE': 0,
+            'OPTIONS': {
+                'pool': {'min_size': 2, 'max_size': int(entorno.get('ERP_DB_POOL_MAX', 10)), 'timeout': 10},
+            },
+        }
+    raise ValueError(f"Perfil de base de datos desconocido: {perfil!r}")
+
+
+def configurar_bd(base_dir, entorno=os.environ):
+    return {'default': perfil_bd(entorno.get('ERP_DB_PERFIL', 'sqlite'), base_dir, entorno)}
+
+
+def configurar_cache(entorno=os.environ):
+    if entorno.get('ERP_CACHE_URL'):
+        return {'default': {'BACKEND': 'django.core.cache.backends.redis.RedisCache', 'LOCATION': entorno['ERP_CACHE_URL']}}
+    return {'default': {'BACKEND': 'django.core.cache.backends.db.DatabaseCache', 'LOCATION': 'erp_cache'}}
@@ -1,10 +1,13 @@
+import os
 from pathlib import Path
+from .database import configurar_bd, configurar_cache
 BASE_DIR = Path(__file__).resolve().parent.parent
 SECRET_KEY = 'django-insecure-tu-clave-secreta-aqui'
 DEBUG = True
 ALLOWED_HOSTS = ['chrisnun.pythonanywhere.com']
 INSTALLED_APPS = [
-    'django.contrib.admin',
+    # django.contrib.admin con erp_app.sitio_admin.ErpAdminSite como sitio por defecto
+    'erp_app.sitio_admin.ErpAdminConfig',
     'django.contrib.auth',
     'django.contrib.contenttypes',
     'django.contrib.sessions',
@@ -13,15 +16,18 @@ INSTALLED_APPS = [
     'erp_app',
 ]
 MIDDLEWARE = [
+    'erp_app.middleware.PresupuestoConsultasMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
+    'erp_app.middleware.AuditoriaMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
 ]
 ROOT_URLCONF = 'erp_avellanos.urls'
+# Sin OPTIONS['loaders'] Django envuelve los cargadores en cached.Loader; check --deploy lo verifica (erp_app.W003)
 TEMPLATES = [
     {
         'BACKEND': 'django.template.backends.django.DjangoTemplates',
@@ -38,12 +44,10 @@ TEMPLATES = [
     },
 ]
 WSGI_APPLICATION = 'erp_avellanos.wsgi.application'
-DATABASES = {
-    'default': {
-        'ENGINE': 'django.db.backends.sqlite3',
-        'NAME': BASE_DIR / 'db.sqlite3',
-    }
-}
+# Perfil elegido con ERP_DB_PERFIL (sqlite, sqlite-basico o postgres); ver erp_avellanos/database.py
+DATABASES = configurar_bd(BASE_DIR)
+# Caché compartida por todos los workers: Redis con ERP_CACHE_URL, si no la tabla erp_cache de la base
+CACHES = configurar_cache()
 AUTH_PASSWORD_VALIDATORS = [
     {'NAME': 'django.contrib.auth.password_validation.UserAttributeSimilarityValidator'},
     {'NAME': 'django.contrib.auth.password_validation.MinimumLengthValidator'},
@@ -59,4 +63,51 @@ STATIC_ROOT = BASE_DIR / 'static'
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 # Personalización del admin
 ADMIN_SITE_HEADER = "ERP Sociedad Comercial Los Avellanos Spa"
-ADMIN_SITE_TITLE = "ERP Avellanos"
\ No newline at end of file
+ADMIN_SITE_TITLE = "ERP Avellanos"
+# Límites del arranque en frío de un worker que advierte manage.py check --deploy (ver erp_app.arranque)
+ARRANQUE_MAX_SEGUNDOS = 2.0
+ARRANQUE_MAX_RSS_MB = 120
+# Segundos que se mantiene en caché la instantánea de métricas del dashboard
+DASHBOARD_CACHE_TTL = 60
+# Segundos entre consultas de métricas para los dashboards conectados por server-sent events
+DASHBOARD_SSE_INTERVALO = 5
+# Tipo de cambio (CLP por USD) usado cuando no hay tasas registradas en TipoCambio
+TIPO_CAMBIO_CLP_USD = 950
+# Instrumentación de consultas por vista (ver erp_app.middleware)
+INSTRUMENTACION_CONSULTAS = {
+    'HABILITADO': True,
+    'MUESTREO': 1.0 if DEBUG else 0.05,
+    'PRESUPUESTO': 30,
+}
+LOGGING = {
+    'version': 1,
+    'disable_existing_loggers': False,
+    'handlers': {
+        'console': {'class': 'logging.StreamHandler'},
+    },
+    'loggers': {
+        # Solo las vistas que superan el presupuesto; ERP_LOG_RENDIMIENTO=INFO registra cada petición muestreada
+        'erp_app.rendimiento': {'handlers': ['console'], 'level': os.environ.get('ERP_LOG_RENDIMIENTO', 'WARNING')},
+    },
+}
+# Cotizaciones: días de compras usados para el precio de materia prima y margen por defecto
+COTIZACION_DIAS_PRECIOS = 90
+COTIZACION_MARGEN_PCT = 25
+# Cola de trabajos en segundo plano (ver erp_app.trabajos y manage.py trabajador)
+TRABAJOS_DIRECTORIO = BASE_DIR / 'trabajos'
+TRABAJOS_ESPERA_REINTENTO = 30
+# Segundos entre latidos de un trabajo en ejecución y sin latido antes de darlo por abandonado
+TRABAJOS_LATIDO = 60
+TRABAJOS_SIN_LATIDO = 300
+# Analítica de rendimiento: ventana reciente y base (días), umbral de alerta (errores estándar) y muestras mínimas
+RENDIMIENTO_VENTANA_DIAS = 30
+RENDIMIENTO_BASE_DIAS = 365
+RENDIMIENTO_UMBRAL_Z = 3
+RENDIMIENTO_MIN_MUESTRAS = 5
+# Caché de catálogos (ver erp_app.catalogos): segundos entre revisiones de versión y si se comparten los datos
+CATALOGOS_REVISION_SEGUNDOS = 1.0
+CATALOGOS_COMPARTIDOS = False
+# Segundos entre lecturas de las versiones de tipos de cambio y precios en la caché (ver erp_app.versiones)
+VERSIONES_REVISION_SEGUNDOS = 1.0
+# Auditoría de cambios (ver erp_app.auditoria): meses que conserva manage.py purgar_auditoria
+AUDITORIA_RETENCION_MESES = 24
@@ -1,7 +1,8 @@
-from django.contrib import admin
-from django.urls import path
+from django.urls import include, path
+
 from erp_app.admin import custom_admin_site
 
 urlpatterns = [
     path('admin/', custom_admin_site.urls),
-]
\ No newline at end of file
+    path('', include('erp_app.urls')),
+]
@@ -3,10 +3,17 @@ WSGI config for erp_avellanos project.
 
 It exposes the WSGI callable as a module-level variable named ``application``.
 
+Con ERP_WSGI_PRECARGA=1 (para servidores que cargan la aplicación antes de
+crear los workers, p. ej. ``gunicorn --preload``) el URLconf, el admin y las
+vistas se cargan en el proceso padre y sus objetos se excluyen del recolector
+de basura, para que los workers compartan esas páginas de memoria en vez de
+copiarlas.
+
 For more information on this file, see
 https://docs.djangoproject.com/en/5.2/howto/deployment/wsgi/
 """
 
+import gc
 import os
 
 from django.core.wsgi import get_wsgi_application
@@ -14,3 +21,9 @@ from django.core.wsgi import get_wsgi_application
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'erp_avellanos.settings')
 
 application = get_wsgi_application()
+
+if os.environ.get('ERP_WSGI_PRECARGA') == '1':
+    from django.urls import get_resolver
+
+    get_resolver().url_patterns
+    gc.freeze()